@@ -0,0 +1,76 @@
+"""
+Verifica che AsyncDatabaseManager non blocchi l'event loop: un DatabaseManager finto, in cui ogni query
+attende QUERY_LATENCY secondi come un viaggio verso SQLiteCloud, viene usato da molti handler contemporanei.
+Con l'executor grande quanto il pool, tanti handler quanti i thread finiscono in circa una latenza e non una per handler;
+mentre si aspetta il database l'event loop resta libero.
+
+    python -m benchmark.async_database
+"""
+import asyncio
+from time import perf_counter, sleep
+from database_manager import AsyncDatabaseManager
+
+QUERY_LATENCY = 0.05
+POOL_MAX_SIZE = 8
+
+class SleepingPool:
+    max_size = POOL_MAX_SIZE
+
+"""
+DatabaseManager finto: le query bloccano il thread per QUERY_LATENCY secondi, come la connessione vera
+"""
+class SleepingDatabaseManager:
+    def __init__(self):
+        self.pool = SleepingPool()
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def get_lesson_details(self, lesson_id: int):
+        sleep(QUERY_LATENCY)
+        return lesson_id
+
+    def is_user_booked(self, email: str, lesson_id: int) -> list:
+        sleep(QUERY_LATENCY)
+        return []
+
+"""
+Come Bot.view_lesson: due query una dopo l'altra
+"""
+async def handler(database: AsyncDatabaseManager, lesson_id: int):
+    await database.get_lesson_details(lesson_id)
+    await database.is_user_booked("studente@studenti.unipg.it", lesson_id)
+
+async def main():
+    database = AsyncDatabaseManager(SleepingDatabaseManager())
+    assert database.executor._max_workers == POOL_MAX_SIZE, "L'executor deve avere un thread per ogni connessione del pool"
+    handler_latency = 2 * QUERY_LATENCY
+
+    for n_handlers in (1, POOL_MAX_SIZE, 4 * POOL_MAX_SIZE):
+        # Un task misura quanto l'event loop resta libero mentre gli handler aspettano il database
+        ticks = 0
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+        ticker = asyncio.create_task(tick())
+
+        start = perf_counter()
+        await asyncio.gather(*(handler(database, lesson_id) for lesson_id in range(n_handlers)))
+        elapsed = perf_counter() - start
+        ticker.cancel()
+
+        expected = -(-n_handlers // POOL_MAX_SIZE) * handler_latency
+        print(f"{n_handlers:>3} handler contemporanei: {elapsed:.2f} s (uno alla volta {n_handlers * handler_latency:.2f} s), "
+              f"l'event loop ha girato {ticks} volte nel frattempo")
+        assert elapsed < expected + handler_latency, f"{n_handlers} handler in {elapsed:.2f} s invece di circa {expected:.2f} s"
+        assert ticks > 10, "L'event loop è rimasto bloccato durante le query"
+
+    database.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,171 @@
+"""
+Benchmark dell'importazione dell'orario (timetable_import): genera un CSV di un semestre per tutte le materie,
+lo importa in un database SQLite locale e misura righe al secondo e memoria massima.
+Poi verifica che una seconda importazione, anche con --aggiorna, non scriva nulla, che le righe non valide
+vengano scartate, che un calendario iCalendar venga importato, e confronta diverse dimensioni del lotto.
+
+    python -m benchmark.bench_import [numero di righe]
+"""
+import csv
+import logging
+import os
+import sqlite3
+import sys
+import tracemalloc
+from datetime import date, timedelta
+from itertools import count
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from benchmark.common import create_database
+
+N_ROWS = 200_000
+BATCH_SIZES = [1, 100, 1_000, 10_000]
+BATCH_SIZES_ROWS = 20_000
+HOURS = [("08:00", "09:00"), ("09:00", "11:00"), ("11:00", "13:00"), ("14:00", "16:00"), ("16:00", "18:00"), ("18:00", "19:00")]
+
+ICS = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+DTSTART;TZID=Europe/Rome:20300114T090000
+DTEND;TZID=Europe/Rome:20300114T110000
+SUMMARY:Basi di dati
+LOCATION:A0
+ORGANIZER;CN="Raffaella Gentilini":mailto:docente@unipg.it
+DESCRIPTION:Il modello relazionale\\, chiavi e
+  vincoli
+END:VEVENT
+BEGIN:VEVENT
+DTSTART:20300115T100000Z
+DTEND:20300115T120000Z
+SUMMARY:Sistemi Operativi
+LOCATION:A2
+ORGANIZER;CN=Arturo Carpi:mailto:docente@unipg.it
+END:VEVENT
+BEGIN:VEVENT
+DTSTART;TZID=Europe/Rome:20300116T090000
+DTEND;TZID=Europe/Rome:20300116T110000
+RRULE:FREQ=WEEKLY;COUNT=10
+SUMMARY:Basi di dati
+LOCATION:A0
+ORGANIZER;CN=Raffaella Gentilini:mailto:docente@unipg.it
+END:VEVENT
+END:VCALENDAR
+"""
+
+"""
+Scrive n_rows lezioni distinte nel CSV, giorno per giorno, una per ogni materia e fascia oraria
+"""
+def write_timetable(connection, path: str, n_rows: int):
+    subjects = [row[0] for row in connection.execute("SELECT nome FROM Materie")]
+    rooms = [row[0] for row in connection.execute("SELECT nome FROM Aule")]
+    professors = [f"{name} {surname}" for name, surname in connection.execute("SELECT nome, cognome FROM Professori")]
+    first_day = date(2030, 1, 1)
+
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file, delimiter=";")
+        writer.writerow(["data", "inizio", "fine", "materia", "aula", "professore", "descrizione"])
+        for i in range(n_rows):
+            day, slot = divmod(i, len(subjects) * len(HOURS))
+            subject, hour = divmod(slot, len(HOURS))
+            start, end = HOURS[hour]
+            writer.writerow([(first_day + timedelta(days=day)).strftime("%d/%m/%Y"), start, end, subjects[subject],
+                             rooms[i % len(rooms)], professors[i % len(professors)], f"Lezione {i}"])
+
+"""
+Importa il file nel database SQLite 'database_path'; con trace_memory misura anche la memoria massima, rallentando però l'importazione
+"""
+def import_file(database_path: str, path: str, batch_size: int = 1_000, update: bool = False, trace_memory: bool = False):
+    from database_manager import DatabaseManager
+    from timetable_import import TimetableImporter, read_csv, read_ics
+
+    database = DatabaseManager(database_path)
+    database.connect()
+    try:
+        read = read_ics if path.endswith(".ics") else read_csv
+        if trace_memory:
+            tracemalloc.start()
+        start = perf_counter()
+        report = TimetableImporter(database, batch_size, update).run(read(path))
+        elapsed = perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else 0
+        tracemalloc.stop()
+    finally:
+        database.close()
+    return report, elapsed, peak
+
+def query(path: str, search: str) -> list:
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute(search).fetchall()
+    finally:
+        connection.close()
+
+def count_lessons(path: str) -> int:
+    return query(path, "SELECT COUNT(*) FROM Lezioni")[0][0]
+
+def main():
+    logging.disable(logging.WARNING)
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else N_ROWS
+    numbers = count()
+
+    with TemporaryDirectory() as directory:
+        def new_database() -> str:
+            path = os.path.join(directory, f"import{next(numbers)}.db")
+            create_database(path).close()
+            return path
+
+        path = new_database()
+        initial = count_lessons(path)
+        timetable = os.path.join(directory, "orario.csv")
+        connection = create_database(os.path.join(directory, "schema.db"))
+        write_timetable(connection, timetable, n_rows)
+        connection.close()
+
+        report, elapsed, _ = import_file(path, timetable)
+        print(f"{n_rows} righe importate in {elapsed:.2f} s: {n_rows / elapsed:.0f} righe/s")
+        assert report.written == n_rows and report.invalid == 0
+        assert count_lessons(path) == initial + n_rows
+
+        report, elapsed, _ = import_file(path, timetable)
+        print(f"seconda importazione: {report.written} lezioni scritte in {elapsed:.2f} s: {n_rows / elapsed:.0f} righe/s")
+        assert report.written == 0
+        report, _, peak = import_file(path, timetable, update=True, trace_memory=True)
+        print(f"seconda importazione con --aggiorna: {report.written} lezioni scritte, memoria massima {peak / 1024 / 1024:.1f} MiB")
+        assert report.written == 0 and peak < 16 * 1024 * 1024
+        assert count_lessons(path) == initial + n_rows
+
+        # Le righe non valide vengono scartate, quelle cambiate aggiornate
+        changed = os.path.join(directory, "modificato.csv")
+        with open(timetable, encoding="utf-8") as source, open(changed, "w", encoding="utf-8") as target:
+            target.write(source.readline())
+            target.write(source.readline().replace("Lezione 0", "Lezione 0 (recupero)"))
+            target.write("31/02/2030;09:00;11:00;Basi di dati;A0;Raffaella Gentilini;data impossibile\n")
+            target.write("01/03/2030;09:00;11:00;Materia inesistente;A0;Raffaella Gentilini;\n")
+            target.write("01/03/2030;09:00;11:00;basi di dati;a9;Raffaella Gentilini;\n")
+        report, _, _ = import_file(path, changed, update=True)
+        print(f"file modificato: {report.written} lezione aggiornata, {report.invalid} righe scartate")
+        assert report.written == 1 and report.invalid == 3
+
+        ics = os.path.join(directory, "orario.ics")
+        with open(ics, "w", encoding="utf-8") as file:
+            file.write(ICS.replace("\n", "\r\n"))
+        path = new_database()
+        report, _, _ = import_file(path, ics)
+        print(f"iCalendar: {report.written} lezioni importate, {report.invalid} eventi scartati")
+        assert report.written == 2 and report.invalid == 1
+        # L'orario in UTC diventa ora italiana, i posti sono quelli dell'aula
+        assert query(path, "SELECT ora, posti_disponibili FROM Lezioni WHERE data='2030-01-15'") == [("11:00 - 13:00", 150)]
+        assert query(path, "SELECT descrizione FROM Lezioni WHERE data='2030-01-14'") == [("Il modello relazionale, chiavi e vincoli",)]
+
+        print(f"{'lotto':>8}{'righe/s':>12}")
+        rows = min(n_rows, BATCH_SIZES_ROWS)
+        subset = os.path.join(directory, "parziale.csv")
+        with open(timetable, encoding="utf-8") as source, open(subset, "w", encoding="utf-8") as target:
+            for _, line in zip(range(rows + 1), source):
+                target.write(line)
+        for batch_size in BATCH_SIZES:
+            report, elapsed, _ = import_file(new_database(), subset, batch_size)
+            print(f"{batch_size:>8}{rows / elapsed:>12.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark di DatabaseManager.get_lessons su un catalogo sintetico di 100.000 lezioni,
+per ciascun intervallo che l'utente può scegliere (oggi, un giorno, la settimana, la settimana dopo, una materia).
+Controlla con EXPLAIN QUERY PLAN che le ricerche usino gli indici e non una scansione di Lezioni,
+e che quella per materia legga le lezioni già ordinate dall'indice (nome_materia, data, ora).
+
+    python -m benchmark.bench_lessons
+"""
+import os
+from datetime import date, timedelta
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from benchmark.common import create_database, add_synthetic_lessons, add_users, percentile
+
+N_LESSONS = 100_000
+N_QUERIES = 2_000
+PAGE_SIZE = 10
+
+def explain(connection, search: str, params: tuple) -> list:
+    plan = connection.execute(f"EXPLAIN QUERY PLAN {search}", params).fetchall()
+    details = [row[-1] for row in plan]
+    print("Piano della query:", *details, sep="\n  ")
+    assert any("USING INDEX" in detail for detail in details), "La ricerca delle lezioni non usa un indice"
+    assert not any(detail == "SCAN Lezioni" for detail in details), "La ricerca delle lezioni scansiona tutta la tabella"
+    return details
+
+def main():
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        connection = create_database(path)
+        add_synthetic_lessons(connection, N_LESSONS)
+        emails = add_users(connection, 100)
+
+        from database_manager import DatabaseManager
+        from bot import Bot
+        database = DatabaseManager(path)
+        database.connect()
+
+        course, year = connection.execute("SELECT nome_corso, anno_di_corso FROM Utenti WHERE email=?", (emails[0],)).fetchone()
+        subjects = database.get_subjects(course, year)
+        today = date.today()
+        week = (today.isoformat(), (today + timedelta(days=6)).isoformat())
+        placeholders = ",".join("?" * len(subjects))
+        explain(connection, f"SELECT * FROM Lezioni WHERE nome_materia IN ({placeholders}) AND data BETWEEN ? AND ? ORDER BY data, ora, id_lezione LIMIT ?", (*subjects, *week, PAGE_SIZE + 1))
+        details = explain(connection, "SELECT * FROM Lezioni WHERE ?=nome_materia AND data BETWEEN ? AND ? ORDER BY data, ora, id_lezione LIMIT ?", (subjects[0], *week, PAGE_SIZE + 1))
+        assert not any("TEMP B-TREE" in detail for detail in details), "Le lezioni di una materia vengono ordinate dopo la lettura"
+
+        # Le materie dipendono da corso e anno: per ogni utente si sceglie una delle sue
+        users = []
+        for email in emails:
+            course, year = connection.execute("SELECT nome_corso, anno_di_corso FROM Utenti WHERE email=?", (email,)).fetchone()
+            users.append((course, year, database.get_subjects(course, year)))
+
+        windows = {
+            "oggi": lambda subjects: ("oggi",),
+            "giorno": lambda subjects: ("giorno", (today + timedelta(days=3)).isoformat()),
+            "settimana": lambda subjects: ("settimana",),
+            "prossima": lambda subjects: ("prossima",),
+            "materia": lambda subjects: ("materia", subjects[0]),
+        }
+
+        print(f"\n{N_QUERIES} chiamate a get_lessons per intervallo su {N_LESSONS} lezioni, pagine da {PAGE_SIZE}")
+        print(f"{'intervallo':<12}{'nel filtro':>12}{'in pagina':>10}{'chiamate/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for name, window in windows.items():
+            timings = []
+            found = 0
+            matching = 0
+            for i in range(N_QUERIES):
+                course, year, user_subjects = users[i % len(users)]
+                if not user_subjects:
+                    continue
+                first_day, last_day, subject, _ = Bot.lesson_window(window(user_subjects))
+                start = perf_counter()
+                lessons, _, _ = database.get_lessons(course, year, first_day, last_day, subject, page_size=PAGE_SIZE)
+                timings.append(perf_counter() - start)
+                found += len(lessons)
+                in_window = (subject,) if subject is not None else user_subjects
+                matching += connection.execute(f"SELECT COUNT(*) FROM Lezioni WHERE nome_materia IN ({','.join('?' * len(in_window))}) AND data BETWEEN ? AND ?",
+                                               (*in_window, first_day.isoformat(), last_day.isoformat())).fetchone()[0]
+            print(f"{name:<12}{matching / len(timings):>12.1f}{found / len(timings):>10.1f}{len(timings) / sum(timings):>12.0f}{percentile(timings, 50) * 1000:>10.3f}{percentile(timings, 95) * 1000:>10.3f}{percentile(timings, 99) * 1000:>10.3f}")
+
+        database.close()
+        connection.close()
+
+if __name__ == "__main__":
+    main()
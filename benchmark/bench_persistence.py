@@ -0,0 +1,81 @@
+"""
+Misura il costo per aggiornamento di SQLitePersistence: l'Application chiama update_user_data
+e update_conversation per ogni utente attivo, la scrittura su file avviene poi in un'unica transazione.
+Verifica anche che le modifiche di una scrittura fallita vengano salvate alla scrittura successiva.
+
+    python -m benchmark.bench_persistence
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from persistence import SQLitePersistence
+
+N_USERS = 10_000
+ROUNDS = 5
+
+async def main():
+    with TemporaryDirectory() as directory:
+        persistence = SQLitePersistence(os.path.join(directory, "state.db"))
+        await persistence.get_user_data()
+
+        staging = 0.0
+        writing = 0.0
+        for round in range(ROUNDS):
+            start = perf_counter()
+            for user_id in range(N_USERS):
+                user_data = {"chat_id": user_id, "email": f"studente{user_id}@studenti.unipg.it", "nome": "Nome", "cognome": "Cognome", "corso": "Informatica", "anno": 1, "round": round}
+                await persistence.update_user_data(user_id, user_data)
+                await persistence.update_conversation("prenotazione", (user_id, user_id), 6)
+            staging += perf_counter() - start
+
+            start = perf_counter()
+            await persistence.flush_task
+            writing += perf_counter() - start
+
+        await persistence.flush()
+
+        restored = SQLitePersistence(os.path.join(directory, "state.db"))
+        assert len(await restored.get_user_data()) == N_USERS
+        assert len(await restored.get_conversations("prenotazione")) == N_USERS
+        await restored.flush()
+
+        await write_failure(os.path.join(directory, "failure.db"))
+
+    updates = N_USERS * ROUNDS
+    print(f"{updates} aggiornamenti: {staging / updates * 1e6:.2f} µs per aggiornamento nel ciclo dell'Application")
+    print(f"scrittura su file in batch: {writing / updates * 1e6:.2f} µs per aggiornamento ({N_USERS} utenti per transazione)")
+
+"""
+La prima scrittura fallisce: le sue modifiche tornano in attesa, senza prevalere su quelle arrivate dopo
+"""
+async def write_failure(path: str):
+    persistence = SQLitePersistence(path)
+    await persistence.get_user_data()
+    write = persistence.write
+
+    def failing_write(users: dict, conversations: dict):
+        persistence.write = write
+        raise sqlite3.OperationalError("disk I/O error")
+    persistence.write = failing_write
+
+    logging.disable(logging.ERROR)
+    await persistence.update_user_data(1, {"round": 1})
+    await persistence.update_user_data(2, {"round": 1})
+    await persistence.flush_task
+    logging.disable(logging.NOTSET)
+    assert persistence.pending_users == {1: {"round": 1}, 2: {"round": 1}}
+
+    await persistence.update_user_data(1, {"round": 2})
+    await persistence.flush_task
+    await persistence.flush()
+
+    restored = SQLitePersistence(path)
+    assert await restored.get_user_data() == {1: {"round": 2}, 2: {"round": 1}}
+    await restored.flush()
+    print("scrittura fallita: modifiche salvate alla scrittura successiva")
+
+if __name__ == "__main__":
+    asyncio.run(main())
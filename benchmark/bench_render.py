@@ -0,0 +1,80 @@
+"""
+Confronta il costo di costruzione della tastiera di list_lessons con le righe come tuple
+(data e ora interpretate a ogni messaggio, come faceva il Bot) e con gli oggetti Lesson
+(data e ora interpretate una sola volta alla lettura), e la memoria occupata dalle righe in cache.
+
+    python -m benchmark.bench_render
+"""
+import os
+import tracemalloc
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from benchmark.common import create_database, add_synthetic_lessons
+from models import Lesson
+
+N_LESSONS = 50
+N_RENDERS = 5_000
+N_CACHED = 100_000
+
+def render_rows(lessons: list) -> InlineKeyboardMarkup:
+    keyboard = []
+    for lesson in lessons:
+        date = lesson[1].split("-")
+        time = lesson[2].split("-")
+        keyboard.append([InlineKeyboardButton(f"{date[2]}/{date[1]} ⌚ {time[0]} | {lesson[5]}", callback_data="lezione-" + str(lesson[0]))])
+    return InlineKeyboardMarkup(keyboard)
+
+def render_lessons(lessons: list) -> InlineKeyboardMarkup:
+    keyboard = []
+    for lesson in lessons:
+        keyboard.append([InlineKeyboardButton(lesson.label, callback_data="lezione-" + str(lesson.lesson_id))])
+    return InlineKeyboardMarkup(keyboard)
+
+def labels_rows(lessons: list) -> list:
+    labels = []
+    for lesson in lessons:
+        date = lesson[1].split("-")
+        time = lesson[2].split("-")
+        labels.append(f"{date[2]}/{date[1]} ⌚ {time[0]} | {lesson[5]}")
+    return labels
+
+def labels_lessons(lessons: list) -> list:
+    return [lesson.label for lesson in lessons]
+
+def measure(function, lessons: list) -> float:
+    start = perf_counter()
+    for _ in range(N_RENDERS):
+        function(lessons)
+    return (perf_counter() - start) / N_RENDERS * 1e6
+
+"""
+Memoria media per riga delle lezioni lette dal database e tenute in memoria (come nella cache)
+"""
+def memory(connection, convert) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [convert(row) for row in connection.execute("SELECT * FROM Lezioni")]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(kept)
+
+def main():
+    with TemporaryDirectory() as directory:
+        connection = create_database(os.path.join(directory, "render.db"))
+        add_synthetic_lessons(connection, N_CACHED, days=365)
+        rows = connection.execute("SELECT * FROM Lezioni LIMIT ?", (N_LESSONS,)).fetchall()
+        row_memory = memory(connection, lambda row: row)
+        lesson_memory = memory(connection, Lesson.from_row)
+        connection.close()
+
+    lessons = [Lesson.from_row(row) for row in rows]
+
+    print(f"tastiera di {N_LESSONS} lezioni, media su {N_RENDERS} messaggi")
+    print(f"{'':<24}{'tuple':>12}{'Lesson':>12}")
+    print(f"{'solo etichette (µs)':<24}{measure(labels_rows, rows):>12.1f}{measure(labels_lessons, lessons):>12.1f}")
+    print(f"{'tastiera completa (µs)':<24}{measure(render_rows, rows):>12.1f}{measure(render_lessons, lessons):>12.1f}")
+    print(f"{'memoria per riga (byte)':<24}{row_memory:>12.0f}{lesson_memory:>12.0f}")
+
+if __name__ == "__main__":
+    main()
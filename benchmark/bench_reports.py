@@ -0,0 +1,100 @@
+"""
+Benchmark dei report (reports.py) su un anno accademico sintetico: lezioni per tutte le materie e centinaia
+di migliaia di prenotazioni. Per ogni report misura il tempo e la memoria massima (la misura rallenta i tempi),
+la confronta con la lettura di tutte le righe con fetchall e verifica i totali con query dirette sul database.
+Controlla anche che i report per data usino l'indice lezioni_data_ora.
+
+    python -m benchmark.bench_reports [numero di prenotazioni]
+"""
+import json
+import logging
+import os
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+from random import Random
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from benchmark.common import create_database, add_synthetic_lessons
+
+N_LESSONS = 40_000
+N_BOOKINGS = 400_000
+
+"""
+Aggiunge prenotazioni casuali, senza superare i posti dell'aula di ogni lezione, fatte nei 30 giorni prima della lezione
+"""
+def add_bookings(connection, n_bookings: int, seed: int = 0):
+    random = Random(seed)
+    lessons = connection.execute("SELECT l.id_lezione, l.data, a.posti_totali FROM Lezioni l JOIN Aule a ON a.nome=l.nome_aula").fetchall()
+    booked = dict.fromkeys((lesson_id for lesson_id, _, _ in lessons), 0)
+    rows = []
+    while len(rows) < n_bookings:
+        lesson_id, day, seats = random.choice(lessons)
+        if booked[lesson_id] >= seats:
+            continue
+        booked[lesson_id] += 1
+        moment = datetime.fromisoformat(day) - timedelta(minutes=random.randrange(30 * 24 * 60))
+        rows.append((moment.strftime("%Y-%m-%d"), moment.strftime("%H:%M"), lesson_id, f"studente{booked[lesson_id]}@studenti.unipg.it"))
+    connection.executemany("INSERT INTO Prenotazioni (data, ora, id_lezione, email_utente) VALUES (?, ?, ?, ?)", rows)
+    connection.executemany("UPDATE Lezioni SET posti_disponibili=posti_disponibili-? WHERE ?=id_lezione", [(count, lesson_id) for lesson_id, count in booked.items()])
+    connection.commit()
+
+def main():
+    logging.disable(logging.WARNING)
+    n_bookings = int(sys.argv[1]) if len(sys.argv) > 1 else N_BOOKINGS
+
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, "reports.db")
+        connection = create_database(path)
+        add_synthetic_lessons(connection, N_LESSONS, days=365)
+        add_bookings(connection, n_bookings)
+        total_bookings = connection.execute("SELECT COUNT(*) FROM Prenotazioni").fetchone()[0]
+        peak_minute = connection.execute("SELECT COUNT(*) FROM Prenotazioni GROUP BY data, ora ORDER BY COUNT(*) DESC LIMIT 1").fetchone()[0]
+        # I report per lezione e per aula cercano le lezioni del periodo con l'indice (data, ora), senza scansione
+        from reports import REPORTS
+        for name in ("lezioni", "aule"):
+            plan = [row[-1] for row in connection.execute(f"EXPLAIN QUERY PLAN {REPORTS[name][0]}", ("2024-09-01", "2025-08-31"))]
+            assert any("lezioni_data_ora" in detail for detail in plan), f"{name}: la ricerca per data non usa lezioni_data_ora: {plan}"
+        over_capacity = connection.execute(
+            "SELECT COUNT(*) FROM Lezioni l JOIN Aule a ON a.nome=l.nome_aula WHERE (SELECT COUNT(*) FROM Prenotazioni p WHERE p.id_lezione=l.id_lezione) > a.posti_totali"
+        ).fetchone()[0]
+        connection.close()
+        assert over_capacity == 0
+
+        from database_manager import DatabaseManager
+        from reports import REPORTS, export_report
+        database = DatabaseManager(path)
+        database.connect()
+
+        print(f"{N_LESSONS} lezioni, {total_bookings} prenotazioni")
+        print(f"{'report':<10}{'formato':<9}{'righe':>8}{'secondi':>10}{'MiB stream':>12}{'MiB fetchall':>14}")
+        for name, (search, _) in REPORTS.items():
+            tracemalloc.start()
+            with database.pool.connection() as connection:
+                connection.execute(search, ("0001-01-01", "9999-12-31")).fetchall()
+            fetchall_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            for output_format in ("csv", "json"):
+                report = os.path.join(directory, f"{name}.{output_format}")
+                with open(report, "w", encoding="utf-8", newline="") as output:
+                    tracemalloc.start()
+                    start = perf_counter()
+                    summary = export_report(database, name, output, output_format)
+                    elapsed = perf_counter() - start
+                    stream_peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                if output_format == "json":
+                    with open(report, encoding="utf-8") as file:
+                        assert len(json.load(file)) == summary.rows
+
+                print(f"{name:<10}{output_format:<9}{summary.rows:>8}{elapsed:>10.2f}{stream_peak / 1024 / 1024:>12.1f}{fetchall_peak / 1024 / 1024:>14.1f}")
+
+                assert summary.bookings == total_bookings, f"{name}: {summary.bookings} prenotazioni invece di {total_bookings}"
+                if name == "minuti":
+                    assert summary.peak[2] == peak_minute
+                assert stream_peak < 4 * 1024 * 1024, f"{name}: memoria massima {stream_peak} byte"
+        database.close()
+
+if __name__ == "__main__":
+    main()
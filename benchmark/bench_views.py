@@ -0,0 +1,67 @@
+"""
+Confronta il costo di preparazione delle viste più usate (menu, elenco delle lezioni, lezione, prenotazione)
+costruendo ogni volta testo MarkdownV2 e pulsanti, come faceva il Bot, e prendendole dalla cache delle viste.
+Per ciascuna riporta il tempo medio e la memoria allocata per vista.
+
+    python -m benchmark.bench_views
+"""
+import os
+import tracemalloc
+from datetime import date, datetime, timedelta
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from benchmark.common import create_database, add_synthetic_lessons
+from models import Booking, Lesson, User
+
+N_RENDERS = 20_000
+PAGE_SIZE = 10
+
+def measure(function) -> tuple[float, float]:
+    start = perf_counter()
+    for _ in range(N_RENDERS):
+        function()
+    elapsed = (perf_counter() - start) / N_RENDERS * 1e6
+
+    tracemalloc.start()
+    for _ in range(1000):
+        function()
+    # Picco di memoria allocata durante una vista (le allocazioni temporanee vengono liberate subito)
+    tracemalloc.reset_peak()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+def main():
+    from bot import Bot
+
+    with TemporaryDirectory() as directory:
+        connection = create_database(os.path.join(directory, "views.db"))
+        add_synthetic_lessons(connection, 1_000, days=7)
+        rows = connection.execute("SELECT * FROM Lezioni ORDER BY data, ora LIMIT ?", (PAGE_SIZE,)).fetchall()
+        connection.close()
+
+    lessons = [Lesson.from_row(row) for row in rows]
+    lesson = lessons[0]
+    profile = User("studente0@studenti.unipg.it", "Nome", "Cognome", 1, "Informatica", None)
+    booking = Booking(1, lesson.lesson_id, lesson.date, lesson.start, lesson.end, lesson.subject, datetime.now().replace(second=0, microsecond=0), lesson.label)
+    description = f"Settimana dal {date.today():%d/%m} al {date.today() + timedelta(days=6):%d/%m}"
+
+    bot = Bot(None, None, None, None, None)
+    views = {
+        "menu": (("menu", profile), Bot.build_menu_view, (profile,)),
+        "lezioni": (("lezioni", profile.course, profile.year, description, tuple(lesson.lesson_id for lesson in lessons), False, True), Bot.build_lessons_view, (profile, description, lessons, False, True)),
+        "lezione": (("lezione", lesson, -1, False), Bot.build_lesson_view, (lesson, -1, False)),
+        "prenotazione": (("prenotazione", booking, lesson), Bot.build_booking_view, (booking, lesson)),
+    }
+
+    print(f"media su {N_RENDERS} viste")
+    print(f"{'vista':<14}{'costruita µs':>14}{'in cache µs':>13}{'costruita byte':>16}{'in cache byte':>15}")
+    for name, (key, build, args) in views.items():
+        built_time, built_memory = measure(lambda: build(*args))
+        assert bot.render(key, build, *args) == bot.render(key, build, *args)
+        cached_time, cached_memory = measure(lambda: bot.render(key, build, *args))
+        print(f"{name:<14}{built_time:>14.2f}{cached_time:>13.2f}{built_memory:>16}{cached_memory:>15}")
+
+if __name__ == "__main__":
+    main()
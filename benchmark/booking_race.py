@@ -0,0 +1,127 @@
+"""
+Mette in gara molti thread sulle prenotazioni di una stessa lezione, attraverso il pool di DatabaseManager
+su un database SQLite locale, e verifica che i posti restino esatti:
+migliaia di studenti che prenotano insieme non superano mai i posti dell'aula,
+un doppio tocco su "Prenota" crea una sola prenotazione e un doppio tocco su "Annulla" libera un solo posto.
+Verifica anche che una lettura contemporanea a una prenotazione non lasci in cache i posti vecchi
+e che una connessione che ha dato errore non torni nel pool.
+
+    python -m benchmark.booking_race [numero di studenti]
+"""
+import logging
+import os
+import sqlite3
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from benchmark.common import create_database, add_synthetic_lessons, add_users
+
+N_STUDENTS = 2_000
+N_WORKERS = 16
+N_DOUBLE_TAPS = 50
+
+def seats(database, lesson_id: int) -> tuple[int, int]:
+    with database.pool.connection() as connection:
+        available = connection.execute("SELECT posti_disponibili FROM Lezioni WHERE ?=id_lezione", (lesson_id,)).fetchone()[0]
+        booked = connection.execute("SELECT COUNT(*) FROM Prenotazioni WHERE ?=id_lezione", (lesson_id,)).fetchone()[0]
+    return available, booked
+
+def main():
+    logging.disable(logging.WARNING)
+    n_students = int(sys.argv[1]) if len(sys.argv) > 1 else N_STUDENTS
+
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, "race.db")
+        connection = create_database(path)
+        connection.execute("DELETE FROM Prenotazioni")
+        connection.execute("DELETE FROM Lezioni")
+        add_synthetic_lessons(connection, 2, days=7)
+        # L'aula più grande, così più prenotazioni vanno a buon fine insieme
+        connection.execute("UPDATE Lezioni SET nome_aula='A0', posti_disponibili=(SELECT posti_totali FROM Aule WHERE nome='A0')")
+        emails = add_users(connection, n_students)
+        lessons = connection.execute("SELECT l.id_lezione, a.posti_totali FROM Lezioni l JOIN Aule a ON a.nome=l.nome_aula ORDER BY l.id_lezione").fetchall()
+        connection.commit()
+        connection.close()
+
+        import models
+        from database_manager import DatabaseManager, BookingResult
+        database = DatabaseManager(path)
+        database.pool.max_size = N_WORKERS
+        database.connect()
+
+        with ThreadPoolExecutor(max_workers=N_WORKERS) as executor:
+            # Tutti gli studenti prenotano la stessa lezione
+            lesson_id, capacity = lessons[0]
+            start = perf_counter()
+            # Ogni studente legge la lezione (e la mette in cache) mentre gli altri prenotano
+            results = Counter(executor.map(lambda email: database.get_lesson_details(lesson_id) and database.insert_booking(lesson_id, email), emails))
+            elapsed = perf_counter() - start
+            available, booked = seats(database, lesson_id)
+            cached = database.get_lesson_details(lesson_id).seats
+            print(f"{n_students} studenti per {capacity} posti in {elapsed:.2f} s: {results[BookingResult.BOOKED]} prenotati, "
+                  f"{results[BookingResult.SOLD_OUT]} posti esauriti, {available} posti rimasti, {booked} prenotazioni")
+            assert results[BookingResult.BOOKED] == booked == min(capacity, n_students)
+            assert results[BookingResult.SOLD_OUT] == n_students - booked
+            assert available == capacity - booked >= 0
+            assert cached == available, f"La cache mostra {cached} posti invece di {available}"
+
+            # Doppio tocco su "Prenota": due richieste contemporanee per ogni studente
+            lesson_id, capacity = lessons[1]
+            students = emails[:N_DOUBLE_TAPS]
+            results = Counter(executor.map(lambda email: (email, database.insert_booking(lesson_id, email)), [email for email in students for _ in range(2)]))
+            available, booked = seats(database, lesson_id)
+            print(f"doppio tocco su Prenota di {len(students)} studenti: {booked} prenotazioni, {available} posti rimasti")
+            for email in students:
+                assert results[(email, BookingResult.BOOKED)] == 1 and results[(email, BookingResult.ALREADY_BOOKED)] == 1, email
+            assert booked == len(students) and available == capacity - len(students)
+
+            # Doppio tocco su "Annulla": la seconda richiesta non trova la prenotazione e non libera un altro posto
+            with database.pool.connection() as connection:
+                bookings = [row[0] for row in connection.execute("SELECT id_prenotazione FROM Prenotazioni WHERE ?=id_lezione", (lesson_id,))]
+            results = Counter(executor.map(lambda booking_id: (booking_id, database.cancel_booking(booking_id, lesson_id)[0]), [booking_id for booking_id in bookings for _ in range(2)]))
+            available, booked = seats(database, lesson_id)
+            print(f"doppio tocco su Annulla di {len(bookings)} prenotazioni: {booked} prenotazioni, {available} posti rimasti")
+            for booking_id in bookings:
+                assert results[(booking_id, True)] == 1 and results[(booking_id, False)] == 1, booking_id
+            assert booked == 0 and available == capacity
+
+        # Una lettura iniziata prima di una prenotazione e finita dopo non rimette in cache i posti vecchi
+        lesson_id, _ = lessons[1]
+        database.lessons_cache.invalidate(lesson_id)
+        read, booked = Event(), Event()
+        from_row = models.Lesson.from_row
+        def slow_from_row(row):
+            read.set()
+            booked.wait()
+            return from_row(row)
+        models.Lesson.from_row = slow_from_row
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            reader = executor.submit(database.get_lesson_details, lesson_id)
+            read.wait()
+            models.Lesson.from_row = from_row
+            database.insert_booking(lesson_id, emails[-1])
+            booked.set()
+            stale = reader.result().seats
+        available, _ = seats(database, lesson_id)
+        cached = database.get_lesson_details(lesson_id).seats
+        print(f"lettura durante una prenotazione: letti {stale} posti, in cache {cached}, nel database {available}")
+        assert cached == available, f"La cache mostra {cached} posti invece di {available}"
+
+        # Una connessione chiusa durante l'uso viene scartata: le richieste successive ne aprono una nuova
+        for _ in range(database.pool.size):
+            try:
+                with database.pool.connection() as connection:
+                    connection.close()
+                    connection.execute("SELECT 1")
+            except sqlite3.ProgrammingError:
+                pass
+        assert database.insert_booking(lesson_id, emails[0]) == BookingResult.BOOKED
+        print(f"connessioni chiuse durante l'uso scartate, {database.pool.size} connessioni nel pool")
+
+        database.close()
+
+if __name__ == "__main__":
+    main()
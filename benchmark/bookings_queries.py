@@ -0,0 +1,63 @@
+"""
+Controllo di regressione sull'elenco delle prenotazioni: per studenti con 1, 40 e 400 prenotazioni
+mostra tutte le pagine di Bot.list_bookings e verifica che ogni pagina esegua lo stesso numero di query,
+qualunque sia il numero di prenotazioni, e che le pagine contengano tutte le prenotazioni una volta sola.
+
+    python -m benchmark.bookings_queries
+"""
+import asyncio
+import logging
+import os
+from tempfile import TemporaryDirectory
+from benchmark.common import create_database, add_synthetic_lessons, add_users, make_bot
+from benchmark.fakes import FakeBot, callback_update, fake_context
+
+BOOKINGS_PER_USER = [1, 40, 400]
+
+async def run():
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bookings.db")
+        connection = create_database(path)
+        add_synthetic_lessons(connection, max(BOOKINGS_PER_USER), days=60)
+        emails = add_users(connection, len(BOOKINGS_PER_USER))
+        lessons = [row[0] for row in connection.execute("SELECT id_lezione FROM Lezioni")]
+        for email, n_bookings in zip(emails, BOOKINGS_PER_USER):
+            connection.executemany("INSERT INTO Prenotazioni (data, ora, id_lezione, email_utente) VALUES ('2024-01-01', '09:00', ?, ?)",
+                                   [(lesson_id, email) for lesson_id in lessons[:n_bookings]])
+        connection.commit()
+        connection.close()
+
+        bot, queries = await make_bot(path)
+        fake_bot = FakeBot()
+
+        per_page = set()
+        print(f"{'prenotazioni':>12}{'pagine':>8}{'query per pagina':>18}")
+        for user_id, (email, n_bookings) in enumerate(zip(emails, BOOKINGS_PER_USER), 1):
+            context = fake_context(fake_bot, {'email': email})
+            data = "visualizza_prenotazioni"
+            shown = []
+            counts = []
+            while data is not None:
+                update = callback_update(fake_bot, user_id, data)
+                before = queries.count
+                await bot.list_bookings(update, context)
+                counts.append(queries.count - before)
+
+                keyboard = update.callback_query.reply_markup.inline_keyboard
+                shown += [button.callback_data for row in keyboard for button in row if button.callback_data.startswith("prenotazione-")]
+                data = next((button.callback_data for row in keyboard for button in row if button.callback_data.startswith("prenotazioni-avanti-")), None)
+
+            print(f"{n_bookings:>12}{len(counts):>8}{', '.join(map(str, sorted(set(counts)))):>18}")
+            assert len(shown) == len(set(shown)) == n_bookings, f"{len(shown)} prenotazioni mostrate invece di {n_bookings}"
+            per_page.update(counts)
+
+        bot.database.close()
+
+    assert len(per_page) == 1, f"Il numero di query per pagina cambia con il numero di prenotazioni: {sorted(per_page)}"
+
+def main():
+    logging.disable(logging.WARNING)
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
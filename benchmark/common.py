@@ -0,0 +1,103 @@
+import sqlite3
+from pathlib import Path
+from random import Random
+from datetime import date, timedelta
+from benchmark.fakes import FakeEmailSender
+
+SCHEMA = Path(__file__).resolve().parent.parent / "database" / "database.sql"
+
+"""
+Crea un database SQLite locale a partire da database/database.sql,
+saltando le istruzioni per il DBMS (DROP/CREATE DATABASE, USE) che SQLite non supporta.
+"""
+def create_database(path: str):
+    lines = []
+    for line in SCHEMA.read_text(encoding="utf-8").splitlines():
+        if line.upper().startswith(("DROP DATABASE", "CREATE DATABASE", "USE ")):
+            continue
+        lines.append(line)
+
+    connection = sqlite3.connect(path)
+    connection.executescript("\n".join(lines))
+    connection.commit()
+    return connection
+
+"""
+Aggiunge n_lessons lezioni casuali distribuite tra le materie e le aule esistenti,
+a partire da oggi e per il numero di giorni indicato.
+"""
+def add_synthetic_lessons(connection, n_lessons: int, days: int = 365, seed: int = 0):
+    random = Random(seed)
+    subjects = [row[0] for row in connection.execute("SELECT nome FROM Materie")]
+    rooms = connection.execute("SELECT nome, posti_totali FROM Aule").fetchall()
+    professors = connection.execute("SELECT nome, cognome FROM Professori").fetchall()
+    hours = ["09:00 - 11:00", "11:00 - 13:00", "14:00 - 16:00", "16:00 - 18:00"]
+    today = date.today()
+
+    rows = []
+    for i in range(n_lessons):
+        room = random.choice(rooms)
+        professor = random.choice(professors)
+        day = today + timedelta(days=random.randrange(days))
+        rows.append((day.isoformat(), random.choice(hours), f"Lezione {i}", room[1], random.choice(subjects), room[0], professor[0], professor[1]))
+
+    insert = "INSERT INTO Lezioni (data, ora, descrizione, posti_disponibili, nome_materia, nome_aula, nome_professore, cognome_professore) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    connection.executemany(insert, rows)
+    connection.commit()
+
+def add_users(connection, n_users: int, seed: int = 0) -> list:
+    random = Random(seed)
+    courses = connection.execute("SELECT nome FROM CorsiDiLaurea").fetchall()
+    rows = [(f"studente{i}@studenti.unipg.it", f"Nome{i}", f"Cognome{i}", random.randint(1, 3), random.choice(courses)[0]) for i in range(n_users)]
+    connection.executemany("INSERT INTO Utenti (email, nome, cognome, anno_di_corso, nome_corso) VALUES (?, ?, ?, ?, ?)", rows)
+    connection.commit()
+    return [row[0] for row in rows]
+
+"""
+Conta tutte le query eseguite sulle connessioni del pool di DatabaseManager, compresi i controlli di salute.
+Va creato prima di DatabaseManager.connect, perché vengono tracciate solo le connessioni aperte dopo.
+"""
+class QueryCounter:
+    def __init__(self, manager):
+        self.count = 0
+        self.statements = []
+        create_connection = manager.pool.create_connection
+
+        def create_traced_connection():
+            connection = create_connection()
+            connection.set_trace_callback(self.trace)
+            return connection
+        manager.pool.create_connection = create_traced_connection
+
+    def trace(self, statement: str):
+        self.count += 1
+        self.statements.append(statement)
+
+"""
+Prepara un Bot completo sul database SQLite in 'path', come fa main.py ma senza Telegram:
+DatabaseManager con il percorso passato esplicitamente (senza cambiare CONN_DB), conteggio delle query,
+AsyncDatabaseManager, catalogo dei corsi caricato, email finte e limiti predefiniti.
+Ritorna il Bot e il contatore delle query; il database si chiude con bot.database.close().
+"""
+async def make_bot(path: str, rate_limits=None) -> tuple:
+    from database_manager import DatabaseManager, AsyncDatabaseManager
+    from course_catalog import CourseCatalog
+    from notifications import NotificationScheduler
+    from rate_limiter import RateLimits
+    from bot import Bot
+
+    manager = DatabaseManager(path)
+    queries = QueryCounter(manager)
+    database = AsyncDatabaseManager(manager)
+    database.connect()
+    courses = CourseCatalog(database)
+    await courses.load()
+    bot = Bot(database, courses, FakeEmailSender(), NotificationScheduler(database), rate_limits or RateLimits())
+    return bot, queries
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1)))
+    return ordered[index]
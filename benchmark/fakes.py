@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+from telegram.error import BadRequest
+
+"""
+Oggetti finti che imitano quanto basta di Telegram per eseguire gli handler del Bot senza rete:
+ogni chiamata all'API viene solo contata.
+Come Telegram, il finto bot ricorda il contenuto di ogni messaggio e rifiuta le modifiche che lo lasciano identico.
+"""
+class FakeBot:
+    def __init__(self):
+        self.requests = 0
+        self.sent = []
+        # (chat_id, message_id) -> (testo, formattazione, tastiera), e ultimo message_id di ogni chat
+        self.messages = {}
+        self.last_message_id = {}
+
+    async def send_message(self, chat_id: int, text: str, parse_mode=None, reply_markup=None, **kwargs):
+        self.requests += 1
+        self.sent.append((chat_id, text))
+        message_id = self.last_message_id[chat_id] = self.last_message_id.get(chat_id, 0) + 1
+        message = fake_message(chat_id, message_id)
+        self.messages[(chat_id, message.message_id)] = (text, parse_mode, reply_markup)
+        return message
+
+    def edit_message(self, chat_id: int, message_id: int, text: str, parse_mode=None, reply_markup=None):
+        self.requests += 1
+        if self.messages.get((chat_id, message_id)) == (text, parse_mode, reply_markup):
+            raise BadRequest("Message is not modified: specified new message content and reply markup are exactly the same as a current content and reply markup of the message")
+        self.messages[(chat_id, message_id)] = (text, parse_mode, reply_markup)
+
+class FakeMessage:
+    def __init__(self, bot: FakeBot, chat_id: int, text: str):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.text = text
+
+    async def reply_text(self, text: str, **kwargs):
+        return await self.bot.send_message(self.chat_id, text, **kwargs)
+
+class FakeCallbackQuery:
+    def __init__(self, bot: FakeBot, data: str, message):
+        self.bot = bot
+        self.data = data
+        self.message = message
+        self.text = None
+        self.reply_markup = None
+
+    async def answer(self, *args, **kwargs):
+        self.bot.requests += 1
+
+    async def edit_message_text(self, text: str, parse_mode=None, reply_markup=None, **kwargs):
+        self.text = text
+        self.reply_markup = reply_markup
+        self.bot.edit_message(self.message.chat.id, self.message.message_id, text, parse_mode, reply_markup)
+
+class FakeEmailSender:
+    def __init__(self):
+        self.sent = 0
+
+    def send(self, email: str, subject: str, body: str):
+        self.sent += 1
+
+def fake_message(chat_id: int, message_id: int) -> SimpleNamespace:
+    return SimpleNamespace(chat=SimpleNamespace(id=chat_id), message_id=message_id)
+
+def fake_user(user_id: int) -> SimpleNamespace:
+    return SimpleNamespace(id=user_id, first_name=f"Studente{user_id}")
+
+def message_update(bot: FakeBot, user_id: int, text: str) -> SimpleNamespace:
+    return SimpleNamespace(effective_user=fake_user(user_id), effective_chat=SimpleNamespace(id=user_id), message=FakeMessage(bot, user_id, text), callback_query=None)
+
+"""
+Pressione di un pulsante del messaggio message_id della chat dell'utente (di default il primo)
+"""
+def callback_update(bot: FakeBot, user_id: int, data: str, message_id: int = 1) -> SimpleNamespace:
+    query = FakeCallbackQuery(bot, data, fake_message(user_id, message_id))
+    return SimpleNamespace(effective_user=fake_user(user_id), effective_chat=SimpleNamespace(id=user_id), message=None, callback_query=query)
+
+def fake_context(bot: FakeBot, user_data: dict) -> SimpleNamespace:
+    return SimpleNamespace(bot=bot, user_data=user_data)
@@ -0,0 +1,103 @@
+"""
+Simula client che inondano il bot di richieste e verifica che i limitatori le fermino:
+lo stesso utente che chiede continuamente codici, molti utenti che chiedono codici per la stessa email,
+tentativi ripetuti di indovinare il codice e raffiche di tocchi su "Prenota".
+Misura anche il costo di un controllo del limitatore e verifica che lo stato sopravviva a un riavvio.
+
+    python -m benchmark.flood [richieste per scenario]
+"""
+import asyncio
+import logging
+import os
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from benchmark.common import create_database, add_synthetic_lessons, add_users, make_bot
+from benchmark.fakes import FakeBot, message_update, callback_update, fake_context
+
+N_REQUESTS = 1_000
+N_CHECKS = 1_000_000
+
+async def run(n_requests: int):
+    from rate_limiter import RateLimits, RateLimitStore, parse_limit
+    from bot import MAIN_MENU
+    import metrics
+
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, "flood.db")
+        connection = create_database(path)
+        add_synthetic_lessons(connection, n_requests, days=7)
+        emails = add_users(connection, 2)
+        lessons = [row[0] for row in connection.execute("SELECT id_lezione FROM Lezioni")]
+        connection.close()
+
+        limits = RateLimits()
+        bot, _ = await make_bot(path, limits)
+        database = bot.database
+        email_sender = bot.email_sender
+        fake_bot = FakeBot()
+
+        # Lo stesso utente invia la sua email di continuo: partono al massimo code_sends_email codici
+        for _ in range(n_requests):
+            context = fake_context(fake_bot, {'chat_id': 1})
+            await bot.authentication(message_update(fake_bot, 1, emails[0]), context)
+        print(f"stesso utente, {n_requests} richieste di codice: {email_sender.sent} email inviate")
+        assert email_sender.sent <= parse_limit("3/600")[0]
+
+        # Molti utenti chiedono il codice per la stessa email: il limite per email vale comunque
+        sent_before = email_sender.sent
+        for user_id in range(100, 100 + n_requests):
+            context = fake_context(fake_bot, {'chat_id': user_id})
+            await bot.authentication(message_update(fake_bot, user_id, emails[1]), context)
+        print(f"{n_requests} utenti, stessa email: {email_sender.sent - sent_before} email inviate")
+        assert email_sender.sent - sent_before <= parse_limit("3/600")[0]
+
+        # Tentativi ripetuti di indovinare il codice
+        failed_before = metrics.FAILED_VERIFICATIONS.values.get(None, 0)
+        for _ in range(n_requests):
+            context = fake_context(fake_bot, {'chat_id': 2, 'email': emails[1], 'codice': 12345})
+            await bot.verify_code(message_update(fake_bot, 2, "54321"), context)
+        checked = metrics.FAILED_VERIFICATIONS.values.get(None, 0) - failed_before
+        print(f"{n_requests} codici inviati: {checked} confrontati")
+        assert checked <= parse_limit("5/600")[0]
+
+        # Raffica di tocchi su "Prenota" per lezioni diverse
+        context = fake_context(fake_bot, {'chat_id': 3, 'email': emails[0]})
+        start = perf_counter()
+        for lesson_id in lessons:
+            assert await bot.book_lesson(callback_update(fake_bot, 3, f"prenota-{lesson_id}"), context) == MAIN_MENU
+        elapsed = perf_counter() - start
+        booked = len((await database.get_bookings(emails[0], page_size=n_requests))[0])
+        capacity, period = parse_limit("10/10")
+        print(f"{len(lessons)} tocchi su Prenota in {elapsed:.2f} s: {booked} prenotazioni")
+        assert booked <= capacity + elapsed * capacity / period + 1
+
+        # Un callback con una data impossibile riporta alla settimana invece di sollevare un'eccezione
+        context = fake_context(fake_bot, {'chat_id': 3, 'email': emails[0]})
+        assert await bot.list_lessons(callback_update(fake_bot, 3, "giorno-20241340"), context) == MAIN_MENU
+        assert context.user_data['finestra'] == ("settimana",)
+        print("giorno non valido nel callback: mostrata la settimana")
+        database.close()
+
+        # Costo di un controllo
+        limiter = limits.mutations
+        start = perf_counter()
+        for i in range(N_CHECKS):
+            limiter.allow(i % 1000)
+        print(f"controllo del limitatore: {(perf_counter() - start) / N_CHECKS * 1e9:.0f} ns")
+
+        # Lo stato salvato sopravvive a un riavvio
+        store = RateLimitStore(os.path.join(directory, "limits.db"))
+        store.save(limits)
+        restarted = RateLimits()
+        store.load(restarted)
+        assert not restarted.code_sends_email.allow(emails[1]), "stato dei limiti perso dopo il riavvio"
+        print(f"stato salvato: {sum(len(limiter.dump()) for limiter in limits.limiters().values())} secchi, ripristinati dopo il riavvio")
+
+def main():
+    logging.disable(logging.WARNING)
+    n_requests = int(sys.argv[1]) if len(sys.argv) > 1 else N_REQUESTS
+    asyncio.run(run(n_requests))
+
+if __name__ == "__main__":
+    main()
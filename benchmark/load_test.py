@@ -0,0 +1,91 @@
+"""
+Simula migliaia di studenti che eseguono il percorso completo del Bot:
+start → login → authentication → verify_code → show_menu → list_lessons → view_lesson → book_lesson
+su un database SQLite locale, con un finto bot Telegram e un finto invio delle email.
+Riporta il throughput, la latenza p50/p95/p99 di ogni handler e il numero di query per percorso.
+
+    python -m benchmark.load_test [numero di studenti] [studenti contemporanei]
+"""
+import asyncio
+import logging
+import os
+import sys
+from collections import defaultdict
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from benchmark.common import create_database, add_synthetic_lessons, add_users, percentile, make_bot
+from benchmark.fakes import FakeBot, message_update, callback_update, fake_context
+
+N_STUDENTS = 2_000
+CONCURRENT_STUDENTS = 100
+N_LESSONS = 2_000
+
+class LoadTest:
+    def __init__(self, bot, fake_bot: FakeBot):
+        self.bot = bot
+        self.fake_bot = fake_bot
+        self.timings = defaultdict(list)
+
+    async def call(self, handler, update, context):
+        start = perf_counter()
+        state = await handler(update, context)
+        self.timings[handler.__name__].append(perf_counter() - start)
+        return state
+
+    async def student(self, user_id: int, email: str):
+        bot = self.bot
+        context = fake_context(self.fake_bot, {})
+
+        await self.call(bot.start, message_update(self.fake_bot, user_id, "/start"), context)
+        await self.call(bot.login, callback_update(self.fake_bot, user_id, "login"), context)
+        await self.call(bot.authentication, message_update(self.fake_bot, user_id, email), context)
+        await self.call(bot.verify_code, message_update(self.fake_bot, user_id, str(context.user_data['codice'])), context)
+        await self.call(bot.show_menu, callback_update(self.fake_bot, user_id, "conferma"), context)
+
+        update = callback_update(self.fake_bot, user_id, "visualizza_lezioni")
+        await self.call(bot.list_lessons, update, context)
+        lessons = [row[0].callback_data for row in update.callback_query.reply_markup.inline_keyboard if row[0].callback_data.startswith("lezione-")]
+        if not lessons:
+            return
+
+        lesson = lessons[user_id % len(lessons)]
+        await self.call(bot.view_lesson, callback_update(self.fake_bot, user_id, lesson), context)
+        await self.call(bot.book_lesson, callback_update(self.fake_bot, user_id, lesson.replace("lezione-", "prenota-")), context)
+
+async def run(n_students: int, concurrent_students: int):
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, "load.db")
+        connection = create_database(path)
+        add_synthetic_lessons(connection, N_LESSONS, days=7)
+        emails = add_users(connection, n_students)
+        connection.close()
+
+        bot, queries = await make_bot(path)
+        database = bot.database
+        fake_bot = FakeBot()
+        load_test = LoadTest(bot, fake_bot)
+        semaphore = asyncio.Semaphore(concurrent_students)
+
+        async def limited(user_id: int, email: str):
+            async with semaphore:
+                await load_test.student(user_id, email)
+
+        start = perf_counter()
+        await asyncio.gather(*(limited(user_id, email) for user_id, email in enumerate(emails)))
+        elapsed = perf_counter() - start
+        database.close()
+
+    print(f"{n_students} studenti ({concurrent_students} contemporanei) in {elapsed:.2f} s: {n_students / elapsed:.0f} percorsi/s")
+    print(f"query al database per percorso: {queries.count / n_students:.1f} | richieste a Telegram per percorso: {fake_bot.requests / n_students:.1f}")
+    print(f"{'handler':<16}{'chiamate':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, values in load_test.timings.items():
+        print(f"{name:<16}{len(values):>10}{percentile(values, 50) * 1000:>10.2f}{percentile(values, 95) * 1000:>10.2f}{percentile(values, 99) * 1000:>10.2f}")
+
+def main():
+    logging.disable(logging.INFO)
+    n_students = int(sys.argv[1]) if len(sys.argv) > 1 else N_STUDENTS
+    concurrent_students = int(sys.argv[2]) if len(sys.argv) > 2 else CONCURRENT_STUDENTS
+    asyncio.run(run(n_students, concurrent_students))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Controlla che NotificationScheduler rispetti i limiti di invio: accoda molti messaggi
+(anche più d'uno per la stessa chat), esegue send_pending come farebbe la job queue
+e verifica che in nessun secondo si superino NOTIFICATIONS_RATE messaggi in totale
+e che due messaggi alla stessa chat siano distanti almeno NOTIFICATIONS_INTERVAL secondi.
+
+    python -m benchmark.notifications_rate [numero di chat] [messaggi al secondo]
+"""
+import asyncio
+import sys
+from collections import defaultdict
+from time import monotonic
+from benchmark.fakes import FakeBot, fake_context
+
+N_CHATS = 200
+RATE = 50
+PER_CHAT_INTERVAL = 1.0
+TICK = 0.1
+
+class TimedBot(FakeBot):
+    def __init__(self):
+        super().__init__()
+        self.times = []
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        await super().send_message(chat_id, text, **kwargs)
+        self.times.append((monotonic(), chat_id))
+
+async def run(n_chats: int, rate: float):
+    from notifications import NotificationScheduler
+
+    scheduler = NotificationScheduler(None, rate, PER_CHAT_INTERVAL, TICK)
+    fake_bot = TimedBot()
+    context = fake_context(fake_bot, {})
+
+    # Due messaggi accodati insieme per la stessa chat vengono uniti, il terzo arriva dopo il primo invio
+    for chat_id in range(n_chats):
+        scheduler.enqueue(chat_id, "primo")
+        scheduler.enqueue(chat_id, "secondo")
+
+    start = monotonic()
+    late_messages = False
+    while scheduler.pending or not late_messages:
+        await scheduler.send_pending(context)
+        if not late_messages and len(fake_bot.sent) >= n_chats // 2:
+            for chat_id in range(n_chats):
+                scheduler.enqueue(chat_id, "terzo")
+            late_messages = True
+        await asyncio.sleep(TICK)
+    elapsed = monotonic() - start
+
+    times = [sent for sent, _ in fake_bot.times]
+    max_per_second = max(sum(1 for other in times if sent <= other < sent + 1) for sent in times)
+
+    last_by_chat = {}
+    min_gap = float("inf")
+    for sent, chat_id in fake_bot.times:
+        if chat_id in last_by_chat:
+            min_gap = min(min_gap, sent - last_by_chat[chat_id])
+        last_by_chat[chat_id] = sent
+
+    messages_by_chat = defaultdict(int)
+    for chat_id, _ in fake_bot.sent:
+        messages_by_chat[chat_id] += 1
+
+    print(f"{fake_bot.requests} messaggi a {n_chats} chat in {elapsed:.2f} s")
+    print(f"massimo in un secondo: {max_per_second} (limite {rate:.0f}) | distanza minima per chat: {min_gap:.2f} s (limite {PER_CHAT_INTERVAL} s)")
+    assert max_per_second <= rate, "superato il limite globale di invio"
+    assert min_gap >= PER_CHAT_INTERVAL - TICK / 2, "superato il limite di invio per chat"
+    assert all(count <= 2 for count in messages_by_chat.values()), "messaggi per la stessa chat non uniti"
+
+def main():
+    n_chats = int(sys.argv[1]) if len(sys.argv) > 1 else N_CHATS
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else RATE
+    asyncio.run(run(n_chats, rate))
+
+if __name__ == "__main__":
+    main()
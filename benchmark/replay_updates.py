@@ -0,0 +1,91 @@
+"""
+Riproduce aggiornamenti intercalati di molti utenti finti attraverso PerUserUpdateProcessor
+e verifica che quelli di ogni utente vengano elaborati in ordine, mentre utenti diversi procedono in parallelo.
+Poi verifica che un utente che invia molti aggiornamenti lenti non rallenti gli altri utenti.
+
+    python -m benchmark.replay_updates
+"""
+import asyncio
+from random import Random
+from time import perf_counter
+from telegram import Update, User, Message, Chat
+from update_processor import PerUserUpdateProcessor
+
+N_USERS = 200
+UPDATES_PER_USER = 10
+MAX_CONCURRENT_UPDATES = 64
+HANDLER_LATENCY = 0.01
+FLOOD_UPDATES = 10
+FLOOD_LATENCY = 0.2
+FLOOD_CONCURRENT_UPDATES = 4
+# Tempo massimo per un aggiornamento senza attesa di un altro utente mentre il primo invia FLOOD_UPDATES aggiornamenti
+MAX_OTHER_LATENCY = 0.05
+
+def fake_update(update_id: int, user_id: int) -> Update:
+    user = User(id=user_id, first_name=f"Studente{user_id}", is_bot=False)
+    chat = Chat(id=user_id, type=Chat.PRIVATE)
+    message = Message(message_id=update_id, date=None, chat=chat, from_user=user, text=str(update_id))
+    return Update(update_id=update_id, message=message)
+
+async def main():
+    random = Random(0)
+    updates = [(user_id, i) for user_id in range(N_USERS) for i in range(UPDATES_PER_USER)]
+    # Mescola gli aggiornamenti mantenendo l'ordine relativo di ogni utente
+    random.shuffle(updates)
+    counters = {}
+    for n, (user_id, _) in enumerate(updates):
+        counters[user_id] = counters.get(user_id, 0) + 1
+        updates[n] = (user_id, counters[user_id])
+
+    processed = {user_id: [] for user_id in range(N_USERS)}
+    in_progress = set()
+    peak = 0
+
+    async def handler(user_id: int, sequence: int):
+        assert user_id not in in_progress, f"Due aggiornamenti dell'utente {user_id} elaborati insieme"
+        nonlocal peak
+        in_progress.add(user_id)
+        peak = max(peak, len(in_progress))
+        await asyncio.sleep(random.uniform(0, 2 * HANDLER_LATENCY))
+        processed[user_id].append(sequence)
+        in_progress.remove(user_id)
+
+    processor = PerUserUpdateProcessor(MAX_CONCURRENT_UPDATES)
+    start = perf_counter()
+    async with processor:
+        # Come fa Application con gli aggiornamenti concorrenti: un task per aggiornamento, in ordine di arrivo
+        tasks = [asyncio.create_task(processor.process_update(fake_update(n, user_id), handler(user_id, sequence))) for n, (user_id, sequence) in enumerate(updates)]
+        await asyncio.gather(*tasks)
+    elapsed = perf_counter() - start
+
+    for user_id, sequence in processed.items():
+        assert sequence == sorted(sequence), f"Aggiornamenti dell'utente {user_id} elaborati fuori ordine: {sequence}"
+    assert peak <= MAX_CONCURRENT_UPDATES, f"{peak} aggiornamenti elaborati insieme, massimo {MAX_CONCURRENT_UPDATES}"
+
+    sequential = len(updates) * HANDLER_LATENCY
+    print(f"{len(updates)} aggiornamenti di {N_USERS} utenti elaborati in {elapsed:.2f} s (sequenzialmente circa {sequential:.2f} s), ordine per utente rispettato, al massimo {peak} insieme")
+
+    await flood()
+
+"""
+Un utente invia FLOOD_UPDATES aggiornamenti lenti, poi un altro utente ne invia uno che non aspetta nulla:
+i primi restano in coda sul lock del loro utente senza occupare i posti del processore.
+"""
+async def flood():
+    async def handler(latency: float):
+        await asyncio.sleep(latency)
+
+    processor = PerUserUpdateProcessor(FLOOD_CONCURRENT_UPDATES)
+    async with processor:
+        flooding = [asyncio.create_task(processor.process_update(fake_update(n, 1), handler(FLOOD_LATENCY))) for n in range(FLOOD_UPDATES)]
+        await asyncio.sleep(0)
+        start = perf_counter()
+        await processor.process_update(fake_update(FLOOD_UPDATES, 2), handler(0))
+        other = perf_counter() - start
+        await asyncio.gather(*flooding)
+
+    print(f"{FLOOD_UPDATES} aggiornamenti da {FLOOD_LATENCY} s di un utente: un altro utente attende {other * 1000:.1f} ms")
+    assert other < MAX_OTHER_LATENCY, f"L'aggiornamento dell'altro utente ha atteso {other:.2f} s"
+
+if __name__ == "__main__":
+    asyncio.run(main())
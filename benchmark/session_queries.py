@@ -0,0 +1,98 @@
+"""
+Controllo di regressione sul numero di query: esegue una sessione tipica di uno studente
+(login, menu, lezioni, prenotazione, prenotazioni) e verifica che ogni passo non esegua
+più query al database di quelle previste. Il profilo dell'utente viene letto una sola volta al login,
+il menu principale e gli elenchi non rileggono Utenti.
+
+    python -m benchmark.session_queries
+"""
+import asyncio
+import logging
+import os
+from tempfile import TemporaryDirectory
+from benchmark.common import create_database, add_synthetic_lessons, add_users, make_bot
+from benchmark.fakes import FakeBot, message_update, callback_update, fake_context
+
+"""
+Passi della sessione: (handler del Bot, testo o callback, query massime).
+"<email>", "<codice>" e gli altri segnaposto vengono sostituiti con i valori della sessione,
+presi dai pulsanti dell'ultimo messaggio mostrato.
+Una transazione conta anche BEGIN, SELECT changes() e COMMIT.
+"""
+SESSION = [
+    ("start", "/start", 0),
+    ("login", "login", 0),
+    ("authentication", "<email>", 1),
+    ("verify_code", "<codice>", 2),
+    ("show_menu", "conferma", 0),
+    ("list_lessons", "visualizza_lezioni", 2),
+    ("list_lessons", "<pagina>", 1),
+    ("view_lesson", "<lezione>", 2),
+    ("book_lesson", "<prenota>", 6),
+    ("view_lesson", "<lezione>", 2),
+    ("show_menu", "menu", 0),
+    ("list_bookings", "visualizza_prenotazioni", 1),
+    ("view_booking", "<prenotazione>", 1),
+    ("show_menu", "menu", 0),
+    ("list_lessons", "visualizza_lezioni", 1),
+]
+
+async def run():
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, "session.db")
+        connection = create_database(path)
+        add_synthetic_lessons(connection, 5_000, days=7)
+        email = add_users(connection, 1)[0]
+        connection.close()
+
+        bot, queries = await make_bot(path)
+        fake_bot = FakeBot()
+        context = fake_context(fake_bot, {})
+        user_id = 1
+        last_keyboard = []
+
+        def callback(prefix: str) -> str:
+            return next(button.callback_data for row in last_keyboard for button in row if button.callback_data.startswith(prefix))
+
+        failures = []
+        print(f"{'passo':<16}{'callback':<28}{'query':>6}{'massimo':>9}")
+        for name, data, expected in SESSION:
+            match data:
+                case "<email>":
+                    data = email
+                case "<codice>":
+                    data = str(context.user_data['codice'])
+                case "<pagina>":
+                    data = callback("lezioni-avanti-")
+                case "<lezione>":
+                    data = callback("lezione-")
+                case "<prenota>":
+                    data = callback("prenota-")
+                case "<prenotazione>":
+                    data = callback("prenotazione-")
+
+            handler = getattr(bot, name)
+            is_message = name in ("start", "authentication", "verify_code")
+            update = message_update(fake_bot, user_id, data) if is_message else callback_update(fake_bot, user_id, data)
+
+            before = queries.count
+            await handler(update, context)
+            executed = queries.count - before
+            if update.callback_query is not None and update.callback_query.reply_markup is not None:
+                last_keyboard = update.callback_query.reply_markup.inline_keyboard
+
+            print(f"{name:<16}{data:<28}{executed:>6}{expected:>9}")
+            if executed > expected:
+                failures.append(f"{name} ({data}): {executed} query, massimo {expected}")
+
+        bot.database.close()
+
+    print(f"totale: {queries.count} query")
+    assert not failures, "Query in più rispetto al previsto:\n" + "\n".join(failures)
+
+def main():
+    logging.disable(logging.WARNING)
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Controllo di regressione sulle richieste a Telegram: esegue una sessione tipica di uno studente
+contro il finto bot (che conta le richieste e, come Telegram, rifiuta le modifiche che lasciano un messaggio identico)
+e verifica che nessun passo faccia più richieste di quelle previste.
+Ripremere un pulsante che mostra la stessa vista costa solo la risposta alla callback query,
+e i messaggi consecutivi alla stessa chat vengono uniti.
+
+    python -m benchmark.telegram_requests
+"""
+import asyncio
+import logging
+import os
+from tempfile import TemporaryDirectory
+from benchmark.common import create_database, add_synthetic_lessons, add_users, make_bot
+from benchmark.fakes import FakeBot, message_update, callback_update, fake_context
+
+"""
+Passi della sessione: (handler del Bot, testo o callback, richieste massime).
+I segnaposto vengono sostituiti come in benchmark.session_queries, "<ripeti>" ripreme il pulsante del passo precedente.
+"<riavvio>" simula un riavvio del bot, che perde le impronte dei messaggi: la modifica inutile viene allora
+rifiutata da Telegram senza errori per l'utente.
+"""
+SESSION = [
+    ("start", "/start", 1),
+    ("login", "login", 2),
+    ("authentication", "<email>", 1),
+    ("verify_code", "00000", 1),
+    ("authentication", "<email>", 1),
+    ("verify_code", "<codice>", 1),
+    ("show_menu", "conferma", 2),
+    ("list_lessons", "visualizza_lezioni", 2),
+    ("list_lessons", "filtro-settimana", 1),
+    ("list_lessons", "filtro-settimana", 1),
+    ("list_lessons", "filtro-oggi", 2),
+    ("view_lesson", "<lezione>", 2),
+    ("view_lesson", "<ripeti>", 1),
+    ("show_menu", "menu", 2),
+    ("show_menu", "menu", 1),
+    ("show_menu", "<riavvio>", 2),
+    ("show_menu", "menu", 1),
+]
+
+async def run():
+    from outbound import Outbound
+
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, "requests.db")
+        connection = create_database(path)
+        add_synthetic_lessons(connection, 2_000, days=7)
+        email = add_users(connection, 1)[0]
+        connection.close()
+
+        bot, _ = await make_bot(path)
+        fake_bot = FakeBot()
+        context = fake_context(fake_bot, {})
+        user_id = 1
+        last_keyboard = []
+        previous = None
+
+        def callback(prefix: str) -> str:
+            return next(button.callback_data for row in last_keyboard for button in row if button.callback_data.startswith(prefix))
+
+        failures = []
+        print(f"{'passo':<16}{'callback':<22}{'richieste':>10}{'massimo':>9}")
+        for name, data, expected in SESSION:
+            match data:
+                case "<email>":
+                    data = email
+                case "<codice>":
+                    data = str(context.user_data['codice'])
+                case "<lezione>":
+                    data = callback("lezione-")
+                case "<ripeti>":
+                    data = previous
+                case "<riavvio>":
+                    bot.outbound = Outbound()
+                    data = "menu"
+
+            handler = getattr(bot, name)
+            if name in ("start", "authentication", "verify_code"):
+                update = message_update(fake_bot, user_id, data)
+            else:
+                # I pulsanti premuti sono sempre quelli dell'ultimo messaggio inviato dal bot
+                update = callback_update(fake_bot, user_id, data, fake_bot.last_message_id[user_id])
+
+            before = fake_bot.requests
+            await handler(update, context)
+            executed = fake_bot.requests - before
+            if update.callback_query is not None and update.callback_query.reply_markup is not None:
+                last_keyboard = update.callback_query.reply_markup.inline_keyboard
+
+            previous = data
+            print(f"{name:<16}{data[:20]:<22}{executed:>10}{expected:>9}")
+            if executed > expected:
+                failures.append(f"{name} ({data}): {executed} richieste, massimo {expected}")
+
+        bot.database.close()
+
+    print(f"totale: {fake_bot.requests} richieste, {len(fake_bot.sent)} messaggi inviati")
+    assert not failures, "Richieste in più rispetto al previsto:\n" + "\n".join(failures)
+
+def main():
+    logging.disable(logging.WARNING)
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
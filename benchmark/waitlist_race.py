@@ -0,0 +1,113 @@
+"""
+Mette in gara annullamenti e iscrizioni alla lista d'attesa di una stessa lezione attraverso AsyncDatabaseManager,
+su un database SQLite locale, e dopo ogni giro verifica che:
+i posti disponibili non siano mai negativi, prenotazioni e posti disponibili diano i posti dell'aula,
+i posti liberati vadano agli studenti in attesa da più tempo e nessuno studente sia insieme prenotato e in attesa.
+Infine verifica che la lista d'attesa di una lezione che non esiste più venga rifiutata.
+
+    python -m benchmark.waitlist_race
+"""
+import asyncio
+import logging
+import os
+from itertools import islice
+from tempfile import TemporaryDirectory
+from benchmark.common import create_database, add_synthetic_lessons, add_users
+
+N_WAITING = 60
+N_ROUNDS = 6
+NEW_STUDENTS_PER_ROUND = 20
+POOL_SIZE = 8
+
+def state(database, lesson_id: int) -> tuple[int, list, list]:
+    with database.pool.connection() as connection:
+        seats = connection.execute("SELECT posti_disponibili FROM Lezioni WHERE ?=id_lezione", (lesson_id,)).fetchone()[0]
+        booked = connection.execute("SELECT id_prenotazione, email_utente FROM Prenotazioni WHERE ?=id_lezione", (lesson_id,)).fetchall()
+        waiting = [row[0] for row in connection.execute("SELECT email_utente FROM ListaAttesa WHERE ?=id_lezione ORDER BY id_attesa", (lesson_id,))]
+    return seats, booked, waiting
+
+def check(database, lesson_id: int, capacity: int) -> tuple[list, list]:
+    seats, booked, waiting = state(database, lesson_id)
+    emails = [email for _, email in booked]
+    assert seats >= 0, f"{seats} posti disponibili"
+    assert len(booked) + seats == capacity, f"{len(booked)} prenotazioni e {seats} posti per {capacity} posti totali"
+    assert len(set(emails)) == len(emails), "Studente prenotato due volte"
+    assert not set(emails) & set(waiting), f"Studenti prenotati e in attesa: {set(emails) & set(waiting)}"
+    return booked, waiting
+
+async def run():
+    from database_manager import DatabaseManager, AsyncDatabaseManager, BookingResult, WaitlistResult
+
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, "waitlist.db")
+        connection = create_database(path)
+        connection.execute("DELETE FROM Prenotazioni")
+        connection.execute("DELETE FROM Lezioni")
+        add_synthetic_lessons(connection, 1, days=7)
+        capacity = connection.execute("SELECT a.posti_totali FROM Lezioni l JOIN Aule a ON a.nome=l.nome_aula").fetchone()[0]
+        emails = add_users(connection, capacity + N_WAITING + N_ROUNDS * NEW_STUDENTS_PER_ROUND)
+        lesson_id = connection.execute("SELECT id_lezione FROM Lezioni").fetchone()[0]
+        connection.commit()
+        connection.close()
+
+        manager = DatabaseManager(path)
+        manager.pool.max_size = POOL_SIZE
+        database = AsyncDatabaseManager(manager)
+        database.connect()
+        students = iter(enumerate(emails))
+
+        # Un nuovo studente entra in lista d'attesa o, se nel frattempo si è liberato un posto, prenota
+        async def arrive(chat_id: int, email: str):
+            if await database.join_waitlist(lesson_id, email, chat_id) == WaitlistResult.SEATS_AVAILABLE:
+                await database.insert_booking(lesson_id, email)
+
+        results = await asyncio.gather(*(database.insert_booking(lesson_id, email) for _, email in islice(students, capacity)))
+        assert results.count(BookingResult.BOOKED) == capacity
+        results = await asyncio.gather(*(database.join_waitlist(lesson_id, email, chat_id) for chat_id, email in islice(students, N_WAITING)))
+        assert results.count(WaitlistResult.JOINED) == N_WAITING
+        booked, waiting = check(database.database, lesson_id, capacity)
+
+        # Durante la gara legge di continuo i posti disponibili, che non devono mai scendere sotto zero
+        seats_seen = []
+        async def watch(done: asyncio.Event):
+            while not done.is_set():
+                seats, _, _ = await database.run(state, database.database, lesson_id)
+                seats_seen.append(seats)
+                await asyncio.sleep(0)
+
+        promoted_total = 0
+        for round in range(1, N_ROUNDS + 1):
+            # Annullano tutti i prenotati, ognuno con un doppio tocco, mentre arrivano nuovi studenti
+            cancellations = [database.cancel_booking(booking_id, lesson_id) for booking_id, _ in booked for _ in range(2)]
+            arrivals = [arrive(chat_id, email) for chat_id, email in islice(students, NEW_STUDENTS_PER_ROUND)]
+            done = asyncio.Event()
+            watcher = asyncio.create_task(watch(done))
+            results = await asyncio.gather(*cancellations, *arrivals)
+            done.set()
+            await watcher
+            assert min(seats_seen) >= 0, f"Giro {round}: {min(seats_seen)} posti disponibili"
+            promoted = [promotion.email for cancelled, promotion in results[:len(cancellations)] if cancelled and promotion is not None]
+            assert sum(cancelled for cancelled, _ in results[:len(cancellations)]) == len(booked)
+
+            # I posti liberati vanno in ordine di arrivo: prima a chi era già in attesa, poi ai nuovi arrivati
+            from_queue = [email for email in waiting if email in promoted]
+            assert from_queue == waiting[:len(from_queue)], f"Giro {round}: promozioni fuori ordine"
+            assert len(from_queue) == min(len(promoted), len(waiting)), f"Giro {round}: promosso un nuovo arrivato prima di chi era in attesa"
+            promoted_total += len(promoted)
+
+            booked, waiting = check(database.database, lesson_id, capacity)
+            print(f"giro {round}: {len(cancellations)} annullamenti (con doppio tocco), {len(promoted)} promossi dalla lista, "
+                  f"{len(booked)} prenotati, {capacity - len(booked)} posti liberi, {len(waiting)} in attesa")
+
+        # Un pulsante rimasto su una lezione che non esiste più
+        assert await database.join_waitlist(lesson_id + 1, emails[0], 0) == WaitlistResult.NOT_FOUND
+
+        print(f"{promoted_total} promozioni in {N_ROUNDS} giri, {len(seats_seen)} letture dei posti durante la gara, posti sempre coerenti e ordine della lista rispettato")
+        database.close()
+
+def main():
+    logging.disable(logging.WARNING)
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
 import email_handler
 import logging
+import metrics
+from cache import TTLCache
+from database_manager import BookingResult, WaitlistResult
+from models import User, format_day, format_time
+from outbound import Outbound
 import re
 from enum import Enum
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from re import escape
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update, constants
 from telegram.ext import ContextTypes, ConversationHandler
@@ -17,16 +22,74 @@ states = Enum('Stato', ['NOME', 'COGNOME', 'EMAIL_DA_VERIFICARE', 'VERIFICA_EMAI
 # Stati login
 AUTHENTICATION, MAIN_MENU = range(5, 7)
 
-# Logger
-logging.basicConfig(
-    format="%(asctime)s - %(message)s", datefmt="%Y/%m/%d - %H:%M:%S", level=logging.INFO
-)
-logging.getLogger("httpx").setLevel(logging.WARNING)
+# Numero di lezioni e di prenotazioni mostrate per pagina
+LESSONS_PAGE_SIZE = 10
+BOOKINGS_PAGE_SIZE = 10
+
+# Giorni proposti nella scelta del giorno e giorni mostrati per le lezioni di una materia
+DAYS_TO_CHOOSE = 14
+SUBJECT_WINDOW_DAYS = 30
+WEEKDAYS = ["Lun", "Mar", "Mer", "Gio", "Ven", "Sab", "Dom"]
+
+# Viste (testo e tastiera) già pronte tenute in memoria, e per quanti secondi
+VIEWS_CACHE_SIZE = 4096
+VIEWS_CACHE_TTL = 3600
+
+# Logger, configurato in main con logging_config.setup_logging
 logger = logging.getLogger(__name__)
 
 class Bot:
-    def __init__(self, database):
+    def __init__(self, database, courses, email_sender, notifications, rate_limits):
         self.database = database
+        self.courses = courses
+        self.email_sender = email_sender
+        self.notifications = notifications
+        self.rate_limits = rate_limits
+        self.views = TTLCache(maxsize=VIEWS_CACHE_SIZE, ttl=VIEWS_CACHE_TTL)
+        self.outbound = Outbound()
+
+    """
+    Consuma un gettone del limitatore per la chiave indicata, se non ce ne sono più l'azione va rifiutata
+    """
+    def is_allowed(self, limiter, key, action: str) -> bool:
+        if limiter.allow(key):
+            return True
+        metrics.RATE_LIMITED.inc(action)
+        logger.warning("Limite di %s superato da %s", action, key)
+        return False
+
+    """
+    Un nuovo codice di verifica viene inviato solo se né l'utente Telegram né l'indirizzo email hanno superato il limite
+    """
+    def is_code_send_allowed(self, user_id: int, email: str) -> bool:
+        return (self.is_allowed(self.rate_limits.code_sends, user_id, "code_sends")
+                and self.is_allowed(self.rate_limits.code_sends_email, email, "code_sends"))
+
+    """
+    Legge dal callback la pagina da mostrare: "<elenco>-avanti-<id lezione>" mostra la pagina dopo la lezione,
+    "<elenco>-indietro-<id lezione>" quella prima; qualsiasi altro callback mostra la prima pagina.
+    Ritorna (after, before) da passare al database.
+    """
+    @staticmethod
+    def page_cursor(data: str) -> tuple[int | None, int | None]:
+        parts = data.split("-")
+        if len(parts) == 3 and parts[1] == "avanti":
+            return int(parts[2]), None
+        if len(parts) == 3 and parts[1] == "indietro":
+            return None, int(parts[2])
+        return None, None
+
+    """
+    Riga con i pulsanti "Indietro" e "Avanti" tra le pagine di un elenco, delimitate dalla prima e dall'ultima lezione mostrate
+    """
+    @staticmethod
+    def navigation_row(prefix: str, first_lesson_id: int, last_lesson_id: int, has_previous: bool, has_next: bool) -> list:
+        navigation = []
+        if has_previous:
+            navigation.append(InlineKeyboardButton("◀️ Indietro", callback_data=f"{prefix}-indietro-{first_lesson_id}"))
+        if has_next:
+            navigation.append(InlineKeyboardButton("Avanti ▶️", callback_data=f"{prefix}-avanti-{last_lesson_id}"))
+        return navigation
 
     """
     Chiamata quando l'utente avvia la conversazione. 
@@ -52,8 +115,7 @@ class Bot:
         
         first_message_body = f"Benvenuto nel sistema di prenotazione delle lezioni, {user.first_name}!"
         second_message_body = f"Se già ci conosciamo, effettua il login per accedere, altrimenti seleziona Registrati per creare un account."
-        await context.bot.send_message(chat_id=user_data['chat_id'], text=first_message_body)
-        await context.bot.send_message(chat_id=user_data['chat_id'], text=second_message_body, reply_markup=buttons)
+        await self.outbound.send(context.bot, user_data['chat_id'], first_message_body, second_message_body, reply_markup=buttons)
         return START_MENU
 
 
@@ -70,7 +132,7 @@ class Bot:
         query = update.callback_query
         body = f"{user.first_name}, iniziamo la registrazione!\nPer uscire dall'operazione di registrazione puoi eseguire il comando /exit"
         await query.answer()
-        await query.edit_message_text(body)
+        await self.outbound.edit(query, body)
         await context.bot.send_message(text = f"Scrivi il tuo nome", chat_id = user_data['chat_id'])
         
         user_data['stato'] = states.NOME.value
@@ -124,7 +186,7 @@ class Bot:
                 user_data['email'] = email
                 logger.info("User %s ha inviato la sua email: %s", user.first_name, email)
                 
-                is_email_registered = self.database.check_email(email)
+                is_email_registered = await self.database.check_email(email)
                 if is_email_registered:
                     logger.info("L'email %s inviata da %s è già registrata.", email, user.first_name)
                     await update.message.reply_text(f"L'email {email} è già registrata. Inseriscine un'altra.")
@@ -140,7 +202,7 @@ class Bot:
 
                 logger.info("User %s ha selezionato il corso %s", user.first_name, user_data['corso'])
                 await query.answer()
-                await query.edit_message_text(f"Hai selezionato il corso: {corso}.", reply_markup = buttons)
+                await self.outbound.edit(query, f"Hai selezionato il corso: {corso}.", reply_markup = buttons)
                 return CONFIRMATION
             
             case states.ANNO_CORSO.value:
@@ -173,48 +235,43 @@ class Bot:
         lo inserisce nel database e termina la registrazione.
         """
         if user_data['stato'] == states.ANNO_CORSO.value:
-            self.database.insert_user(user_data['nome'], user_data['cognome'], user_data['email'], int(user_data['anno']), user_data['corso'])
+            await self.database.insert_user(user_data['nome'], user_data['cognome'], user_data['email'], int(user_data['anno']), user_data['corso'])
 
-            await query.edit_message_text(f"Registrazione effettuata con successo.\nDigita il comando /start per fare il login.")
+            await self.outbound.edit(query, f"Registrazione effettuata con successo.\nDigita il comando /start per fare il login.")
             return ConversationHandler.END
         
         else:
             user_data['stato'] += 1
             
             if user_data['stato'] == states.COGNOME.value:
-                await query.edit_message_text(f"Scrivi il tuo cognome")
+                await self.outbound.edit(query, f"Scrivi il tuo cognome")
                 return PROCESSING_DATA
             
             if user_data['stato'] == states.EMAIL_DA_VERIFICARE.value:
-                await query.edit_message_text(f"Scrivi la tua email")
+                await self.outbound.edit(query, f"Scrivi la tua email")
                 return PROCESSING_DATA
             
             if user_data['stato'] == states.VERIFICA_EMAIL.value:
-                is_email_valid = email_handler.verify_email(user_data['email'], context)
+                if not self.is_code_send_allowed(update.effective_user.id, user_data['email']):
+                    user_data['stato'] = states.EMAIL_DA_VERIFICARE.value
+                    await self.outbound.edit(query, f"Hai richiesto troppi codici di verifica, riprova più tardi.")
+                    return PROCESSING_DATA
+
+                is_email_valid = email_handler.verify_email(user_data['email'], context, self.email_sender)
                 if is_email_valid:
-                    await query.edit_message_text(f"Scrivi il codice di verifica inviato alla tua email")
+                    await self.outbound.edit(query, f"Scrivi il codice di verifica inviato alla tua email")
                     return VERIFYING_EMAIL
                 else:
                     user_data['stato'] = states.EMAIL_DA_VERIFICARE.value
-                    await query.edit_message_text(f"Email non valida, inserisci un'email istituzionale da studente UniPG")
+                    await self.outbound.edit(query, f"Email non valida, inserisci un'email istituzionale da studente UniPG")
                     return PROCESSING_DATA
             
             if user_data['stato'] == states.SCELTA_CORSO.value:
-                keyboard = [[]]
-                courses = self.database.get_courses()
-                n_courses = len(courses)
-
-                for i in range(n_courses):
-                    keyboard[i//2].append(InlineKeyboardButton(courses[i], callback_data=courses[i]))
-                    if i % 2 == 1 and i != n_courses - 1:
-                        keyboard.append([])
-            
-                buttons = InlineKeyboardMarkup(keyboard)
-                await query.edit_message_text(f"Seleziona il tuo corso di laurea", reply_markup=buttons)
+                await self.outbound.edit(query, f"Seleziona il tuo corso di laurea", reply_markup=self.courses.keyboard)
                 return CHOSEN_COURSE
             
             if user_data['stato'] == states.ANNO_CORSO.value:
-                await query.edit_message_text(f"Scrivi l'anno di corso a cui sei iscritto")
+                await self.outbound.edit(query, f"Scrivi l'anno di corso a cui sei iscritto")
                 return PROCESSING_DATA
 
 
@@ -228,39 +285,29 @@ class Bot:
         
         if user_data['stato'] == states.NOME.value:
             del user_data['nome']
-            await query.edit_message_text(f"Scrivi il tuo nome")
+            await self.outbound.edit(query, f"Scrivi il tuo nome")
             return PROCESSING_DATA
         
         if user_data['stato'] == states.COGNOME.value:
             del user_data['cognome']
-            await query.edit_message_text(f"Scrivi il tuo cognome")
+            await self.outbound.edit(query, f"Scrivi il tuo cognome")
             return PROCESSING_DATA
         
         if user_data['stato'] == states.EMAIL_DA_VERIFICARE.value:
             del user_data['email']
-            await query.edit_message_text(f"Scrivi la tua email")
+            await self.outbound.edit(query, f"Scrivi la tua email")
             return PROCESSING_DATA
         
         if user_data['stato'] == states.SCELTA_CORSO.value:
             query = update.callback_query
             course = query.data
             user_data['corso'] = course
-            keyboard = [[]]
-            courses = self.database.get_courses()
-            n_courses = len(courses)
-
-            for i in range(n_courses):
-                keyboard[i//2].append(InlineKeyboardButton(courses[i], callback_data=courses[i]))
-                if i % 2 == 1 and i != n_courses - 1:
-                    keyboard.append([])
-            
-            buttons = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(f"Seleziona il tuo corso di laurea", reply_markup=buttons)
+            await self.outbound.edit(query, f"Seleziona il tuo corso di laurea", reply_markup=self.courses.keyboard)
             return CHOSEN_COURSE
         
         if user_data['stato'] == states.ANNO_CORSO.value:
             del user_data['anno']
-            await query.edit_message_text(f"Scrivi l'anno di corso a cui sei iscritto")
+            await self.outbound.edit(query, f"Scrivi l'anno di corso a cui sei iscritto")
             return PROCESSING_DATA
 
 
@@ -275,7 +322,13 @@ class Bot:
             user_data = context.user_data
             user_code = user_data['codice']
 
-            logger.info("User %s ha scritto il codice %s", user.first_name, user_message)
+            logger.info("User %s ha scritto il codice di verifica", user.first_name)
+
+            if not self.is_allowed(self.rate_limits.code_attempts, user.id, "code_attempts"):
+                del user_data['codice']
+                user_data.pop('email', None)
+                await update.message.reply_text(f"Hai inserito troppi codici errati, riprova più tardi.\nDigita /start per ricominciare.")
+                return ConversationHandler.END
             
             keyboard = [ [ InlineKeyboardButton("Continua", callback_data="conferma") ] ]
             buttons = InlineKeyboardMarkup(keyboard)
@@ -295,6 +348,9 @@ class Bot:
                 if int(user_message) == user_code:
                     logger.info("User %s ha verificato la sua email", user.first_name)
                     del user_data['codice']
+                    if not is_registering:
+                        await self.database.set_chat_id(user_data['email'], user_data['chat_id'])
+                        user_data['profilo'] = await self.database.get_user_info(user_data['email'])
                     
                     await update.message.reply_text(f"La tua email è stata verificata correttamente.", reply_markup=buttons)
                     return return_states[1]
@@ -302,14 +358,14 @@ class Bot:
 
             except ValueError:
                 logger.info("User %s ha mandato un numero non valido", user.first_name)
+                metrics.FAILED_VERIFICATIONS.inc()
                 del user_data['codice']
                 del user_data['email']
 
                 if is_registering:
                     user_data['stato'] = states.EMAIL_DA_VERIFICARE.value
                 
-                await update.message.reply_text(f"La tua email non è stata verificata correttamente.")
-                await update.message.reply_text(f"Inserisci un'altra email o reinserisci la stessa per riprovare.")
+                await self.outbound.send(context.bot, user_data['chat_id'], f"La tua email non è stata verificata correttamente.", f"Inserisci un'altra email o reinserisci la stessa per riprovare.")
                 return return_states[0]
 
 
@@ -326,7 +382,7 @@ class Bot:
         logger.info("User %s ha premuto login", user.first_name)
         
         await query.answer()
-        await query.edit_message_text(f"{user.first_name} invia l'email con cui ti sei registrato per effettuare il login.")
+        await self.outbound.edit(query, f"{user.first_name} invia l'email con cui ti sei registrato per effettuare il login.")
         return AUTHENTICATION
 
 
@@ -342,9 +398,13 @@ class Bot:
         user_data['email'] = email
         logger.info("User %s ha inviato la sua email: %s", user.first_name, email)
         
-        is_email_registered = self.database.check_email(email)
+        is_email_registered = await self.database.check_email(email)
         if is_email_registered:
-            email_handler.verify_email(email, context)
+            if not self.is_code_send_allowed(user.id, email):
+                await context.bot.send_message(chat_id=user_data['chat_id'], text=f"Hai richiesto troppi codici di verifica, riprova più tardi.")
+                return ConversationHandler.END
+
+            email_handler.verify_email(email, context, self.email_sender)
             await context.bot.send_message(chat_id=user_data['chat_id'], text=f"Inserisci il codice di verifica inviato alla tua email.")
             return VERIFYING_EMAIL
         else:
@@ -353,28 +413,19 @@ class Bot:
         
 
     """
-    Menu principale per l'utente che ha effettuato il login,
-    consente di visualizzare le lezioni o le prenotazioni.
+    Ritorna testo e tastiera di una vista dalla cache, oppure li costruisce con build(*args) e li salva.
+    Le chiavi contengono tutto lo stato mostrato nella vista (ad esempio la lezione, che è immutabile, e se l'utente è prenotato):
+    quando una prenotazione o la lezione cambiano cambia anche la chiave, quindi la cache non restituisce mai una vista superata.
     """
-    async def show_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        user = update.effective_user
-        user_data = context.user_data
-
-        """
-        user_info contiene la lista dei campi dell'utente presa dal database:
-        user_info[0] = email
-        user_info[1] = nome 
-        user_info[2] = cognome
-        user_info[3] = anno di corso
-        user_info[4] = nome corso
-        """
-        user_info = self.database.get_user_info(user_data['email'])
-        user_data['nome'] = user_info[1]
-        user_data['cognome'] = user_info[2]
-        user_data['anno'] = user_info[3]
-        user_data['corso'] = user_info[4]
+    def render(self, key: tuple, build, *args) -> tuple[str, InlineKeyboardMarkup]:
+        view = self.views.get(key)
+        if view is None:
+            view = build(*args)
+            self.views.set(key, view)
+        return view
 
-        query = update.callback_query
+    @staticmethod
+    def build_menu_view(profile: User) -> tuple[str, InlineKeyboardMarkup]:
         keyboard = [
             [
                 InlineKeyboardButton("Visualizza lezioni", callback_data="visualizza_lezioni"),
@@ -382,70 +433,180 @@ class Bot:
             ]
         ]
         buttons = InlineKeyboardMarkup(keyboard)
-        body = f"Bentornato *{user_data['nome']} {user_data['cognome']}\.*\n> *Email*: {re.escape(user_data['email'])}\n> *Corso*: {user_data['corso']}\n> *Anno*: {user_data['anno']}\nScrivere /exit per terminare la conversazione ed effettuare il logout\."
+        body = f"Bentornato *{profile.name} {profile.surname}\.*\n> *Email*: {re.escape(profile.email)}\n> *Corso*: {profile.course}\n> *Anno*: {profile.year}\nScrivere /exit per terminare la conversazione ed effettuare il logout\."
+        return body, buttons
+
+    """
+    Menu principale per l'utente che ha effettuato il login,
+    consente di visualizzare le lezioni o le prenotazioni.
+    """
+    async def show_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        user = update.effective_user
+        user_data = context.user_data
+        query = update.callback_query
+
+        profile = await self.profile(user_data)
+        body, buttons = self.render(("menu", profile), self.build_menu_view, profile)
         
         logger.info("User %s sta visualizzando il menu principale", user.first_name)
         await query.answer()
-        await query.edit_message_text(body, parse_mode=constants.ParseMode.MARKDOWN_V2, reply_markup=buttons)
+        await self.outbound.edit(query, body, parse_mode=constants.ParseMode.MARKDOWN_V2, reply_markup=buttons)
         return MAIN_MENU
 
 
     """
-    Elenca le lezioni, nell'arco di una settimana, alla quale l'utente può prenotarsi 
-    in base al suo corso di laurea e anno di corso
+    Profilo dell'utente che ha effettuato il login: viene letto dal database una sola volta, in verify_code,
+    e tenuto in user_data['profilo'] per tutti gli handler del menu principale.
+    Le sessioni che non lo hanno ancora (ad esempio salvate prima del suo arrivo) lo caricano al primo utilizzo.
+    """
+    async def profile(self, user_data: dict) -> User:
+        profile = user_data.get('profilo')
+        if profile is None:
+            profile = user_data['profilo'] = await self.database.get_user_info(user_data['email'])
+        return profile
+
+    """
+    Ritorna primo e ultimo giorno, materia (o None) e descrizione dell'intervallo di lezioni scelto dall'utente:
+    ("oggi",), ("settimana",), ("prossima",), ("giorno", data) o ("materia", nome della materia)
+    """
+    @staticmethod
+    def lesson_window(window: tuple) -> tuple[date, date, str | None, str]:
+        today = date.today()
+        match window:
+            case ("oggi",):
+                return today, today, None, f"Oggi {format_day(today)}"
+            case ("prossima",):
+                first_day, last_day = today + timedelta(days=7), today + timedelta(days=13)
+                return first_day, last_day, None, f"Prossima settimana dal {format_day(first_day)} al {format_day(last_day)}"
+            case ("giorno", day):
+                day = date.fromisoformat(day)
+                return day, day, None, f"{WEEKDAYS[day.weekday()]} {format_day(day)}"
+            case ("materia", subject):
+                last_day = today + timedelta(days=SUBJECT_WINDOW_DAYS - 1)
+                return today, last_day, subject, f"{subject} dal {format_day(today)} al {format_day(last_day)}"
+            case _:
+                last_day = today + timedelta(days=6)
+                return today, last_day, None, f"Settimana dal {format_day(today)} al {format_day(last_day)}"
+
+    """
+    Pulsanti per scegliere l'intervallo delle lezioni mostrate
+    """
+    @staticmethod
+    def window_rows() -> list:
+        return [
+            [
+                InlineKeyboardButton("Oggi", callback_data="filtro-oggi"),
+                InlineKeyboardButton("Settimana", callback_data="filtro-settimana"),
+                InlineKeyboardButton("Prossima settimana", callback_data="filtro-prossima")
+            ],
+            [
+                InlineKeyboardButton("Scegli giorno", callback_data="filtro-giorno"),
+                InlineKeyboardButton("Scegli materia", callback_data="filtro-materia")
+            ]
+        ]
+
+    """
+    Elenca le lezioni alle quali l'utente può prenotarsi in base al suo corso di laurea e anno di corso,
+    nell'intervallo scelto (predefinito: la settimana da oggi), una pagina alla volta.
+    Il callback "visualizza_lezioni" mostra la prima pagina, i pulsanti di navigazione hanno callback "lezioni-avanti-<id>" e "lezioni-indietro-<id>".
+    I callback "filtro-oggi", "filtro-settimana", "filtro-prossima", "giorno-<AAAAMMGG>" e "materia-<indice>"
+    cambiano l'intervallo, che resta salvato in user_data['finestra'].
     """
     async def list_lessons(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         user_data = context.user_data
         query = update.callback_query
         user = update.effective_user
-        lessons = self.database.get_lessons(user_data['email'])
+        profile = await self.profile(user_data)
+
+        if query.data.startswith("filtro-"):
+            user_data['finestra'] = (query.data.split("-")[1],)
+        elif query.data.startswith("giorno-"):
+            try:
+                user_data['finestra'] = ("giorno", datetime.strptime(query.data.split("-")[1], "%Y%m%d").date().isoformat())
+            except ValueError:
+                # Il pattern accetta otto cifre qualsiasi: una data impossibile riporta alla settimana da oggi
+                logger.warning("User %s ha inviato un giorno non valido: %s", user.first_name, query.data)
+                user_data['finestra'] = ("settimana",)
+        elif query.data.startswith("materia-"):
+            subjects = await self.database.get_subjects(profile.course, profile.year)
+            index = int(query.data.split("-")[1])
+            if index < len(subjects):
+                user_data['finestra'] = ("materia", subjects[index])
+
+        first_day, last_day, subject, description = self.lesson_window(user_data.get('finestra', ("settimana",)))
+        after, before = self.page_cursor(query.data)
+        lessons, has_previous, has_next = await self.database.get_lessons(profile.course, profile.year, first_day, last_day, subject, after, before, LESSONS_PAGE_SIZE)
         
         if not lessons:
-            keyboard = []
+            keyboard = self.window_rows()
             keyboard.append([InlineKeyboardButton("Indietro", callback_data="menu")])
             buttons = InlineKeyboardMarkup(keyboard)
             
             logger.info("User %s non ha lezioni disponibili.", user.first_name)
             await query.answer()
-            await query.edit_message_text(f"Non ci sono lezioni disponibili.", reply_markup=buttons)
+            await self.outbound.edit(query, f"Non ci sono lezioni disponibili.\n{description}", reply_markup=buttons)
             return MAIN_MENU
-        
-        today = datetime.today()
-        next_week = today + timedelta(days=7)
 
-        today = today.strftime("%d/%m")
-        next_week = next_week.strftime("%d/%m")
-    
-        """
-        lessons è una lista che contiene una tupla per ogni lezione presente
-        nel database. Per ogni lezione:
-        lesson[0] = id_lezione
-        lesson[1] = data
-        lesson[2] = ora
-        lesson[3] = descrizione
-        lesson[4] = posti disponibili
-        lesson[5] = nome della materia
-        lesson[6] = nome dell'aula
-        lesson[7] = nome del professore
-        lesson[8] = cognome del professore
-        """
-        button_names = []
-        for lesson in lessons:
-            date = lesson[1].split("-")
-            time = lesson[2].split("-")
-            button_names.append(f"{date[2]}/{date[1]} ⌚ {time[0]} | {lesson[5]}")
+        # Le etichette delle lezioni non dipendono dai posti disponibili: la pagina si identifica con le sue lezioni
+        key = ("lezioni", profile.course, profile.year, description, tuple(lesson.lesson_id for lesson in lessons), has_previous, has_next)
+        body, buttons = self.render(key, self.build_lessons_view, profile, description, lessons, has_previous, has_next)
 
+        logger.info("User %s sta visualizzando le lezioni di %s dell'anno %s", user.first_name, profile.course, profile.year)
+        await query.answer()
+        await self.outbound.edit(query, body, reply_markup=buttons)
+        return MAIN_MENU
+
+    @staticmethod
+    def build_lessons_view(profile: User, description: str, lessons: list, has_previous: bool, has_next: bool) -> tuple[str, InlineKeyboardMarkup]:
         keyboard = []    
-        for i,lesson in enumerate(lessons):
-            callback_data = "lezione-" + str(lesson[0])
-            keyboard.append([InlineKeyboardButton(button_names[i], callback_data=callback_data)])
+        for lesson in lessons:
+            callback_data = "lezione-" + str(lesson.lesson_id)
+            keyboard.append([InlineKeyboardButton(lesson.label, callback_data=callback_data)])
+
+        navigation = Bot.navigation_row("lezioni", lessons[0].lesson_id, lessons[-1].lesson_id, has_previous, has_next)
+        if navigation:
+            keyboard.append(navigation)
         
+        keyboard.extend(Bot.window_rows())
         keyboard.append([InlineKeyboardButton("Indietro", callback_data="menu")])
         buttons = InlineKeyboardMarkup(keyboard)
+        return f"Lezioni del corso {profile.course}, anno {profile.year}\n{description}", buttons
+
+
+    """
+    Mostra i prossimi DAYS_TO_CHOOSE giorni tra cui scegliere quello di cui elencare le lezioni
+    """
+    async def choose_day(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        query = update.callback_query
+        today = date.today()
+
+        days = [today + timedelta(days=i) for i in range(DAYS_TO_CHOOSE)]
+        buttons_per_row = 4
+        keyboard = []
+        for i in range(0, len(days), buttons_per_row):
+            keyboard.append([InlineKeyboardButton(f"{WEEKDAYS[day.weekday()]} {format_day(day)}", callback_data=f"giorno-{day.strftime('%Y%m%d')}") for day in days[i:i + buttons_per_row]])
+        keyboard.append([InlineKeyboardButton("Indietro", callback_data="visualizza_lezioni")])
+        buttons = InlineKeyboardMarkup(keyboard)
+
+        await query.answer()
+        await self.outbound.edit(query, f"Scegli il giorno", reply_markup=buttons)
+        return MAIN_MENU
+
+
+    """
+    Mostra le materie del corso e dell'anno dell'utente tra cui scegliere quella di cui elencare le lezioni
+    """
+    async def choose_subject(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        query = update.callback_query
+        profile = await self.profile(context.user_data)
+        subjects = await self.database.get_subjects(profile.course, profile.year)
+
+        keyboard = [[InlineKeyboardButton(subject, callback_data=f"materia-{i}")] for i, subject in enumerate(subjects)]
+        keyboard.append([InlineKeyboardButton("Indietro", callback_data="visualizza_lezioni")])
+        buttons = InlineKeyboardMarkup(keyboard)
 
-        logger.info("User %s sta visualizzando le lezioni di %s dell'anno %s", user.first_name, user_data['corso'], user_data['anno'])
         await query.answer()
-        await query.edit_message_text(f"Lezioni del corso {user_data['corso']}, anno {user_data['anno']}\nSettimana dal {today} al {next_week}", reply_markup=buttons)
+        await self.outbound.edit(query, f"Scegli la materia", reply_markup=buttons)
         return MAIN_MENU
 
 
@@ -458,39 +619,38 @@ class Bot:
         lesson_id = int(query.data.split("-")[1])
         user_data = context.user_data
 
-        lesson_details = self.database.get_lesson_details(lesson_id)
-
-        """
-        lesson_details è una lista con i dettagli della lezione:
-        lesson_details[0] = id_lezione
-        lesson_details[1] = data
-        lesson_details[2] = ora
-        lesson_details[3] = descrizione
-        lesson_details[4] = posti disponibili
-        lesson_details[5] = nome della materia
-        lesson_details[6] = nome dell'aula
-        lesson_details[7] = nome del professore
-        lesson_details[8] = cognome del professore
-        """
-        date = lesson_details[1].split("-")
-        time = lesson_details[2].split("-")
-        description = escape(lesson_details[3])
-        seats = int(lesson_details[4])
-        subject_name = lesson_details[5]
-        professor = f"{lesson_details[7]} {lesson_details[8]}"
+        lesson_details = await self.database.get_lesson_details(lesson_id)
     
         """
         Se l'utente non è prenotato ritorna -1, 
-        altrimenti ritorna l'id della prenotazione
+        altrimenti ritorna l'id della prenotazione.
+        La lista d'attesa si controlla solo se non ci sono posti e l'utente non è prenotato.
         """
-        booking_id = self.database.is_user_booked(user_data['email'], lesson_id)
+        booking_id = await self.database.is_user_booked(user_data['email'], lesson_id)
+        waiting = lesson_details.seats == 0 and booking_id == -1 and await self.database.is_user_waiting(user_data['email'], lesson_id)
+
+        key = ("lezione", lesson_details, booking_id, waiting)
+        body, buttons = self.render(key, self.build_lesson_view, lesson_details, booking_id, waiting)
         
-        """
-        Se sono presenti posti disponibili mostra un pulsante 'prenota' e 'indietro', 
-        se l'utente è già prenotato alla lezione mostra un pulsante 'vedi prenotazione' e 'indietro',
-        se l'utente non è prenotato e non ci sono posti disponibili mostra solo il pulsante 'indietro'
-        """
+        logger.info("User %s sta visualizzando la lezione %s", user.first_name, lesson_id)
+        await query.answer()
+        await self.outbound.edit(query, body, parse_mode=constants.ParseMode.MARKDOWN_V2, reply_markup=buttons)
+        return MAIN_MENU
+
+    """
+    Se sono presenti posti disponibili mostra un pulsante 'prenota' e 'indietro', 
+    se l'utente è già prenotato alla lezione mostra un pulsante 'vedi prenotazione' e 'indietro',
+    se l'utente non è prenotato e non ci sono posti disponibili mostra il pulsante 'lista d'attesa'
+    (o avvisa che è già in lista d'attesa) e 'indietro'
+    """
+    @staticmethod
+    def build_lesson_view(lesson_details, booking_id: int, waiting: bool) -> tuple[str, InlineKeyboardMarkup]:
+        lesson_id = lesson_details.lesson_id
+        seats = lesson_details.seats
+        description = escape(lesson_details.description)
+
         keyboard = [[]]
+        waiting_note = ""
         if seats > 0:
             if booking_id == -1:
                 prenota_lezione = "prenota-" + str(lesson_id)
@@ -501,25 +661,32 @@ class Bot:
         elif booking_id != -1:
             vedi_prenotazione = "prenotazione-" + str(booking_id)
             keyboard[0].append(InlineKeyboardButton("Vedi Prenotazione", callback_data=vedi_prenotazione))
+        elif waiting:
+            waiting_note = "\nSei in lista d'attesa: ti avviseremo se si libera un posto\."
+        else:
+            lista_attesa = "attesa-" + str(lesson_id)
+            keyboard[0].append(InlineKeyboardButton("Lista d'attesa", callback_data=lista_attesa))
 
         keyboard[0].append(InlineKeyboardButton("Indietro", callback_data="visualizza_lezioni"))  
         buttons = InlineKeyboardMarkup(keyboard)           
-        
-        logger.info("User %s sta visualizzando la lezione %s", user.first_name, lesson_id)
-        body = f"*{subject_name}* \| {professor}\n📅 `{date[2]}/{date[1]}` ⌚`{time[0]}`\-`{time[1]}`\n> {description}\nPosti disponibili: `{seats}`"
-        await query.answer()
-        await query.edit_message_text(body, parse_mode=constants.ParseMode.MARKDOWN_V2, reply_markup=buttons)
-        return MAIN_MENU
+        body = f"*{lesson_details.subject}* \| {lesson_details.professor}\n📅 `{format_day(lesson_details.date)}` ⌚`{format_time(lesson_details.start)}`\-`{format_time(lesson_details.end)}`\n> {description}\nPosti disponibili: `{seats}`{waiting_note}"
+        return body, buttons
 
 
     """
-    Mostra tutte le prenotazioni dell'utente
+    Mostra le prenotazioni dell'utente, una pagina alla volta
     """
     async def list_bookings(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         query = update.callback_query
         user = update.effective_user
         user_data = context.user_data
-        bookings = self.database.get_bookings(user_data['email'])
+
+        """
+        Il callback "visualizza_prenotazioni" mostra la prima pagina,
+        i pulsanti di navigazione hanno callback "prenotazioni-avanti-<id>" e "prenotazioni-indietro-<id>"
+        """
+        after, before = self.page_cursor(query.data)
+        bookings, has_previous, has_next = await self.database.get_bookings(user_data['email'], after, before, BOOKINGS_PAGE_SIZE)
 
         if not bookings:
             keyboard = []
@@ -528,37 +695,24 @@ class Bot:
             
             logger.info("User %s non ha prenotazioni.", user.first_name)
             await query.answer()
-            await query.edit_message_text(f"Non ci sono prenotazioni.", reply_markup=buttons)
+            await self.outbound.edit(query, f"Non ci sono prenotazioni.", reply_markup=buttons)
             return MAIN_MENU
         
-        """
-        bookings è una lista di tuple. Per ogni booking:
-        booking[0] = id_prenotazione  
-        booking[1] = data
-        booking[2] = ora
-        booking[3] = id_lezione
-        booking[4] = email dell'utente
-
-        In lessons viene salvata una lista di tuple con i dettagli di ogni lezione a cui l'utente è prenotato.
-        """
-        lessons = []
-        for booking in bookings:
-            lessons.append(self.database.get_lesson_details(booking[3]))
-        
         keyboard = []
-        button_names = []
-        for i,lesson in enumerate(lessons):
-            date = lesson[1].split("-")
-            time = lesson[2].split("-")
-            button_names.append(f"{date[2]}/{date[1]} ⌚ {time[0]} | {lesson[5]}")
-            vedi_prenotazione = "prenotazione-" + str(bookings[i][0])
-            keyboard.append([InlineKeyboardButton(button_names[i], callback_data=vedi_prenotazione)])
+        for booking in bookings:
+            vedi_prenotazione = "prenotazione-" + str(booking.booking_id)
+            keyboard.append([InlineKeyboardButton(booking.label, callback_data=vedi_prenotazione)])
+
+        navigation = self.navigation_row("prenotazioni", bookings[0].lesson_id, bookings[-1].lesson_id, has_previous, has_next)
+        if navigation:
+            keyboard.append(navigation)
+
         keyboard.append([InlineKeyboardButton("Indietro", callback_data="menu")]) 
         buttons = InlineKeyboardMarkup(keyboard)  
         
         logger.info("User %s sta visualizzando le sue prenotazioni", user.first_name)
         await query.answer()
-        await query.edit_message_text(f"Le tue prenotazioni", reply_markup=buttons)
+        await self.outbound.edit(query, f"Le tue prenotazioni", reply_markup=buttons)
         return MAIN_MENU
 
 
@@ -572,16 +726,35 @@ class Bot:
         lesson_id = data[1]
         user_data = context.user_data
 
-        self.database.insert_booking(lesson_id, user_data['email'])
+        if not self.is_allowed(self.rate_limits.mutations, user.id, "mutations"):
+            await query.answer(f"Troppe richieste, riprova tra qualche secondo.")
+            return MAIN_MENU
+
+        result = await self.database.insert_booking(int(lesson_id), user_data['email'])
+        metrics.BOOKINGS.inc(result.name.lower())
 
         keyboard = [[]]
         vedi_lezione = "lezione-" + lesson_id
         keyboard[0].append(InlineKeyboardButton("Indietro", callback_data=vedi_lezione)) 
         buttons = InlineKeyboardMarkup(keyboard) 
 
-        logger.info("User %s ha prenotato la lezione con id %s", user.first_name, lesson_id)
+        """
+        La prenotazione può non andare a buon fine se, nel frattempo, 
+        i posti sono finiti o l'utente si era già prenotato (ad esempio con un doppio tocco)
+        """
+        match result:
+            case BookingResult.BOOKED:
+                logger.info("User %s ha prenotato la lezione con id %s", user.first_name, lesson_id)
+                body = f"Prenotazione effettuata con successo."
+            case BookingResult.SOLD_OUT:
+                logger.info("User %s non ha prenotato la lezione con id %s: posti esauriti", user.first_name, lesson_id)
+                body = f"Non ci sono più posti disponibili per questa lezione."
+            case BookingResult.ALREADY_BOOKED:
+                logger.info("User %s è già prenotato alla lezione con id %s", user.first_name, lesson_id)
+                body = f"Sei già prenotato a questa lezione."
+
         await query.answer()
-        await query.edit_message_text(f"Prenotazione effettuata con successo.", reply_markup=buttons)
+        await self.outbound.edit(query, body, reply_markup=buttons)
         return MAIN_MENU
 
 
@@ -593,28 +766,28 @@ class Bot:
         user = update.effective_user
         booking_id = int(query.data.split("-")[1])
 
-        booking_details = self.database.get_booking_details(booking_id)
-        lesson_details = self.database.get_lesson_details(booking_details[3])
-        
-        book_date = booking_details[1].split("-")
-        book_time = booking_details[2]
-        
-        date = lesson_details[1].split("-")
-        time = lesson_details[2].split("-")
-        description = escape(lesson_details[3])
-        subject_name = lesson_details[5]
-        professor = f"{lesson_details[7]} {lesson_details[8]}"
-
-        annulla_prenotazione = "annulla-"+ str(booking_id) + "-" + str(lesson_details[0])
-        keyboard = [[ InlineKeyboardButton("Annulla Prenotazione", callback_data=annulla_prenotazione), InlineKeyboardButton("Indietro", callback_data="visualizza_prenotazioni") ]]
-        buttons = InlineKeyboardMarkup(keyboard)
+        booking_details = await self.database.get_booking_details(booking_id)
+        # Descrizione e professore della lezione possono cambiare con un nuovo orario: la chiave contiene la lezione
+        lesson_details = await self.database.get_lesson_details(booking_details.lesson_id)
+        key = ("prenotazione", booking_details, lesson_details)
+        body, buttons = self.render(key, self.build_booking_view, booking_details, lesson_details)
 
         logger.info("User %s sta visualizzando la prenotazione %s", user.first_name, booking_id)
-        body = f"Prenotazione avvenuta il `{book_date[2]}/{book_date[1]}` alle `{book_time}`\n*{subject_name}* \| {professor}\n📅 `{date[2]}/{date[1]}` ⌚`{time[0]}`\-`{time[1]}`\n> {description}"
         await query.answer()
-        await query.edit_message_text(body, parse_mode=constants.ParseMode.MARKDOWN_V2, reply_markup=buttons)
+        await self.outbound.edit(query, body, parse_mode=constants.ParseMode.MARKDOWN_V2, reply_markup=buttons)
         return MAIN_MENU
 
+    @staticmethod
+    def build_booking_view(booking_details, lesson_details) -> tuple[str, InlineKeyboardMarkup]:
+        description = escape(lesson_details.description)
+
+        annulla_prenotazione = "annulla-"+ str(booking_details.booking_id) + "-" + str(lesson_details.lesson_id)
+        keyboard = [[ InlineKeyboardButton("Annulla Prenotazione", callback_data=annulla_prenotazione), InlineKeyboardButton("Indietro", callback_data="visualizza_prenotazioni") ]]
+        buttons = InlineKeyboardMarkup(keyboard)
+
+        body = f"Prenotazione avvenuta il `{format_day(booking_details.booked_at)}` alle `{format_time(booking_details.booked_at)}`\n*{lesson_details.subject}* \| {lesson_details.professor}\n📅 `{format_day(lesson_details.date)}` ⌚`{format_time(lesson_details.start)}`\-`{format_time(lesson_details.end)}`\n> {description}"
+        return body, buttons
+
     """
     Annulla la prenotazione selezionata
     """
@@ -623,19 +796,87 @@ class Bot:
         query = update.callback_query
         booking_id = int(query.data.split("-")[1])
         lesson_id = int(query.data.split("-")[2])
-        self.database.cancel_booking(booking_id, lesson_id)
+
+        if not self.is_allowed(self.rate_limits.mutations, user.id, "mutations"):
+            await query.answer(f"Troppe richieste, riprova tra qualche secondo.")
+            return MAIN_MENU
+
+        is_cancelled, promotion = await self.database.cancel_booking(booking_id, lesson_id)
 
         keyboard = [[]]
         keyboard[0].append(InlineKeyboardButton("Indietro", callback_data="visualizza_prenotazioni")) 
 
         buttons = InlineKeyboardMarkup(keyboard)  
 
-        logger.info("User %s ha annullato la prenotazione %s", user.first_name, booking_id)
+        if is_cancelled:
+            metrics.CANCELLATIONS.inc()
+            logger.info("User %s ha annullato la prenotazione %s", user.first_name, booking_id)
+            body = f"Prenotazione annullata con successo."
+        else:
+            logger.info("User %s ha provato ad annullare la prenotazione %s, già annullata", user.first_name, booking_id)
+            body = f"La prenotazione è già stata annullata."
+
+        await query.answer()
+        await self.outbound.edit(query, body, reply_markup=buttons)
+
+        """
+        Il posto liberato è andato al primo studente in lista d'attesa, che viene avvisato
+        """
+        if promotion is not None:
+            await self.notify_promotion(context, promotion)
+        return MAIN_MENU
+
+
+    """
+    Aggiunge l'utente alla lista d'attesa della lezione selezionata, se non ci sono posti disponibili
+    """
+    async def join_waitlist(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        query = update.callback_query
+        user = update.effective_user
+        user_data = context.user_data
+        lesson_id = query.data.split("-")[1]
+
+        if not self.is_allowed(self.rate_limits.mutations, user.id, "mutations"):
+            await query.answer(f"Troppe richieste, riprova tra qualche secondo.")
+            return MAIN_MENU
+
+        result = await self.database.join_waitlist(int(lesson_id), user_data['email'], user_data['chat_id'])
+
+        keyboard = [[ InlineKeyboardButton("Indietro", callback_data="lezione-" + lesson_id) ]]
+        buttons = InlineKeyboardMarkup(keyboard)
+
+        match result:
+            case WaitlistResult.JOINED:
+                logger.info("User %s è in lista d'attesa per la lezione con id %s", user.first_name, lesson_id)
+                body = f"Sei in lista d'attesa: se si libera un posto verrai prenotato automaticamente e riceverai un messaggio."
+            case WaitlistResult.ALREADY_WAITING:
+                body = f"Sei già in lista d'attesa per questa lezione."
+            case WaitlistResult.ALREADY_BOOKED:
+                body = f"Sei già prenotato a questa lezione."
+            case WaitlistResult.SEATS_AVAILABLE:
+                body = f"Si è appena liberato un posto: torna alla lezione per prenotarti."
+            case WaitlistResult.NOT_FOUND:
+                logger.info("User %s ha chiesto la lista d'attesa della lezione con id %s, che non esiste più", user.first_name, lesson_id)
+                body = f"Questa lezione non è più disponibile."
+                buttons = InlineKeyboardMarkup([[ InlineKeyboardButton("Indietro", callback_data="visualizza_lezioni") ]])
+
         await query.answer()
-        await query.edit_message_text(f"Prenotazione annullata con successo.", reply_markup=buttons)
+        await self.outbound.edit(query, body, reply_markup=buttons)
         return MAIN_MENU
 
 
+    """
+    Avvisa lo studente promosso dalla lista d'attesa che è stato prenotato.
+    Il messaggio viene inviato dal NotificationScheduler, nel rispetto dei limiti di invio di Telegram.
+    """
+    async def notify_promotion(self, context: ContextTypes.DEFAULT_TYPE, promotion) -> None:
+        lesson_details = await self.database.get_lesson_details(promotion.lesson_id)
+
+        logger.info("Lo studente %s è stato prenotato dalla lista d'attesa della lezione %s", promotion.email, promotion.lesson_id)
+        body = f"Si è liberato un posto: sei stato prenotato alla lezione di {lesson_details.subject} del {format_day(lesson_details.date)} alle {format_time(lesson_details.start)}."
+        self.notifications.enqueue(promotion.chat_id, body)
+
+
     """
     Termina la conversazione e cancella i dati inseriti dall'utente
     """
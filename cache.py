@@ -0,0 +1,72 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+"""
+Cache in memoria con scadenza (TTL) e numero massimo di elementi:
+quando è piena viene rimosso l'elemento usato meno di recente (LRU).
+È condivisa dai thread di AsyncDatabaseManager, quindi ogni operazione avviene sotto lock.
+
+Ogni chiave ha una generazione, incrementata da invalidate (e da clear per tutte le chiavi).
+Chi legge dal database prende la generazione prima della lettura e la passa a set: se nel frattempo una scrittura
+ha invalidato la chiave il valore letto è vecchio e non viene salvato.
+"""
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.lock = Lock()
+        # Generazioni delle chiavi invalidate almeno una volta; clear incrementa epoch per tutte
+        self.generations = {}
+        self.epoch = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            expiration, value = item
+            if expiration <= monotonic():
+                del self.items[key]
+                self.misses += 1
+                return default
+
+            self.items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def generation(self, key) -> tuple:
+        with self.lock:
+            return self.epoch, self.generations.get(key, 0)
+
+    def set(self, key, value, generation: tuple = None):
+        with self.lock:
+            if generation is not None and generation != (self.epoch, self.generations.get(key, 0)):
+                return
+            self.items[key] = (monotonic() + self.ttl, value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+            self.generations[key] = self.generations.get(key, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.generations.clear()
+            self.epoch += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self.items)}
@@ -0,0 +1,138 @@
+import sqlite3
+from contextlib import contextmanager
+from threading import Condition
+from time import monotonic
+from sqlitecloud import connect as sqlitecloud_connect
+
+class PoolTimeoutError(Exception):
+    pass
+
+"""
+Pool limitato di connessioni al database, condiviso dai thread di AsyncDatabaseManager.
+La stringa di connessione può essere un indirizzo sqlitecloud:// oppure il percorso di un file
+SQLite locale, utile per lo sviluppo e i test al posto di SQLiteCloud.
+Solo le connessioni rimaste inutilizzate per più di health_check_idle secondi vengono controllate prima dell'uso,
+così le richieste frequenti non pagano una query in più ogni volta.
+"""
+class ConnectionPool:
+    def __init__(self, connection_string: str, min_size: int = 1, max_size: int = 5, timeout: float = 10.0, health_check_idle: float = 30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Dimensioni del pool non valide: min {min_size}, max {max_size}")
+
+        self.connection_string = connection_string
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_idle = health_check_idle
+
+        # Connessioni libere con il momento in cui sono state rilasciate
+        self.idle = []
+        self.size = 0
+        self.available = Condition()
+
+    """
+    Crea una nuova connessione. SQLite locale viene aperto in autocommit,
+    come si comporta SQLiteCloud, in modo che le transazioni siano sempre esplicite.
+    """
+    def create_connection(self):
+        if self.connection_string.startswith("sqlitecloud://"):
+            return sqlitecloud_connect(self.connection_string)
+
+        connection = sqlite3.connect(self.connection_string, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def open(self):
+        with self.available:
+            while self.size < self.min_size:
+                self.idle.append((self.create_connection(), monotonic()))
+                self.size += 1
+
+    def close(self):
+        with self.available:
+            for connection, _ in self.idle:
+                connection.close()
+            self.size -= len(self.idle)
+            self.idle.clear()
+
+    def is_healthy(self, connection) -> bool:
+        try:
+            connection.execute("SELECT 1").fetchone()
+            return True
+        except Exception:
+            return False
+
+    """
+    Preleva una connessione dal pool, aspettando al massimo self.timeout secondi se sono tutte in uso.
+    Una connessione inutilizzata da più di health_check_idle secondi che non risponde al controllo
+    viene chiusa e sostituita con una nuova.
+    """
+    def acquire(self):
+        deadline = monotonic() + self.timeout
+
+        with self.available:
+            while not self.idle and self.size >= self.max_size:
+                remaining = deadline - monotonic()
+                if remaining <= 0 or not self.available.wait(remaining):
+                    raise PoolTimeoutError(f"Nessuna connessione libera entro {self.timeout} secondi")
+
+            if self.idle:
+                connection, released_at = self.idle.pop()
+            else:
+                connection = None
+                self.size += 1
+
+        if connection is not None and (monotonic() - released_at < self.health_check_idle or self.is_healthy(connection)):
+            return connection
+
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+        try:
+            return self.create_connection()
+        except Exception:
+            with self.available:
+                self.size -= 1
+                self.available.notify()
+            raise
+
+    def release(self, connection):
+        with self.available:
+            self.idle.append((connection, monotonic()))
+            self.available.notify()
+
+    """
+    Chiude una connessione che ha dato errore invece di rimetterla nel pool, liberandone il posto
+    """
+    def discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self.available:
+            self.size -= 1
+            self.available.notify()
+
+    """
+    Presta una connessione per la durata del blocco. Se il blocco solleva un'eccezione la connessione
+    potrebbe essere chiusa o in uno stato non valido: viene scartata e la prossima richiesta ne apre una nuova,
+    senza aspettare il controllo delle connessioni inutilizzate.
+    """
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        failed = False
+        try:
+            yield connection
+        except Exception:
+            failed = True
+            raise
+        finally:
+            # GeneratorExit (ad esempio uno stream interrotto) non è un errore della connessione
+            if failed:
+                self.discard(connection)
+            else:
+                self.release(connection)
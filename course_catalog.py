@@ -0,0 +1,41 @@
+import logging
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+
+logger = logging.getLogger(__name__)
+
+"""
+Elenco dei corsi di laurea caricato all'avvio del bot, con la tastiera di scelta del corso già pronta.
+I corsi cambiano molto raramente: l'elenco viene ricaricato periodicamente dalla job queue.
+"""
+class CourseCatalog:
+    def __init__(self, database):
+        self.database = database
+        self.courses = []
+        self.keyboard = InlineKeyboardMarkup([])
+
+    """
+    Costruisce la tastiera con due corsi per riga
+    """
+    @staticmethod
+    def build_keyboard(courses: list) -> InlineKeyboardMarkup:
+        keyboard = []
+        for i in range(0, len(courses), 2):
+            keyboard.append([InlineKeyboardButton(course, callback_data=course) for course in courses[i:i + 2]])
+        return InlineKeyboardMarkup(keyboard)
+
+    async def load(self):
+        courses = await self.database.get_courses()
+        if courses != self.courses:
+            self.keyboard = self.build_keyboard(courses)
+            self.courses = courses
+        logger.info("Caricati %s corsi di laurea", len(courses))
+
+    """
+    Callback per la job queue dell'Application
+    """
+    async def refresh(self, context: ContextTypes.DEFAULT_TYPE):
+        try:
+            await self.load()
+        except Exception:
+            logger.exception("Impossibile aggiornare l'elenco dei corsi, resta in uso quello precedente")
@@ -36,6 +36,7 @@ CREATE TABLE IF NOT EXISTS Utenti (
   cognome VARCHAR(20) NOT NULL,
   anno_di_corso INT NOT NULL,
   nome_corso VARCHAR(20) NOT NULL,
+  chat_id INTEGER,
   CONSTRAINT corso_utente FOREIGN KEY(nome_corso) REFERENCES CorsiDiLaurea(nome) ON UPDATE CASCADE ON DELETE CASCADE
   PRIMARY KEY (email)
 );
@@ -55,7 +56,7 @@ CREATE TABLE IF NOT EXISTS Lezioni (
   data DATE NOT NULL,
   ora TIME NOT NULL,
   descrizione VARCHAR(500) NOT NULL,
-  posti_disponibili INT,
+  posti_disponibili INT CHECK (posti_disponibili >= 0),
   nome_materia VARCHAR(100) NOT NULL,
   nome_aula VARCHAR(2) NOT NULL,
   nome_professore VARCHAR(20),
@@ -65,17 +66,44 @@ CREATE TABLE IF NOT EXISTS Lezioni (
   CONSTRAINT professore_lezione FOREIGN KEY (nome_professore, cognome_professore) REFERENCES Professori(nome, cognome) ON UPDATE CASCADE ON DELETE CASCADE
 );
 
+-- AUTOINCREMENT: l'id di una prenotazione annullata non viene riusato, così un secondo tocco su "Annulla"
+-- (o un vecchio pulsante) non può cancellare la prenotazione fatta nel frattempo da un altro studente
 DROP TABLE IF EXISTS Prenotazioni;
 CREATE TABLE IF NOT EXISTS Prenotazioni (
-  id_prenotazione INTEGER PRIMARY KEY,
+  id_prenotazione INTEGER PRIMARY KEY AUTOINCREMENT,
   data DATE NOT NULL,
   ora TIME NOT NULL,
   id_lezione INT NOT NULL,
   email_utente INT NOT NULL,
   CONSTRAINT lezione_prenotazione FOREIGN KEY (id_lezione) REFERENCES Lezioni(id_lezione) ON UPDATE CASCADE ON DELETE CASCADE,
-  CONSTRAINT utente_prenotazione FOREIGN KEY (email_utente) REFERENCES Utenti(email) ON UPDATE CASCADE ON DELETE CASCADE
+  CONSTRAINT utente_prenotazione FOREIGN KEY (email_utente) REFERENCES Utenti(email) ON UPDATE CASCADE ON DELETE CASCADE,
+  CONSTRAINT prenotazione_unica UNIQUE (id_lezione, email_utente)
 );
 
+DROP TABLE IF EXISTS ListaAttesa;
+CREATE TABLE IF NOT EXISTS ListaAttesa (
+  id_attesa INTEGER PRIMARY KEY,
+  id_lezione INT NOT NULL,
+  email_utente VARCHAR(50) NOT NULL,
+  chat_id INTEGER NOT NULL,
+  CONSTRAINT lezione_attesa FOREIGN KEY (id_lezione) REFERENCES Lezioni(id_lezione) ON UPDATE CASCADE ON DELETE CASCADE,
+  CONSTRAINT utente_attesa FOREIGN KEY (email_utente) REFERENCES Utenti(email) ON UPDATE CASCADE ON DELETE CASCADE,
+  CONSTRAINT attesa_unica UNIQUE (id_lezione, email_utente)
+);
+
+-- Indici per le ricerche delle lezioni per materia e intervallo di date: con l'ora nell'indice
+-- le lezioni di una materia si leggono già ordinate, senza ordinamento temporaneo
+CREATE INDEX IF NOT EXISTS lezioni_materia_data_ora ON Lezioni(nome_materia, data, ora);
+-- Indice per i report su un intervallo di date senza materia (reports.py lezioni e aule):
+-- le ricerche del bot hanno sempre le materie e usano l'indice precedente
+CREATE INDEX IF NOT EXISTS lezioni_data_ora ON Lezioni(data, ora);
+
+-- Indice per l'elenco delle prenotazioni di un utente
+CREATE INDEX IF NOT EXISTS prenotazioni_utente ON Prenotazioni(email_utente);
+
+-- Coda della lista d'attesa: l'indice è ordinato anche per id_attesa, il primo in coda si legge senza ordinamenti
+CREATE INDEX IF NOT EXISTS lista_attesa_coda ON ListaAttesa(id_lezione, id_attesa);
+
 INSERT INTO CorsiDiLaurea (nome) VALUES 
 ("Informatica"), 
 ("Matematica"), 
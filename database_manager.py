@@ -1,55 +1,200 @@
+import asyncio
+from enum import Enum
 from os import getenv
-from sqlitecloud import connect
+from functools import partial
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
+from connection_pool import ConnectionPool
+from cache import TTLCache
+from models import Booking, Lesson, Promotion, User
+from datetime import date, datetime
+
+class BookingResult(Enum):
+    BOOKED = 1
+    SOLD_OUT = 2
+    ALREADY_BOOKED = 3
+
+class WaitlistResult(Enum):
+    JOINED = 1
+    ALREADY_WAITING = 2
+    ALREADY_BOOKED = 3
+    SEATS_AVAILABLE = 4
+    NOT_FOUND = 5
 
 class DatabaseManager:
-    def __init__(self):
+    """
+    La stringa di connessione predefinita è CONN_DB; i benchmark passano il percorso del loro database SQLite
+    """
+    def __init__(self, connection_string: str = None):
         load_dotenv()
-        self.connection_string = getenv("CONN_DB")
-        self.connection = None
+        self.connection_string = connection_string or getenv("CONN_DB")
+        self.pool = ConnectionPool(
+            self.connection_string,
+            min_size=int(getenv("POOL_MIN_SIZE", 1)),
+            max_size=int(getenv("POOL_MAX_SIZE", 5)),
+            timeout=float(getenv("POOL_TIMEOUT", 10)),
+            health_check_idle=float(getenv("POOL_HEALTH_CHECK_IDLE", 30))
+        )
+
+        cache_size = int(getenv("CACHE_SIZE", 1024))
+        # Materie per (corso, anno): il piano di studi cambia poche volte l'anno
+        self.subjects_cache = TTLCache(cache_size, float(getenv("SUBJECTS_CACHE_TTL", 24 * 60 * 60)))
+        self.users_cache = TTLCache(cache_size, float(getenv("USERS_CACHE_TTL", 10 * 60)))
+        # Dei dettagli di una lezione cambiano solo i posti disponibili, aggiornati da insert_booking e cancel_booking
+        self.lessons_cache = TTLCache(cache_size, float(getenv("LESSONS_CACHE_TTL", 60)))
 
     def connect(self):
-        if self.connection is None:
-            self.connection = connect(self.connection_string)
+        self.pool.open()
+
+    def close(self):
+        self.pool.close()
 
+    """
+    Esegue le istruzioni del blocco in un'unica transazione.
+    BEGIN IMMEDIATE prende subito il lock in scrittura, quindi letture e scritture
+    del blocco non possono intrecciarsi con quelle di un'altra transazione.
+    Se BEGIN, COMMIT o ROLLBACK falliscono l'eccezione esce da pool.connection, che scarta la connessione.
+    """
+    @contextmanager
+    def transaction(self):
+        with self.pool.connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    """
+    Ritorna i nomi dei corsi di laurea. Non usa la cache: l'elenco è già tenuto da CourseCatalog,
+    che a ogni aggiornamento deve leggere i corsi dal database.
+    """
     def get_courses(self) -> list:
-        query = self.connection.execute("SELECT nome FROM CorsiDiLaurea")
-        query_result = query.fetchall()
+        with self.pool.connection() as connection:
+            query = connection.execute("SELECT nome FROM CorsiDiLaurea")
+            query_result = query.fetchall()
 
         result = []
         for tuple in query_result:
             result.append(tuple[0])
         return result
 
-    def get_lessons(self, email: str) -> list:
-        query = self.connection.execute("SELECT nome_corso,anno_di_corso FROM Utenti WHERE ?=email", (email,))
-        info_course = query.fetchone()
+    """
+    Ritorna le materie dell'anno di corso di un corso di laurea, tenute in cache.
+    """
+    def get_subjects(self, course: str, year: int) -> tuple:
+        key = (course, year)
+        subjects = self.subjects_cache.get(key)
+        if subjects is not None:
+            return subjects
+
+        search = "SELECT m.nome FROM Insegnamenti i JOIN Materie m ON m.nome=i.nome_materia WHERE ?=i.nome_corso AND ?=m.anno_di_corso ORDER BY m.nome"
+        with self.pool.connection() as connection:
+            query = connection.execute(search, (course, year))
+            subjects = tuple(row[0] for row in query.fetchall())
+
+        self.subjects_cache.set(key, subjects)
+        return subjects
+
+    def clear_caches(self):
+        self.subjects_cache.clear()
+        self.users_cache.clear()
+        self.lessons_cache.clear()
 
-        today = datetime.today()
-        next_week = today + timedelta(days=7)
-        today = today.strftime("%Y-%m-%d")
-        next_week = next_week.strftime("%Y-%m-%d")
+    def cache_stats(self) -> dict:
+        return {
+            "materie": self.subjects_cache.stats(),
+            "utenti": self.users_cache.stats(),
+            "lezioni": self.lessons_cache.stats()
+        }
+
+    """
+    Paginazione per chiave: invece di saltare le righe con OFFSET, la pagina riparte dalla lezione 'after' (esclusa)
+    andando avanti, o termina alla lezione 'before' (esclusa) andando indietro, nell'ordine (data, ora, id_lezione).
+    'search' deve terminare con una condizione WHERE; 'key' sono le colonne (data, ora, id_lezione) della query.
+    Ritorna le righe della pagina e se esistono pagine precedenti e successive.
+    """
+    def fetch_page(self, search: str, params: tuple, key: tuple, after: int = None, before: int = None, page_size: int = 10) -> tuple[list, bool, bool]:
+        columns = ", ".join(key)
+        cursor = "(SELECT data, ora, id_lezione FROM Lezioni WHERE ?=id_lezione)"
+        if before is not None:
+            search += f" AND ({columns}) < {cursor} ORDER BY " + ", ".join(f"{column} DESC" for column in key) + " LIMIT ?"
+            params = (*params, before, page_size + 1)
+        elif after is not None:
+            search += f" AND ({columns}) > {cursor} ORDER BY {columns} LIMIT ?"
+            params = (*params, after, page_size + 1)
+        else:
+            search += f" ORDER BY {columns} LIMIT ?"
+            params = (*params, page_size + 1)
+
+        with self.pool.connection() as connection:
+            query = connection.execute(search, params)
+            rows = query.fetchall()
+
+        if before is not None:
+            return rows[:page_size][::-1], len(rows) > page_size, True
+        return rows[:page_size], after is not None, len(rows) > page_size
+
+    """
+    Ritorna una pagina delle lezioni per il corso e l'anno indicati comprese tra first_day e last_day (inclusi),
+    solo della materia indicata se 'subject' non è None, e se esistono pagine precedenti e successive.
+    Le date sono passate come parametri della query: la ricerca per materia usa l'indice (nome_materia, data, ora)
+    anche per l'ordinamento, quella su tutte le materie una ricerca nell'indice per ciascuna materia.
+    """
+    def get_lessons(self, course: str, year: int, first_day: date, last_day: date, subject: str = None, after: int = None, before: int = None, page_size: int = 10) -> tuple[list[Lesson], bool, bool]:
+        subjects = self.get_subjects(course, year)
+        if subject is not None:
+            # Solo le materie del proprio corso e anno
+            subjects = (subject,) if subject in subjects else ()
+        if not subjects:
+            return [], False, False
+
+        if len(subjects) == 1:
+            search = "SELECT * FROM Lezioni WHERE ?=nome_materia AND data BETWEEN ? AND ?"
+        else:
+            placeholders = ",".join("?" * len(subjects))
+            search = f"SELECT * FROM Lezioni WHERE nome_materia IN ({placeholders}) AND data BETWEEN ? AND ?"
+        params = (*subjects, first_day.isoformat(), last_day.isoformat())
+        rows, has_previous, has_next = self.fetch_page(search, params, ("data", "ora", "id_lezione"), after, before, page_size)
+        return [Lesson.from_row(row) for row in rows], has_previous, has_next
 
-        course_subjects = f"SELECT nome_materia FROM Insegnamenti WHERE '{info_course[0]}'=nome_corso"
-        subjects_year = f"SELECT nome FROM Materie WHERE nome IN({course_subjects}) AND {info_course[1]}=anno_di_corso"
-        query = self.connection.execute(f"SELECT * FROM Lezioni WHERE nome_materia IN({subjects_year}) AND data BETWEEN '{today}' AND '{next_week}' ORDER BY data, ora") 
-        lessons = query.fetchall()
-        return lessons
+    def get_lesson_details(self, lesson_id: int) -> Lesson | None:
+        lesson_details = self.lessons_cache.get(lesson_id)
+        if lesson_details is not None:
+            return lesson_details
 
-    def get_lesson_details(self, lesson_id: int) -> list:
-        query = self.connection.execute("SELECT * FROM Lezioni WHERE ?=id_lezione", (lesson_id,))
-        lesson_details = query.fetchone()
+        # Se una prenotazione cambia i posti durante la lettura, la riga letta non va in cache
+        generation = self.lessons_cache.generation(lesson_id)
+        with self.pool.connection() as connection:
+            query = connection.execute("SELECT * FROM Lezioni WHERE ?=id_lezione", (lesson_id,))
+            row = query.fetchone()
+
+        lesson_details = Lesson.from_row(row) if row is not None else None
+        if lesson_details is not None:
+            self.lessons_cache.set(lesson_id, lesson_details, generation)
         return lesson_details
 
-    def get_user_info(self, email:str) -> list:
-        query = self.connection.execute("SELECT * FROM Utenti WHERE ?=email", (email,))
-        info_utente = query.fetchone()
+    def get_user_info(self, email:str) -> User | None:
+        info_utente = self.users_cache.get(email)
+        if info_utente is not None:
+            return info_utente
+
+        generation = self.users_cache.generation(email)
+        with self.pool.connection() as connection:
+            query = connection.execute("SELECT email, nome, cognome, anno_di_corso, nome_corso, chat_id FROM Utenti WHERE ?=email", (email,))
+            row = query.fetchone()
+
+        info_utente = User(*row) if row is not None else None
+        if info_utente is not None:
+            self.users_cache.set(email, info_utente, generation)
         return info_utente
         
     def check_email(self, email: str) -> bool:
-        query = self.connection.execute("SELECT * FROM Utenti WHERE ?=email", (email,))
-        query_result = query.fetchall()
+        with self.pool.connection() as connection:
+            query = connection.execute("SELECT * FROM Utenti WHERE ?=email", (email,))
+            query_result = query.fetchall()
         
         if not query_result:
             return False
@@ -58,38 +203,255 @@ class DatabaseManager:
 
     def insert_user(self, nome: str, cognome: str, email: str, anno:int, corso: str):
         insert = "INSERT INTO Utenti(nome, cognome, email, anno_di_corso, nome_corso) VALUES (?, ?, ?, ?, ?);"
-        self.connection.execute(insert, (nome, cognome, email, anno, corso))
+        with self.pool.connection() as connection:
+            connection.execute(insert, (nome, cognome, email, anno, corso))
+
+    """
+    Salva la chat dello studente al login, per potergli inviare i promemoria delle lezioni
+    """
+    def set_chat_id(self, email: str, chat_id: int):
+        with self.pool.connection() as connection:
+            connection.execute("UPDATE Utenti SET chat_id=? WHERE ?=email", (chat_id, email))
+        self.users_cache.invalidate(email)
 
     def is_user_booked(self, email: str, lesson_id: int) -> list:
         search = "SELECT id_prenotazione FROM Prenotazioni WHERE ?=id_lezione AND ?=email_utente"
-        query = self.connection.execute(search, (lesson_id, email))
-        result = query.fetchone()
+        with self.pool.connection() as connection:
+            query = connection.execute(search, (lesson_id, email))
+            result = query.fetchone()
 
         if result is None:
             return -1
         else:
             return result[0]
         
-    def get_bookings(self, email: str) -> list:
-        search = "SELECT * FROM Prenotazioni p, Lezioni l WHERE ?=email_utente AND p.id_lezione=l.id_lezione ORDER BY l.data, l.ora"
-        query = self.connection.execute(search, (email,))
-        bookings = query.fetchall()
-        return bookings
-
-    def get_booking_details(self, booking_id: int) -> list:
-        query = self.connection.execute("SELECT * FROM Prenotazioni WHERE ?=id_prenotazione", (booking_id,))
-        booking_details = query.fetchone()
-        return booking_details
-
-    def insert_booking(self, lesson_id: int, email: str):
+    """
+    Ritorna una pagina delle prenotazioni dell'utente, ordinate per data e ora della lezione,
+    e se esistono pagine precedenti e successive. Lezioni e prenotazioni vengono lette con un'unica query.
+    Anche qui le pagine sono delimitate da un id di lezione: un utente ha al massimo una prenotazione per lezione.
+    """
+    def get_bookings(self, email: str, after: int = None, before: int = None, page_size: int = 10) -> tuple[list[Booking], bool, bool]:
+        search = """SELECT p.id_prenotazione, l.id_lezione, l.data, l.ora, l.nome_materia, p.data, p.ora
+                    FROM Prenotazioni p JOIN Lezioni l ON p.id_lezione=l.id_lezione 
+                    WHERE ?=p.email_utente"""
+        rows, has_previous, has_next = self.fetch_page(search, (email,), ("l.data", "l.ora", "l.id_lezione"), after, before, page_size)
+        return [Booking.from_row(row) for row in rows], has_previous, has_next
+
+    def get_booking_details(self, booking_id: int) -> Booking | None:
+        search = """SELECT p.id_prenotazione, l.id_lezione, l.data, l.ora, l.nome_materia, p.data, p.ora
+                    FROM Prenotazioni p JOIN Lezioni l ON p.id_lezione=l.id_lezione WHERE ?=p.id_prenotazione"""
+        with self.pool.connection() as connection:
+            query = connection.execute(search, (booking_id,))
+            row = query.fetchone()
+        return Booking.from_row(row) if row is not None else None
+
+    """
+    Prenota un posto alla lezione: il controllo della prenotazione esistente, il decremento dei posti
+    (solo se ne restano) e l'inserimento della prenotazione avvengono nella stessa transazione.
+    """
+    def insert_booking(self, lesson_id: int, email: str) -> BookingResult:
         date = datetime.now().strftime("%Y-%m-%d")
         time = datetime.now().strftime("%H:%M")
 
+        search = "SELECT id_prenotazione FROM Prenotazioni WHERE ?=id_lezione AND ?=email_utente"
+        update = "UPDATE Lezioni SET posti_disponibili=posti_disponibili-1 WHERE ?=id_lezione AND posti_disponibili>0"
         insert = "INSERT INTO Prenotazioni(data, ora, id_lezione, email_utente) VALUES (?, ?, ?, ?);"
-        update = f"UPDATE Lezioni SET posti_disponibili=posti_disponibili-1 WHERE {lesson_id}=id_lezione"
-        self.connection.execute(insert, (date, time, lesson_id, email))
-        self.connection.execute(update)
+        with self.transaction() as connection:
+            if connection.execute(search, (lesson_id, email)).fetchone() is not None:
+                return BookingResult.ALREADY_BOOKED
+
+            connection.execute(update, (lesson_id,))
+            if connection.execute("SELECT changes()").fetchone()[0] == 0:
+                # La cache poteva mostrare ancora posti liberi
+                self.lessons_cache.invalidate(lesson_id)
+                return BookingResult.SOLD_OUT
+
+            connection.execute(insert, (date, time, lesson_id, email))
+        self.lessons_cache.invalidate(lesson_id)
+        return BookingResult.BOOKED
+
+    """
+    Annulla la prenotazione. Il posto liberato va al primo studente in lista d'attesa, che viene prenotato
+    nella stessa transazione e ritornato per essere avvisato; se la lista è vuota il posto torna disponibile.
+    Niente cambia se la prenotazione era già stata annullata, così un doppio tocco su "Annulla" non libera due posti.
+    """
+    def cancel_booking(self, booking_id: int, lesson_id: int) -> tuple[bool, Promotion | None]:
+        date = datetime.now().strftime("%Y-%m-%d")
+        time = datetime.now().strftime("%H:%M")
+
+        delete = "DELETE FROM Prenotazioni WHERE ?=id_prenotazione AND ?=id_lezione"
+        head = "SELECT id_attesa, email_utente, chat_id FROM ListaAttesa WHERE ?=id_lezione ORDER BY id_attesa LIMIT 1"
+        update = "UPDATE Lezioni SET posti_disponibili=posti_disponibili+1 WHERE ?=id_lezione"
+        with self.transaction() as connection:
+            connection.execute(delete, (booking_id, lesson_id))
+            if connection.execute("SELECT changes()").fetchone()[0] == 0:
+                return False, None
+
+            waiting = connection.execute(head, (lesson_id,)).fetchone()
+            if waiting is None:
+                connection.execute(update, (lesson_id,))
+                promotion = None
+            else:
+                waiting_id, email, chat_id = waiting
+                connection.execute("DELETE FROM ListaAttesa WHERE ?=id_attesa", (waiting_id,))
+                connection.execute("INSERT INTO Prenotazioni(data, ora, id_lezione, email_utente) VALUES (?, ?, ?, ?);", (date, time, lesson_id, email))
+                promotion = Promotion(email, chat_id, lesson_id)
+        self.lessons_cache.invalidate(lesson_id)
+        return True, promotion
+
+    """
+    Aggiunge lo studente in fondo alla lista d'attesa di una lezione senza posti disponibili
+    """
+    def join_waitlist(self, lesson_id: int, email: str, chat_id: int) -> WaitlistResult:
+        booked = "SELECT id_prenotazione FROM Prenotazioni WHERE ?=id_lezione AND ?=email_utente"
+        seats = "SELECT posti_disponibili FROM Lezioni WHERE ?=id_lezione"
+        waiting = "SELECT id_attesa FROM ListaAttesa WHERE ?=id_lezione AND ?=email_utente"
+        insert = "INSERT INTO ListaAttesa(id_lezione, email_utente, chat_id) VALUES (?, ?, ?);"
+        with self.transaction() as connection:
+            if connection.execute(booked, (lesson_id, email)).fetchone() is not None:
+                return WaitlistResult.ALREADY_BOOKED
+            available = connection.execute(seats, (lesson_id,)).fetchone()
+            # La lezione può essere stata cancellata dopo che il pulsante è stato mostrato
+            if available is None:
+                return WaitlistResult.NOT_FOUND
+            if available[0] > 0:
+                return WaitlistResult.SEATS_AVAILABLE
+            if connection.execute(waiting, (lesson_id, email)).fetchone() is not None:
+                return WaitlistResult.ALREADY_WAITING
+
+            connection.execute(insert, (lesson_id, email, chat_id))
+        return WaitlistResult.JOINED
+
+    def is_user_waiting(self, email: str, lesson_id: int) -> bool:
+        search = "SELECT id_attesa FROM ListaAttesa WHERE ?=id_lezione AND ?=email_utente"
+        with self.pool.connection() as connection:
+            query = connection.execute(search, (lesson_id, email))
+            result = query.fetchone()
+        return result is not None
+
+    """
+    Ritorna (chat_id, materia, ora, aula) delle lezioni prenotate nel giorno indicato,
+    raggruppate per chat, per gli studenti che hanno fatto il login dal bot
+    """
+    def get_reminders(self, date: str) -> list:
+        search = """SELECT u.chat_id, l.nome_materia, l.ora, l.nome_aula
+                    FROM Prenotazioni p JOIN Lezioni l ON p.id_lezione=l.id_lezione JOIN Utenti u ON u.email=p.email_utente
+                    WHERE ?=l.data AND u.chat_id IS NOT NULL ORDER BY u.chat_id, l.ora"""
+        with self.pool.connection() as connection:
+            query = connection.execute(search, (date,))
+            return query.fetchall()
+
+    """
+    Esegue una query di sola lettura e ne ritorna le righe un lotto alla volta con fetchmany invece di fetchall,
+    così la memoria usata non dipende dal numero di righe. La connessione resta occupata finché non si smette di leggere.
+    """
+    def stream(self, search: str, params: tuple = (), batch_size: int = 500):
+        with self.pool.connection() as connection:
+            query = connection.execute(search, params)
+            while rows := query.fetchmany(batch_size):
+                yield from rows
+
+    """
+    Ritorna materie, aule con i posti totali e professori (nome, cognome), usati per validare un orario da importare
+    """
+    def get_timetable_references(self) -> tuple[list, dict, list]:
+        with self.pool.connection() as connection:
+            subjects = [row[0] for row in connection.execute("SELECT nome FROM Materie").fetchall()]
+            rooms = dict(connection.execute("SELECT nome, posti_totali FROM Aule").fetchall())
+            professors = connection.execute("SELECT nome, cognome FROM Professori").fetchall()
+        return subjects, rooms, professors
+
+    """
+    Inserisce un lotto di lezioni (data, ora, descrizione, posti, materia, aula, nome e cognome del professore)
+    in un'unica transazione con executemany. Una lezione è già presente se ha la stessa materia, data, ora e aula
+    (la ricerca usa l'indice (nome_materia, data, ora)): viene saltata oppure, se 'update' è True, ne vengono
+    aggiornati descrizione e professore quando cambiano. Ritorna il numero di lezioni inserite o aggiornate.
+    """
+    def import_lessons(self, rows: list, update: bool = False) -> int:
+        existing = "SELECT 1 FROM Lezioni WHERE ?=nome_materia AND ?=data AND ?=ora AND ?=nome_aula"
+        insert = f"""INSERT INTO Lezioni (data, ora, descrizione, posti_disponibili, nome_materia, nome_aula, nome_professore, cognome_professore)
+                     SELECT ?, ?, ?, ?, ?, ?, ?, ? WHERE NOT EXISTS ({existing})"""
+        modify = """UPDATE Lezioni SET descrizione=?, nome_professore=?, cognome_professore=?
+                    WHERE ?=nome_materia AND ?=data AND ?=ora AND ?=nome_aula
+                    AND (descrizione IS NOT ? OR nome_professore IS NOT ? OR cognome_professore IS NOT ?)"""
+
+        with self.transaction() as connection:
+            before = connection.execute("SELECT total_changes()").fetchone()[0]
+            if update:
+                connection.executemany(modify, [(description, name, surname, subject, day, hours, room, description, name, surname)
+                                                for day, hours, description, seats, subject, room, name, surname in rows])
+            connection.executemany(insert, [(*row, row[4], row[0], row[1], row[5]) for row in rows])
+            written = connection.execute("SELECT total_changes()").fetchone()[0] - before
+        return written
+
+"""
+Versione asincrona di DatabaseManager, usata dal Bot.
+Ogni metodo esegue la corrispondente chiamata bloccante in un thread dell'executor,
+così l'event loop di Application continua a servire gli altri utenti mentre si attende il database.
+"""
+class AsyncDatabaseManager:
+    def __init__(self, database: DatabaseManager, max_workers: int = None):
+        self.database = database
+        # Un worker per ogni connessione del pool: oltre non servirebbe, i thread resterebbero in attesa
+        if max_workers is None:
+            max_workers = database.pool.max_size
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="database")
+
+    async def run(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(function, *args))
+
+    def connect(self):
+        self.database.connect()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.database.close()
+
+    async def get_courses(self) -> list:
+        return await self.run(self.database.get_courses)
+
+    async def get_subjects(self, course: str, year: int) -> tuple:
+        return await self.run(self.database.get_subjects, course, year)
+
+    async def get_lessons(self, course: str, year: int, first_day: date, last_day: date, subject: str = None, after: int = None, before: int = None, page_size: int = 10) -> tuple[list[Lesson], bool, bool]:
+        return await self.run(self.database.get_lessons, course, year, first_day, last_day, subject, after, before, page_size)
+
+    async def get_lesson_details(self, lesson_id: int) -> Lesson | None:
+        return await self.run(self.database.get_lesson_details, lesson_id)
+
+    async def get_user_info(self, email: str) -> User | None:
+        return await self.run(self.database.get_user_info, email)
+
+    async def check_email(self, email: str) -> bool:
+        return await self.run(self.database.check_email, email)
+
+    async def insert_user(self, nome: str, cognome: str, email: str, anno: int, corso: str):
+        return await self.run(self.database.insert_user, nome, cognome, email, anno, corso)
+
+    async def set_chat_id(self, email: str, chat_id: int):
+        return await self.run(self.database.set_chat_id, email, chat_id)
+
+    async def is_user_booked(self, email: str, lesson_id: int) -> list:
+        return await self.run(self.database.is_user_booked, email, lesson_id)
+
+    async def get_bookings(self, email: str, after: int = None, before: int = None, page_size: int = 10) -> tuple[list[Booking], bool, bool]:
+        return await self.run(self.database.get_bookings, email, after, before, page_size)
+
+    async def get_booking_details(self, booking_id: int) -> Booking | None:
+        return await self.run(self.database.get_booking_details, booking_id)
+
+    async def insert_booking(self, lesson_id: int, email: str) -> BookingResult:
+        return await self.run(self.database.insert_booking, lesson_id, email)
+
+    async def cancel_booking(self, booking_id: int, lesson_id: int) -> tuple[bool, Promotion | None]:
+        return await self.run(self.database.cancel_booking, booking_id, lesson_id)
+
+    async def join_waitlist(self, lesson_id: int, email: str, chat_id: int) -> WaitlistResult:
+        return await self.run(self.database.join_waitlist, lesson_id, email, chat_id)
+
+    async def is_user_waiting(self, email: str, lesson_id: int) -> bool:
+        return await self.run(self.database.is_user_waiting, email, lesson_id)
 
-    def cancel_booking(self, booking_id: int, lesson_id: int):
-        self.connection.execute(f"DELETE FROM Prenotazioni WHERE {booking_id}=id_prenotazione")
-        self.connection.execute(f"UPDATE Lezioni SET posti_disponibili=posti_disponibili+1 WHERE {lesson_id}=id_lezione")
\ No newline at end of file
+    async def get_reminders(self, date: str) -> list:
+        return await self.run(self.database.get_reminders, date)
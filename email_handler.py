@@ -1,5 +1,7 @@
+import asyncio
+import logging
 from random import randint
-from smtplib import SMTP_SSL
+from smtplib import SMTP, SMTP_SSL, SMTPServerDisconnected
 from ssl import create_default_context
 from email.message import EmailMessage
 from telegram.ext import ContextTypes
@@ -10,37 +12,140 @@ load_dotenv()
 EMAIL_PASSWORD = getenv("EMAIL_PASSWORD")
 EMAIL_SENDER = 'prenotapostolezione@gmail.com'
 
-def verify_email(email: str, context:ContextTypes.DEFAULT_TYPE) -> bool:
+# Server SMTP: per i test si può usare un server locale senza SSL (EMAIL_SSL = "false")
+EMAIL_HOST = getenv("EMAIL_HOST", "smtp.gmail.com")
+EMAIL_PORT = int(getenv("EMAIL_PORT", 465))
+EMAIL_SSL = getenv("EMAIL_SSL", "true").lower() == "true"
+EMAIL_WORKERS = int(getenv("EMAIL_WORKERS", 2))
+EMAIL_RETRIES = int(getenv("EMAIL_RETRIES", 3))
+
+logger = logging.getLogger(__name__)
+
+"""
+Sessione SMTP autenticata, riutilizzata per tutti gli invii di un worker.
+Se il server chiude la connessione, viene riaperta al successivo invio.
+"""
+class SMTPTransport:
+    def __init__(self, host: str = EMAIL_HOST, port: int = EMAIL_PORT, use_ssl: bool = EMAIL_SSL, username: str = EMAIL_SENDER, password: str = EMAIL_PASSWORD):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.username = username
+        self.password = password
+        self.smtp = None
+
+    def connect(self):
+        self.close()
+        if self.use_ssl:
+            self.smtp = SMTP_SSL(self.host, self.port, context=create_default_context())
+        else:
+            self.smtp = SMTP(self.host, self.port)
+        if self.password:
+            self.smtp.login(self.username, self.password)
+
+    def send(self, message: EmailMessage):
+        if self.smtp is None:
+            self.connect()
+        try:
+            self.smtp.send_message(message)
+        except SMTPServerDisconnected:
+            self.connect()
+            self.smtp.send_message(message)
+
+    def close(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except Exception:
+                pass
+            self.smtp = None
+
+"""
+Coda di invio delle email gestita da un gruppo di worker asincroni.
+Gli handler del Bot accodano l'email e tornano subito, l'invio vero e proprio
+avviene in un thread separato con un trasporto per worker (transport_factory).
+Un invio fallito viene ritentato fino a 'retries' volte, con attesa crescente.
+"""
+class EmailSender:
+    def __init__(self, transport_factory=SMTPTransport, workers: int = EMAIL_WORKERS, retries: int = EMAIL_RETRIES, backoff: float = 1.0):
+        self.transport_factory = transport_factory
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.queue = None
+        self.tasks = []
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.tasks = [asyncio.create_task(self.worker(self.transport_factory())) for _ in range(self.workers)]
+
+    """
+    Attende che le email già accodate vengano inviate (al massimo 'timeout' secondi) e ferma i worker
+    """
+    async def stop(self, timeout: float = 10.0):
+        if self.queue is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Email non inviate alla chiusura: %s", self.queue.qsize())
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def send(self, email: str, subject: str, body: str):
+        em = EmailMessage()
+        em['From'] = EMAIL_SENDER
+        em['To'] = email
+        em['Subject'] = subject
+        em.set_content(body)
+        self.queue.put_nowait(em)
+
+    async def worker(self, transport):
+        try:
+            while True:
+                em = await self.queue.get()
+                try:
+                    await self.deliver(transport, em)
+                finally:
+                    self.queue.task_done()
+        finally:
+            await asyncio.to_thread(transport.close)
+
+    async def deliver(self, transport, em: EmailMessage):
+        for attempt in range(self.retries + 1):
+            try:
+                await asyncio.to_thread(transport.send, em)
+                logger.info("Email inviata con successo a %s", em['To'])
+                return
+            except Exception as e:
+                logger.warning("Errore nell'invio dell'email a %s: %s", em['To'], e)
+                await asyncio.to_thread(transport.close)
+                if attempt < self.retries:
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+        logger.error("Email a %s non inviata dopo %s tentativi", em['To'], self.retries + 1)
+
+"""
+Genera il codice di verifica e, se l'email è istituzionale, accoda l'invio.
+Ritorna False se l'email non è di uno studente UniPG.
+"""
+def verify_email(email: str, context: ContextTypes.DEFAULT_TYPE, sender: EmailSender) -> bool:
     user_data = context.user_data
 
     code = randint(10000, 99999)
     user_data['codice'] = code
-    print(f"Codice di verifica inviato a {email}: {code}")
+
+    domain = email.split("@")
+    if len(domain) != 2 or domain[1] != "studenti.unipg.it":
+        return False
+
+    logger.info("Codice di verifica generato per %s", email)
 
     subject = "Verifica email"
     body = f"""
-    Il codice di verifica è: 
+    Il codice di verifica è:
     {code}
     """
-    
-    try:
-        domain = email.split("@")
-        if domain[1] == "studenti.unipg.it":
-            em = EmailMessage()
-            em['From'] = EMAIL_SENDER
-            em['To'] = email
-            em['Subject'] = subject
-            em.set_content(body)
-            context = create_default_context()
-            with SMTP_SSL('smtp.gmail.com', 465, context=context) as smtp:
-                smtp.login(EMAIL_SENDER, EMAIL_PASSWORD)
-                smtp.sendmail(EMAIL_SENDER, email, em.as_string())
-            print(f"Email inviata con successo a {email}")
-            return True
-        else: return False
-        
-    except Exception as e:
-        print("Errore nella email: ", e)
-        return False
-
-        
\ No newline at end of file
+    sender.send(email, subject, body)
+    return True
@@ -0,0 +1,96 @@
+import atexit
+import json
+import logging
+import re
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from random import random
+from telegram import Update
+from telegram.ext import ContextTypes
+
+"""
+Logging strutturato e non bloccante.
+Gli handler del Bot mettono solo i record in una coda; formattazione in JSON, oscuramento dei dati
+personali e scrittura su stdout avvengono nel thread del QueueListener, fuori dall'event loop.
+"""
+
+# Id Telegram dell'utente dell'aggiornamento in elaborazione, aggiunto a ogni record
+current_user_id = ContextVar("current_user_id", default=None)
+
+EMAIL_PATTERN = re.compile(r"([A-Za-z0-9._%+-])[A-Za-z0-9._%+-]*@([A-Za-z0-9.-]+\.[A-Za-z]{2,})")
+CODE_PATTERN = re.compile(r"(codice\D{0,20})\d{5}\b", re.IGNORECASE)
+
+def redact(text: str) -> str:
+    text = EMAIL_PATTERN.sub(r"\1***@\2", text)
+    return CODE_PATTERN.sub(r"\1*****", text)
+
+"""
+Handler (gruppo -1) che memorizza l'utente dell'aggiornamento per la correlazione dei log
+"""
+async def set_log_context(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if isinstance(update, Update) and update.effective_user is not None:
+        current_user_id.set(update.effective_user.id)
+
+class ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.user_id = current_user_id.get()
+        return True
+
+"""
+Scarta una parte dei record più frequenti: per ogni frammento del messaggio
+viene mantenuta solo la frazione di record indicata.
+"""
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        message = record.msg if isinstance(record.msg, str) else ""
+        for fragment, rate in self.rates.items():
+            if fragment in message:
+                return random() < rate
+        return True
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": redact(record.getMessage())
+        }
+        user_id = getattr(record, "user_id", None)
+        if user_id is not None:
+            entry["user_id"] = user_id
+        if record.exc_info:
+            entry["exception"] = redact(self.formatException(record.exc_info))
+        return json.dumps(entry, ensure_ascii=False)
+
+"""
+Il QueueHandler standard formatta il messaggio nel thread chiamante: qui il record viene accodato così com'è
+"""
+class DeferredQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+def setup_logging(level: str = "INFO", sample_rates: dict = None) -> QueueListener:
+    queue = SimpleQueue()
+    queue_handler = DeferredQueueHandler(queue)
+    queue_handler.addFilter(ContextFilter())
+    if sample_rates:
+        queue_handler.addFilter(SamplingFilter(sample_rates))
+
+    output = logging.StreamHandler()
+    output.setFormatter(JSONFormatter())
+    listener = QueueListener(queue, output, respect_handler_level=True)
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
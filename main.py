@@ -8,8 +8,21 @@ from bot import (
     AUTHENTICATION, 
     MAIN_MENU 
 )
-from database_manager import DatabaseManager
+import asyncio
+import metrics
+from logging_config import setup_logging, set_log_context
+from database_manager import DatabaseManager, AsyncDatabaseManager
+from course_catalog import CourseCatalog
+from email_handler import EmailSender
+from notifications import NotificationScheduler
+from outbound import CountingRequest
+from rate_limiter import RateLimits, RateLimitStore
+from webhook import run_webhook
+from update_processor import PerUserUpdateProcessor
+from persistence import SQLitePersistence
 from re import compile
+from datetime import time
+from zoneinfo import ZoneInfo
 from os import getenv
 from dotenv import load_dotenv
 from telegram import Update
@@ -19,6 +32,7 @@ from telegram.ext import (
     CommandHandler, 
     ConversationHandler,
     MessageHandler,
+    TypeHandler,
     filters
     )
 
@@ -26,13 +40,100 @@ from telegram.ext import (
 load_dotenv()   
 TOKEN = getenv("TOKEN")
 
+# Modalità di ricezione degli aggiornamenti: "polling" oppure "webhook"
+MODE = getenv("MODE", "polling")
+WEBHOOK_URL = getenv("WEBHOOK_URL", "")
+WEBHOOK_LISTEN = getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(getenv("WEBHOOK_PORT", 8443))
+WEBHOOK_PATH = getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_SECRET = getenv("WEBHOOK_SECRET")
+
+# Numero massimo di aggiornamenti elaborati in parallelo (quelli di uno stesso utente restano in ordine)
+CONCURRENT_UPDATES = int(getenv("CONCURRENT_UPDATES", 64))
+
+# File in cui salvare sessioni e stati delle conversazioni, e ogni quanti secondi salvarli
+PERSISTENCE_FILE = getenv("PERSISTENCE_FILE", "bot_state.db")
+PERSISTENCE_INTERVAL = float(getenv("PERSISTENCE_INTERVAL", 10))
+
+# Porta locale su cui esporre le metriche in formato Prometheus (se vuota le metriche sono disabilitate)
+METRICS_PORT = getenv("METRICS_PORT")
+
+# Livello dei log e frazione dei log di consultazione (più frequenti) da mantenere
+LOG_LEVEL = getenv("LOG_LEVEL", "INFO")
+LOG_SAMPLE_RATE = float(getenv("LOG_SAMPLE_RATE", 0.1))
+LOG_SAMPLED_EVENTS = ["sta visualizzando la lezione", "sta visualizzando le lezioni", "sta visualizzando la prenotazione", "sta visualizzando le sue prenotazioni", "sta visualizzando il menu principale"]
+
+# Ogni quanti secondi ricaricare l'elenco dei corsi di laurea
+COURSES_REFRESH_INTERVAL = int(getenv("COURSES_REFRESH_INTERVAL", 60 * 60))
+
+# Ora (HH:MM, ora italiana) in cui accodare i promemoria delle lezioni del giorno dopo
+REMINDER_TIME = getenv("REMINDER_TIME", "18:00")
+# Con più repliche i promemoria vanno accodati da una sola: sulle altre REMINDERS = "false"
+REMINDERS = getenv("REMINDERS", "true").lower() == "true"
+# Limiti di invio delle notifiche: messaggi al secondo in totale e secondi minimi tra due messaggi alla stessa chat
+NOTIFICATIONS_RATE = float(getenv("NOTIFICATIONS_RATE", 25))
+NOTIFICATIONS_INTERVAL = float(getenv("NOTIFICATIONS_INTERVAL", 1.0))
+
+# Limiti contro l'abuso, nella forma "azioni/secondi": invii del codice per utente e per email,
+# codici inseriti per utente, prenotazioni e annullamenti per utente
+RATE_LIMIT_CODE_SENDS = getenv("RATE_LIMIT_CODE_SENDS", "5/600")
+RATE_LIMIT_CODE_SENDS_EMAIL = getenv("RATE_LIMIT_CODE_SENDS_EMAIL", "3/600")
+RATE_LIMIT_CODE_ATTEMPTS = getenv("RATE_LIMIT_CODE_ATTEMPTS", "5/600")
+RATE_LIMIT_MUTATIONS = getenv("RATE_LIMIT_MUTATIONS", "10/10")
+# File SQLite in cui salvare lo stato dei limiti (se vuoto i limiti restano solo in memoria) e ogni quanti secondi salvarlo
+RATE_LIMIT_FILE = getenv("RATE_LIMIT_FILE")
+RATE_LIMIT_SAVE_INTERVAL = float(getenv("RATE_LIMIT_SAVE_INTERVAL", 60))
+
 def main() -> None:    
-    database = DatabaseManager()
+    setup_logging(LOG_LEVEL, {event: LOG_SAMPLE_RATE for event in LOG_SAMPLED_EVENTS})
+
+    manager = DatabaseManager()
+    database = AsyncDatabaseManager(manager)
     database.connect()
 
-    bot = Bot(database)
+    courses = CourseCatalog(database)
+    email_sender = EmailSender()
+    notifications = NotificationScheduler(database, NOTIFICATIONS_RATE, NOTIFICATIONS_INTERVAL)
+    rate_limits = RateLimits(RATE_LIMIT_CODE_SENDS, RATE_LIMIT_CODE_SENDS_EMAIL, RATE_LIMIT_CODE_ATTEMPTS, RATE_LIMIT_MUTATIONS)
+    rate_limit_store = RateLimitStore(RATE_LIMIT_FILE) if RATE_LIMIT_FILE else None
+    bot = Bot(database, courses, email_sender, notifications, rate_limits)
+
+    if METRICS_PORT:
+        metrics.instrument_database(manager)
+        metrics.instrument_bot(bot)
+        metrics.start_http_server(int(METRICS_PORT))
+
+    async def post_init(application: Application) -> None:
+        await courses.load()
+        await email_sender.start()
+        if rate_limit_store is not None:
+            rate_limit_store.load(rate_limits)
 
-    application = Application.builder().token(TOKEN).build()
+    async def post_shutdown(application: Application) -> None:
+        await email_sender.stop()
+        if rate_limit_store is not None:
+            rate_limit_store.save(rate_limits)
+
+    async def save_rate_limits(context) -> None:
+        await asyncio.to_thread(rate_limit_store.save, rate_limits)
+
+    application = (
+        Application.builder()
+        .token(TOKEN)
+        .request(CountingRequest(connection_pool_size=256))
+        .concurrent_updates(PerUserUpdateProcessor(CONCURRENT_UPDATES))
+        .persistence(SQLitePersistence(PERSISTENCE_FILE, PERSISTENCE_INTERVAL))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+    application.job_queue.run_repeating(courses.refresh, interval=COURSES_REFRESH_INTERVAL, first=COURSES_REFRESH_INTERVAL)
+    application.job_queue.run_repeating(notifications.send_pending, interval=notifications.tick)
+    if rate_limit_store is not None:
+        application.job_queue.run_repeating(save_rate_limits, interval=RATE_LIMIT_SAVE_INTERVAL, first=RATE_LIMIT_SAVE_INTERVAL)
+    if REMINDERS:
+        hour, minute = map(int, REMINDER_TIME.split(":"))
+        application.job_queue.run_daily(notifications.send_reminders, time=time(hour, minute, tzinfo=ZoneInfo("Europe/Rome")))
     conversation = ConversationHandler(
                     entry_points=[CommandHandler("start", bot.start)],
                     states={
@@ -58,21 +159,31 @@ def main() -> None:
                         ],
                         MAIN_MENU: [
                             CallbackQueryHandler(bot.show_menu, pattern=compile("^menu$|^conferma$")),
-                            CallbackQueryHandler(bot.list_lessons, pattern="^visualizza_lezioni$"),
-                            CallbackQueryHandler(bot.list_bookings, pattern="^visualizza_prenotazioni$"),
+                            CallbackQueryHandler(bot.list_lessons, pattern=compile("^visualizza_lezioni$|^lezioni-(avanti|indietro)-\d+$|^filtro-(oggi|settimana|prossima)$|^giorno-\d{8}$|^materia-\d+$")),
+                            CallbackQueryHandler(bot.choose_day, pattern="^filtro-giorno$"),
+                            CallbackQueryHandler(bot.choose_subject, pattern="^filtro-materia$"),
+                            CallbackQueryHandler(bot.list_bookings, pattern=compile("^visualizza_prenotazioni$|^prenotazioni-(avanti|indietro)-\d+$")),
                             
                             CallbackQueryHandler(bot.book_lesson, pattern=compile("^prenota-\d+$")),
-                            CallbackQueryHandler(bot.view_lesson, pattern=compile("^lezione-\d+$")),                           
+                            CallbackQueryHandler(bot.view_lesson, pattern=compile("^lezione-\d+$")),
+                            CallbackQueryHandler(bot.join_waitlist, pattern=compile("^attesa-\d+$")),                           
                             
                             CallbackQueryHandler(bot.view_booking, pattern=compile("^prenotazione-\d+$")),
                             CallbackQueryHandler(bot.cancel_booking, pattern=compile("^annulla-\d+-\d+$")), 
                         ]
                     },
-                    fallbacks=[CommandHandler("exit", bot.exit), CommandHandler("start", bot.start)]
+                    fallbacks=[CommandHandler("exit", bot.exit), CommandHandler("start", bot.start)],
+                    name="prenotazione",
+                    persistent=True
                 )
     
+    application.add_handler(TypeHandler(Update, set_log_context), group=-1)
     application.add_handler(conversation)
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if MODE == "webhook":
+        asyncio.run(run_webhook(application, WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET))
+    else:
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
+    database.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,202 @@
+import asyncio
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from time import perf_counter
+
+"""
+Metriche del bot (contatori, gauge e istogrammi delle latenze) esposte in formato testo Prometheus.
+Se le metriche non sono abilitate (METRICS_PORT non impostata) handler e metodi del database
+non vengono avvolti, quindi non c'è nessun costo aggiuntivo; i contatori restano semplici incrementi.
+"""
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def format_labels(label_name: str, label_value: str, extra: str = "") -> str:
+    labels = []
+    if label_name:
+        labels.append(f'{label_name}="{label_value}"')
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+class Counter:
+    def __init__(self, name: str, description: str, label: str = None):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.values = {}
+        self.lock = Lock()
+
+    def inc(self, label_value: str = None, amount: float = 1):
+        with self.lock:
+            self.values[label_value] = self.values.get(label_value, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for label_value, value in sorted(self.values.items(), key=lambda item: str(item[0])):
+            lines.append(f"{self.name}{format_labels(self.label, label_value)} {value}")
+        return lines
+
+class Gauge(Counter):
+    def dec(self, label_value: str = None, amount: float = 1):
+        self.inc(label_value, -amount)
+
+    def render(self) -> list:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, description: str, label: str = None, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.buckets = buckets
+        # Per ogni valore dell'etichetta: conteggi per bucket, somma e numero di osservazioni
+        self.values = {}
+        self.lock = Lock()
+
+    def observe(self, value: float, label_value: str = None):
+        with self.lock:
+            data = self.values.get(label_value)
+            if data is None:
+                data = self.values[label_value] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[0][i] += 1
+                    break
+            data[1] += value
+            data[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for label_value, (counts, total, count) in sorted(self.values.items(), key=lambda item: str(item[0])):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = format_labels(self.label, label_value, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.label, label_value, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{format_labels(self.label, label_value)} {total}")
+            lines.append(f"{self.name}_count{format_labels(self.label, label_value)} {count}")
+        return lines
+
+HANDLER_LATENCY = Histogram("bot_handler_duration_seconds", "Durata degli handler del Bot", "handler")
+HANDLERS_IN_PROGRESS = Gauge("bot_handlers_in_progress", "Handler del Bot in esecuzione", "handler")
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Eccezioni sollevate dagli handler del Bot", "handler")
+QUERY_LATENCY = Histogram("database_query_duration_seconds", "Durata dei metodi di DatabaseManager", "method")
+QUERIES_IN_PROGRESS = Gauge("database_queries_in_progress", "Metodi di DatabaseManager in esecuzione", "method")
+BOOKINGS = Counter("bot_bookings_total", "Tentativi di prenotazione per esito", "result")
+CANCELLATIONS = Counter("bot_cancellations_total", "Prenotazioni annullate")
+FAILED_VERIFICATIONS = Counter("bot_failed_verifications_total", "Codici di verifica errati")
+RATE_LIMITED = Counter("bot_rate_limited_total", "Azioni rifiutate dai limitatori", "action")
+API_CALLS = Histogram("bot_api_calls_per_update", "Chiamate all'API di Telegram per aggiornamento", buckets=(0, 1, 2, 3, 4, 5, 8, 13))
+SKIPPED_EDITS = Counter("bot_skipped_edits_total", "Modifiche ai messaggi non inviate perché il contenuto era già uguale")
+
+metrics = [HANDLER_LATENCY, HANDLERS_IN_PROGRESS, HANDLER_ERRORS, QUERY_LATENCY, QUERIES_IN_PROGRESS, BOOKINGS, CANCELLATIONS, FAILED_VERIFICATIONS, RATE_LIMITED, API_CALLS, SKIPPED_EDITS]
+# Funzioni che ritornano righe aggiuntive calcolate al momento della lettura (ad esempio le statistiche delle cache)
+collectors = []
+
+def render() -> str:
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    for collector in collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+"""
+Avvolge la funzione (sincrona o coroutine) misurandone la durata e il numero di chiamate in corso
+"""
+def timed(function, histogram: Histogram, gauge: Gauge, errors: Counter = None):
+    name = function.__name__
+
+    if asyncio.iscoroutinefunction(function):
+        @wraps(function)
+        async def async_wrapper(*args, **kwargs):
+            gauge.inc(name)
+            start = perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            except Exception:
+                if errors is not None:
+                    errors.inc(name)
+                raise
+            finally:
+                histogram.observe(perf_counter() - start, name)
+                gauge.dec(name)
+        return async_wrapper
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        gauge.inc(name)
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            histogram.observe(perf_counter() - start, name)
+            gauge.dec(name)
+    return wrapper
+
+"""
+Sostituisce i metodi pubblici dell'oggetto con le versioni misurate.
+Va chiamata prima di registrare gli handler nell'Application.
+"""
+def instrument(obj, histogram: Histogram, gauge: Gauge, errors: Counter = None, exclude: tuple = ()):
+    for name in dir(obj):
+        if name.startswith("_") or name in exclude:
+            continue
+        attribute = getattr(obj, name)
+        if callable(attribute) and hasattr(attribute, "__self__"):
+            setattr(obj, name, timed(attribute, histogram, gauge, errors))
+
+def instrument_bot(bot, exclude: tuple = ("render", "profile", "is_allowed", "is_code_send_allowed")):
+    instrument(bot, HANDLER_LATENCY, HANDLERS_IN_PROGRESS, HANDLER_ERRORS, exclude=exclude)
+
+    def views_collector() -> list:
+        stats = bot.views.stats()
+        lines = ["# HELP bot_views_cache_events_total Eventi della cache delle viste del Bot", "# TYPE bot_views_cache_events_total counter"]
+        for event in ("hits", "misses", "evictions"):
+            lines.append(f'bot_views_cache_events_total{{event="{event}"}} {stats[event]}')
+        lines += ["# HELP bot_views_cache_size Viste nella cache del Bot", "# TYPE bot_views_cache_size gauge", f'bot_views_cache_size {stats["size"]}']
+        return lines
+    collectors.append(views_collector)
+
+def instrument_database(database, exclude: tuple = ("connect", "close", "transaction", "stream", "cache_stats", "clear_caches")):
+    instrument(database, QUERY_LATENCY, QUERIES_IN_PROGRESS, exclude=exclude)
+
+    def cache_collector() -> list:
+        lines = ["# HELP database_cache_events_total Eventi delle cache di DatabaseManager", "# TYPE database_cache_events_total counter"]
+        sizes = ["# HELP database_cache_size Elementi nelle cache di DatabaseManager", "# TYPE database_cache_size gauge"]
+        for cache, stats in database.cache_stats().items():
+            for event in ("hits", "misses", "evictions"):
+                lines.append(f'database_cache_events_total{{cache="{cache}",event="{event}"}} {stats[event]}')
+            sizes.append(f'database_cache_size{{cache="{cache}"}} {stats["size"]}')
+        return lines + sizes
+    collectors.append(cache_collector)
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+"""
+Espone le metriche su http://<address>:<port>/metrics da un thread separato
+"""
+def start_http_server(port: int, address: str = "127.0.0.1") -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((address, port), MetricsRequestHandler)
+    Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,101 @@
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from sys import intern
+
+"""
+Converte l'ora di una lezione nel formato "HH:MM - HH:MM" in inizio e fine
+"""
+def parse_hours(hours: str) -> tuple[time, time]:
+    start, end = hours.split("-")
+    return time.fromisoformat(start.strip()), time.fromisoformat(end.strip())
+
+def format_day(value: date) -> str:
+    return f"{value.day:02d}/{value.month:02d}"
+
+def format_time(value: time) -> str:
+    return f"{value.hour:02d}:{value.minute:02d}"
+
+"""
+Lezione restituita da DatabaseManager. Data e ora vengono interpretate una sola volta,
+alla lettura della riga (che poi resta nella cache), invece che a ogni messaggio mostrato dal Bot.
+"""
+@dataclass(frozen=True, slots=True)
+class Lesson:
+    lesson_id: int
+    date: date
+    start: time
+    end: time
+    description: str
+    seats: int
+    subject: str
+    room: str
+    professor: str
+    # Etichetta del pulsante nell'elenco delle lezioni, calcolata alla lettura
+    label: str
+
+    """
+    Crea la lezione da una riga SELECT * FROM Lezioni
+    """
+    @classmethod
+    def from_row(cls, row) -> "Lesson":
+        lesson_id, day, hours, description, seats, subject, room, name, surname = row
+        day = date.fromisoformat(day)
+        start, end = parse_hours(hours)
+        label = f"{format_day(day)} ⌚ {format_time(start)} | {subject}"
+        # Materie, aule e professori si ripetono in molte lezioni: in cache ne resta una sola copia
+        return cls(lesson_id, day, start, end, description, int(seats), intern(subject), intern(room), intern(f"{name} {surname}"), label)
+
+    """
+    Ora della lezione nel formato salvato nel database, "HH:MM - HH:MM"
+    """
+    @property
+    def hours(self) -> str:
+        return f"{format_time(self.start)} - {format_time(self.end)}"
+
+"""
+Prenotazione di un utente con i dati della lezione necessari per l'elenco e il dettaglio delle prenotazioni.
+"""
+@dataclass(frozen=True, slots=True)
+class Booking:
+    booking_id: int
+    lesson_id: int
+    date: date
+    start: time
+    end: time
+    subject: str
+    booked_at: datetime
+    # Etichetta del pulsante nell'elenco delle prenotazioni, calcolata alla lettura
+    label: str
+
+    """
+    Crea la prenotazione da una riga (id_prenotazione, id_lezione, data e ora della lezione, materia, data e ora della prenotazione)
+    """
+    @classmethod
+    def from_row(cls, row) -> "Booking":
+        booking_id, lesson_id, day, hours, subject, booking_day, booking_time = row
+        day = date.fromisoformat(day)
+        start, end = parse_hours(hours)
+        booked_at = datetime.fromisoformat(f"{booking_day} {booking_time}")
+        label = f"{format_day(day)} ⌚ {format_time(start)} | {subject}"
+        return cls(booking_id, lesson_id, day, start, end, intern(subject), booked_at, label)
+
+"""
+Studente registrato, come salvato nella tabella Utenti
+"""
+@dataclass(frozen=True, slots=True)
+class User:
+    email: str
+    name: str
+    surname: str
+    year: int
+    course: str
+    chat_id: int | None
+
+"""
+Studente promosso dalla lista d'attesa quando si libera un posto, da avvisare nella sua chat.
+"""
+@dataclass(frozen=True, slots=True)
+class Promotion:
+    email: str
+    chat_id: int
+    lesson_id: int
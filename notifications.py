@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import date, timedelta
+from time import monotonic
+from telegram.error import Forbidden, RetryAfter, TelegramError
+from telegram.ext import ContextTypes
+
+logger = logging.getLogger(__name__)
+
+"""
+Invio delle notifiche agli studenti (promemoria delle lezioni, posti liberati dalla lista d'attesa)
+tramite la job queue dell'Application.
+I messaggi vengono accodati per chat: i messaggi in attesa per la stessa chat vengono uniti in uno solo,
+e a ogni esecuzione di send_pending si rispettano i limiti di Telegram, al massimo global_rate messaggi
+al secondo in totale e uno ogni per_chat_interval secondi per la stessa chat.
+"""
+class NotificationScheduler:
+    def __init__(self, database, global_rate: float = 25, per_chat_interval: float = 1.0, tick: float = 1.0):
+        self.database = database
+        self.global_rate = global_rate
+        self.per_chat_interval = per_chat_interval
+        self.tick = tick
+
+        # chat_id -> messaggi in attesa, nell'ordine in cui le chat sono state accodate
+        self.pending = OrderedDict()
+        self.last_sent = {}
+        self.paused_until = 0.0
+
+    def enqueue(self, chat_id: int, text: str):
+        self.pending.setdefault(chat_id, []).append(text)
+
+    """
+    Callback per job_queue.run_repeating con intervallo self.tick
+    """
+    async def send_pending(self, context: ContextTypes.DEFAULT_TYPE):
+        now = monotonic()
+        if now < self.paused_until or not self.pending:
+            return
+
+        for chat_id in [chat_id for chat_id, sent in self.last_sent.items() if now - sent >= self.per_chat_interval]:
+            del self.last_sent[chat_id]
+
+        budget = int(self.global_rate * self.tick)
+        batch = []
+        for chat_id in list(self.pending):
+            if len(batch) >= budget:
+                break
+            if chat_id in self.last_sent:
+                continue
+            batch.append((chat_id, "\n\n".join(self.pending.pop(chat_id))))
+            self.last_sent[chat_id] = now
+
+        await asyncio.gather(*(self.send(context, chat_id, text) for chat_id, text in batch))
+
+    async def send(self, context: ContextTypes.DEFAULT_TYPE, chat_id: int, text: str):
+        try:
+            await context.bot.send_message(chat_id=chat_id, text=text)
+        except RetryAfter as e:
+            # Telegram chiede di rallentare: il messaggio torna in coda e gli invii si fermano per il tempo indicato
+            logger.warning("Limite di invio di Telegram raggiunto, pausa di %s secondi", e.retry_after)
+            self.paused_until = monotonic() + e.retry_after
+            self.pending.setdefault(chat_id, []).insert(0, text)
+        except Forbidden:
+            logger.info("La chat %s ha bloccato il bot, notifica scartata", chat_id)
+        except TelegramError as e:
+            logger.warning("Notifica alla chat %s non inviata: %s", chat_id, e)
+
+    """
+    Callback per job_queue.run_daily: accoda per ogni studente un unico promemoria con le lezioni del giorno dopo
+    """
+    async def send_reminders(self, context: ContextTypes.DEFAULT_TYPE):
+        tomorrow = date.today() + timedelta(days=1)
+        reminders = await self.database.get_reminders(tomorrow.strftime("%Y-%m-%d"))
+
+        lessons_by_chat = OrderedDict()
+        for chat_id, subject, time, room in reminders:
+            lessons_by_chat.setdefault(chat_id, []).append(f"⌚ {time} | {subject} (aula {room})")
+
+        for chat_id, lessons in lessons_by_chat.items():
+            self.enqueue(chat_id, f"Promemoria: domani {tomorrow.strftime('%d/%m')} hai lezione\n" + "\n".join(lessons))
+        logger.info("Accodati %s promemoria per le lezioni del %s", len(lessons_by_chat), tomorrow)
@@ -0,0 +1,103 @@
+from contextvars import ContextVar
+import metrics
+from cache import TTLCache
+from telegram import constants
+from telegram.error import BadRequest
+from telegram.request import HTTPXRequest
+
+"""
+Livello di uscita verso Telegram usato dagli handler del Bot.
+Ricorda un'impronta dell'ultimo contenuto mostrato in ogni messaggio (testo, formattazione e tastiera)
+e non invia le modifiche che lo lascerebbero identico, ad esempio quando si ripreme "Visualizza lezioni";
+unisce in un solo messaggio i testi inviati uno dopo l'altro alla stessa chat.
+"""
+class Outbound:
+    def __init__(self, maxsize: int = 100_000, ttl: float = 24 * 60 * 60):
+        # (chat_id, message_id) -> impronta dell'ultimo contenuto del messaggio
+        self.fingerprints = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def fingerprint(text: str, parse_mode, reply_markup) -> int:
+        return hash((text, parse_mode, reply_markup))
+
+    @staticmethod
+    def message_key(message) -> tuple | None:
+        if message is None:
+            return None
+        return message.chat.id, message.message_id
+
+    """
+    Modifica il messaggio della callback query solo se il contenuto cambia.
+    Ritorna False se la modifica non è stata inviata perché il messaggio mostra già questo contenuto.
+    """
+    async def edit(self, query, text: str, reply_markup=None, parse_mode=None) -> bool:
+        key = self.message_key(query.message)
+        fingerprint = self.fingerprint(text, parse_mode, reply_markup)
+        if key is not None and self.fingerprints.get(key) == fingerprint:
+            metrics.SKIPPED_EDITS.inc()
+            return False
+
+        try:
+            await query.edit_message_text(text, parse_mode=parse_mode, reply_markup=reply_markup)
+        except BadRequest as e:
+            # L'impronta si perde al riavvio del bot: in quel caso è Telegram a segnalare la modifica inutile
+            if "message is not modified" not in e.message.lower():
+                raise
+            metrics.SKIPPED_EDITS.inc()
+            modified = False
+        else:
+            modified = True
+
+        if key is not None:
+            self.fingerprints.set(key, fingerprint)
+        return modified
+
+    """
+    Invia i testi alla chat unendo quelli consecutivi in un solo messaggio, finché non si supera la lunghezza massima
+    di un messaggio Telegram. La tastiera viene allegata all'ultimo messaggio.
+    """
+    async def send(self, bot, chat_id: int, *texts: str, reply_markup=None, parse_mode=None):
+        messages = merge_texts(texts)
+        for i, text in enumerate(messages):
+            markup = reply_markup if i == len(messages) - 1 else None
+            message = await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode, reply_markup=markup)
+            key = self.message_key(message)
+            if key is not None:
+                self.fingerprints.set(key, self.fingerprint(text, parse_mode, markup))
+
+"""
+Unisce i testi consecutivi separandoli con una riga vuota, senza superare max_length caratteri per messaggio
+"""
+def merge_texts(texts, max_length: int = constants.MessageLimit.MAX_TEXT_LENGTH) -> list[str]:
+    messages = []
+    for text in texts:
+        if messages and len(messages[-1]) + 2 + len(text) <= max_length:
+            messages[-1] += "\n\n" + text
+        else:
+            messages.append(text)
+    return messages
+
+# Chiamate all'API di Telegram eseguite durante l'aggiornamento in elaborazione
+api_calls = ContextVar("api_calls", default=None)
+
+"""
+Richiesta HTTP del bot che conta le chiamate all'API fatte dall'aggiornamento in corso (vedi count_api_calls)
+"""
+class CountingRequest(HTTPXRequest):
+    async def do_request(self, *args, **kwargs):
+        calls = api_calls.get()
+        if calls is not None:
+            calls[0] += 1
+        return await super().do_request(*args, **kwargs)
+
+"""
+Esegue l'elaborazione di un aggiornamento registrando quante chiamate all'API di Telegram ha richiesto
+"""
+async def count_api_calls(coroutine):
+    calls = [0]
+    token = api_calls.set(calls)
+    try:
+        return await coroutine
+    finally:
+        api_calls.reset(token)
+        metrics.API_CALLS.observe(calls[0])
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import logging
+import pickle
+import sqlite3
+from threading import Lock
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+"""
+Salva su un file SQLite locale lo user_data degli utenti e gli stati delle conversazioni,
+così un riavvio del bot non costringe tutti gli utenti a rifare il login.
+
+Application passa i dati modificati ogni update_interval secondi: qui vengono solo messi da parte in memoria
+e scritti sul file tutti insieme, in un'unica transazione, subito dopo (e alla chiusura del bot con flush).
+"""
+class SQLitePersistence(BasePersistence):
+    def __init__(self, filepath: str, update_interval: float = 10):
+        super().__init__(store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False), update_interval=update_interval)
+        self.filepath = filepath
+        self.connection = None
+        self.lock = Lock()
+
+        # Scritture in attesa: un valore None indica una riga da cancellare
+        self.pending_users = {}
+        self.pending_conversations = {}
+        self.flush_task = None
+
+    def open(self):
+        if self.connection is not None:
+            return
+        self.connection = sqlite3.connect(self.filepath, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS user_data (user_id INTEGER PRIMARY KEY, data BLOB NOT NULL)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS conversations (name TEXT NOT NULL, key TEXT NOT NULL, state BLOB NOT NULL, PRIMARY KEY (name, key))")
+
+    async def get_user_data(self) -> dict:
+        self.open()
+        rows = self.connection.execute("SELECT user_id, data FROM user_data").fetchall()
+        return {user_id: pickle.loads(data) for user_id, data in rows}
+
+    async def get_conversations(self, name: str) -> dict:
+        self.open()
+        rows = self.connection.execute("SELECT key, state FROM conversations WHERE ?=name", (name,)).fetchall()
+        return {tuple(json.loads(key)): pickle.loads(state) for key, state in rows}
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self.pending_users[user_id] = data
+        self.schedule_flush()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self.pending_users[user_id] = None
+        self.schedule_flush()
+
+    async def update_conversation(self, name: str, key: tuple, new_state: object) -> None:
+        self.pending_conversations[(name, json.dumps(key))] = new_state
+        self.schedule_flush()
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    """
+    Programma una sola scrittura per tutte le modifiche arrivate nello stesso giro di aggiornamento
+    """
+    def schedule_flush(self):
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self.flush_pending())
+
+    async def flush_pending(self):
+        # Lascia completare le altre update_* dello stesso giro prima di scrivere
+        await asyncio.sleep(0)
+        while self.pending_users or self.pending_conversations:
+            users, conversations = self.take_pending()
+            try:
+                await asyncio.to_thread(self.write, users, conversations)
+            except Exception:
+                # Le modifiche tornano in attesa e vengono riscritte alla prossima scrittura o alla chiusura
+                logger.exception("Impossibile salvare le sessioni di %s utenti, nuovo tentativo alla prossima scrittura", len(users))
+                self.restore_pending(users, conversations)
+                return
+
+    """
+    Le scritture in attesa vengono prese dal thread dell'event loop, l'unico che le modifica
+    """
+    def take_pending(self) -> tuple:
+        users, self.pending_users = self.pending_users, {}
+        conversations, self.pending_conversations = self.pending_conversations, {}
+        return users, conversations
+
+    """
+    Rimette in attesa le modifiche di una scrittura fallita, senza sovrascrivere quelle arrivate nel frattempo
+    """
+    def restore_pending(self, users: dict, conversations: dict):
+        self.pending_users = {**users, **self.pending_users}
+        self.pending_conversations = {**conversations, **self.pending_conversations}
+
+    def write(self, users: dict, conversations: dict):
+        if not users and not conversations:
+            return
+
+        with self.lock:
+            self.open()
+            self.connection.execute("BEGIN")
+            try:
+                self.connection.executemany("INSERT OR REPLACE INTO user_data (user_id, data) VALUES (?, ?)",
+                                            [(user_id, pickle.dumps(data)) for user_id, data in users.items() if data is not None])
+                self.connection.executemany("DELETE FROM user_data WHERE ?=user_id",
+                                            [(user_id,) for user_id, data in users.items() if data is None])
+                self.connection.executemany("INSERT OR REPLACE INTO conversations (name, key, state) VALUES (?, ?, ?)",
+                                            [(name, key, pickle.dumps(state)) for (name, key), state in conversations.items() if state is not None])
+                self.connection.executemany("DELETE FROM conversations WHERE ?=name AND ?=key",
+                                            [(name, key) for (name, key), state in conversations.items() if state is None])
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    async def flush(self) -> None:
+        if self.flush_task is not None:
+            await asyncio.gather(self.flush_task, return_exceptions=True)
+        self.write(*self.take_pending())
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
@@ -0,0 +1,114 @@
+import json
+import sqlite3
+from collections import OrderedDict
+from threading import Lock
+from time import time
+
+"""
+Limitatori a token bucket contro l'abuso del bot (invii ripetuti di codici di verifica, tentativi di indovinare
+il codice, raffiche di tocchi su "Prenota" e "Annulla").
+Ogni chiave (id Telegram o email) ha un secchio di 'capacity' gettoni che si ricarica in 'period' secondi:
+ogni azione consuma un gettone e, a secchio vuoto, viene rifiutata.
+Il controllo costa O(1); sono tenute al massimo 'maxsize' chiavi, togliendo quelle usate meno di recente.
+"""
+class RateLimiter:
+    def __init__(self, capacity: float, period: float, maxsize: int = 100_000):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.maxsize = maxsize
+        # chiave -> [gettoni, istante dell'ultimo aggiornamento]; l'istante è l'ora di sistema, così lo stato salvato resta valido dopo un riavvio
+        self.buckets = OrderedDict()
+        self.lock = Lock()
+
+    def allow(self, key, cost: float = 1) -> bool:
+        now = time()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = [self.capacity, now]
+                if len(self.buckets) > self.maxsize:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(key)
+                bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] < cost:
+                return False
+            bucket[0] -= cost
+            return True
+
+    """
+    Ritorna (chiave, gettoni, ultimo aggiornamento) dei secchi non ancora pieni, gli unici che serve salvare
+    """
+    def dump(self) -> list:
+        now = time()
+        with self.lock:
+            return [(key, tokens, updated) for key, (tokens, updated) in self.buckets.items()
+                    if tokens + (now - updated) * self.rate < self.capacity]
+
+    def load(self, rows: list):
+        with self.lock:
+            for key, tokens, updated in rows:
+                self.buckets[key] = [min(self.capacity, tokens), updated]
+
+"""
+Interpreta un limite scritto come "azioni/secondi", ad esempio "3/600"
+"""
+def parse_limit(value: str) -> tuple[float, float]:
+    capacity, period = value.split("/")
+    return float(capacity), float(period)
+
+"""
+Limitatori usati dal Bot
+"""
+class RateLimits:
+    def __init__(self, code_sends: str = "5/600", code_sends_email: str = "3/600", code_attempts: str = "5/600", mutations: str = "10/10"):
+        # Invii del codice di verifica, per utente Telegram e per indirizzo email
+        self.code_sends = RateLimiter(*parse_limit(code_sends))
+        self.code_sends_email = RateLimiter(*parse_limit(code_sends_email))
+        # Codici di verifica inseriti, per utente Telegram
+        self.code_attempts = RateLimiter(*parse_limit(code_attempts))
+        # Prenotazioni, annullamenti e iscrizioni alla lista d'attesa, per utente Telegram
+        self.mutations = RateLimiter(*parse_limit(mutations))
+
+    def limiters(self) -> dict:
+        return {"code_sends": self.code_sends, "code_sends_email": self.code_sends_email, "code_attempts": self.code_attempts, "mutations": self.mutations}
+
+"""
+Stato dei limitatori salvato su un file SQLite locale, così un riavvio del bot non azzera i limiti.
+Le chiavi sono salvate in JSON per distinguere gli id Telegram (numeri) dalle email.
+"""
+class RateLimitStore:
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+
+    def connect(self):
+        connection = sqlite3.connect(self.filepath, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS rate_limits (name TEXT NOT NULL, key TEXT NOT NULL, tokens REAL NOT NULL, updated REAL NOT NULL, PRIMARY KEY (name, key))")
+        return connection
+
+    def load(self, limits: RateLimits):
+        connection = self.connect()
+        try:
+            for name, limiter in limits.limiters().items():
+                rows = connection.execute("SELECT key, tokens, updated FROM rate_limits WHERE ?=name ORDER BY updated", (name,)).fetchall()
+                limiter.load([(json.loads(key), tokens, updated) for key, tokens, updated in rows])
+        finally:
+            connection.close()
+
+    def save(self, limits: RateLimits):
+        connection = self.connect()
+        try:
+            connection.execute("BEGIN")
+            connection.execute("DELETE FROM rate_limits")
+            for name, limiter in limits.limiters().items():
+                connection.executemany("INSERT INTO rate_limits (name, key, tokens, updated) VALUES (?, ?, ?, ?)",
+                                       [(name, json.dumps(key), tokens, updated) for key, tokens, updated in limiter.dump()])
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
@@ -0,0 +1,134 @@
+import argparse
+import csv
+import json
+import logging
+import sys
+from datetime import date
+from os import getenv
+from dotenv import load_dotenv
+from database_manager import DatabaseManager
+from logging_config import setup_logging
+
+"""
+Report sulle prenotazioni per il dipartimento, esportati in CSV o JSON.
+Le aggregazioni avvengono nel database e le righe vengono lette e scritte un lotto alla volta
+(DatabaseManager.stream), quindi anche i report su un intero anno accademico usano memoria costante.
+Ogni report viene scritto in un solo passaggio, durante il quale si calcolano anche i totali riportati nei log.
+
+    python reports.py lezioni --dal 2024-09-01 --al 2025-08-31 --formato csv --output lezioni.csv
+"""
+
+logger = logging.getLogger(__name__)
+
+# Prenotazioni e iscritti alla lista d'attesa di ogni lezione, contati sugli indici (id_lezione, ...)
+LESSON_STATS = """SELECT l.id_lezione, l.data, l.ora, l.nome_materia, l.nome_aula, a.posti_totali,
+                  (SELECT COUNT(*) FROM Prenotazioni p WHERE p.id_lezione=l.id_lezione) AS prenotazioni,
+                  (SELECT COUNT(*) FROM ListaAttesa w WHERE w.id_lezione=l.id_lezione) AS in_attesa
+                  FROM Lezioni l JOIN Aule a ON a.nome=l.nome_aula WHERE l.data BETWEEN ? AND ?"""
+
+"""
+Aggregati per materia o per aula delle lezioni del periodo
+"""
+def grouped_stats(column: str) -> str:
+    return f"""SELECT {column}, COUNT(*), SUM(posti_totali), SUM(prenotazioni),
+               ROUND(100.0 * SUM(prenotazioni) / SUM(posti_totali), 1), SUM(prenotazioni >= posti_totali), SUM(in_attesa)
+               FROM ({LESSON_STATS}) GROUP BY {column} ORDER BY {column}"""
+
+GROUPED_COLUMNS = ["lezioni", "posti_totali", "prenotazioni", "riempimento", "lezioni_piene", "in_attesa"]
+
+"""
+Report disponibili: query e colonne. Ogni report ha una colonna "prenotazioni", usata per i totali.
+- lezioni: prenotazioni e percentuale di riempimento dell'aula per ogni lezione, in ordine di data e ora
+- materie, aule: gli stessi dati sommati per materia e per aula
+- minuti: prenotazioni fatte in ogni minuto, per trovare i picchi
+"""
+REPORTS = {
+    "lezioni": (f"""SELECT id_lezione, data, ora, nome_materia, nome_aula, posti_totali, prenotazioni,
+                    ROUND(100.0 * prenotazioni / posti_totali, 1), in_attesa
+                    FROM ({LESSON_STATS}) ORDER BY data, ora, id_lezione""",
+                ["id_lezione", "data", "ora", "materia", "aula", "posti_totali", "prenotazioni", "riempimento", "in_attesa"]),
+    "materie": (grouped_stats("nome_materia"), ["materia", *GROUPED_COLUMNS]),
+    "aule": (grouped_stats("nome_aula"), ["aula", *GROUPED_COLUMNS]),
+    "minuti": ("SELECT data, ora, COUNT(*) FROM Prenotazioni WHERE data BETWEEN ? AND ? GROUP BY data, ora ORDER BY data, ora",
+               ["data", "ora", "prenotazioni"]),
+}
+
+"""
+Totali di un report calcolati mentre le righe vengono scritte: numero di righe,
+somma delle prenotazioni e riga con più prenotazioni (ad esempio il minuto di picco)
+"""
+class Summary:
+    def __init__(self, columns: list):
+        self.columns = columns
+        self.index = columns.index("prenotazioni")
+        self.rows = 0
+        self.bookings = 0
+        self.peak = None
+
+    def track(self, rows):
+        for row in rows:
+            self.rows += 1
+            self.bookings += row[self.index]
+            if self.peak is None or row[self.index] > self.peak[self.index]:
+                self.peak = row
+            yield row
+
+    def describe(self) -> str:
+        if self.peak is None:
+            return "nessuna riga"
+        peak = ", ".join(f"{column} {value}" for column, value in zip(self.columns, self.peak))
+        return f"{self.rows} righe, {self.bookings} prenotazioni, massimo: {peak}"
+
+def write_csv(output, columns: list, rows):
+    writer = csv.writer(output)
+    writer.writerow(columns)
+    writer.writerows(rows)
+
+"""
+Scrive un array JSON di oggetti, un elemento alla volta
+"""
+def write_json(output, columns: list, rows):
+    output.write("[")
+    separator = "\n"
+    for row in rows:
+        output.write(separator + json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+        separator = ",\n"
+    output.write("\n]\n")
+
+WRITERS = {"csv": write_csv, "json": write_json}
+
+"""
+Scrive il report sulle lezioni (o sulle prenotazioni, per "minuti") comprese tra first_day e last_day inclusi
+"""
+def export_report(database: DatabaseManager, name: str, output, output_format: str = "csv", first_day: date = date.min, last_day: date = date.max) -> Summary:
+    search, columns = REPORTS[name]
+    summary = Summary(columns)
+    rows = database.stream(search, (first_day.isoformat(), last_day.isoformat()))
+    WRITERS[output_format](output, columns, summary.track(rows))
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Esporta i report sulle prenotazioni in CSV o JSON")
+    parser.add_argument("report", choices=REPORTS, help="report da esportare")
+    parser.add_argument("--formato", choices=WRITERS, default="csv", help="formato del file (predefinito: csv)")
+    parser.add_argument("--dal", type=date.fromisoformat, default=date.min, help="primo giorno, AAAA-MM-GG")
+    parser.add_argument("--al", type=date.fromisoformat, default=date.max, help="ultimo giorno, AAAA-MM-GG")
+    parser.add_argument("--output", help="file in cui scrivere il report (predefinito: standard output)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    setup_logging(getenv("LOG_LEVEL", "INFO"))
+
+    database = DatabaseManager()
+    database.connect()
+    output = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        summary = export_report(database, args.report, output, args.formato, args.dal, args.al)
+    finally:
+        if args.output:
+            output.close()
+        database.close()
+    logger.info("Report %s: %s", args.report, summary.describe())
+
+if __name__ == "__main__":
+    main()
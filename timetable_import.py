@@ -0,0 +1,238 @@
+import argparse
+import csv
+import logging
+import re
+import sys
+from dataclasses import dataclass
+from datetime import date, datetime, time, timezone
+from os import getenv
+from time import perf_counter
+from zoneinfo import ZoneInfo
+from dotenv import load_dotenv
+from database_manager import DatabaseManager
+from logging_config import setup_logging
+from models import format_time
+
+"""
+Importazione dell'orario delle lezioni in Lezioni da un file CSV o iCalendar (.ics).
+Il file viene letto una riga (o un evento) alla volta e le lezioni vengono scritte a lotti di 'batch_size',
+ognuno in una transazione, quindi la memoria usata non dipende dalla dimensione del file.
+Materie, aule e professori devono già esistere; i posti disponibili sono i posti totali dell'aula.
+
+    python timetable_import.py orario.csv [--aggiorna] [--lotto 1000]
+
+Il CSV ha l'intestazione data,inizio,fine,materia,aula,professore,descrizione (separatore virgola o punto e virgola),
+con la data come AAAA-MM-GG o GG/MM/AAAA e gli orari come HH:MM.
+Negli eventi iCalendar la materia è SUMMARY, l'aula LOCATION, il professore il CN di ORGANIZER e la descrizione DESCRIPTION.
+"""
+
+TIMEZONE = ZoneInfo("Europe/Rome")
+# Righe non valide riportate una per una nei log, le altre vengono solo contate
+MAX_REPORTED_ERRORS = 20
+
+logger = logging.getLogger(__name__)
+
+"""
+Normalizza un nome per il confronto con quelli nel database: maiuscole e spazi in più non contano
+"""
+def normalize(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+def parse_day(value: str) -> date:
+    value = value.strip()
+    if "/" in value:
+        day, month, year = value.split("/")
+        return date(int(year), int(month), int(day))
+    return date.fromisoformat(value)
+
+@dataclass
+class ImportReport:
+    read: int = 0
+    invalid: int = 0
+    written: int = 0
+
+class TimetableImporter:
+    def __init__(self, database: DatabaseManager, batch_size: int = 1000, update: bool = False):
+        self.database = database
+        self.batch_size = batch_size
+        self.update = update
+
+        subjects, rooms, professors = database.get_timetable_references()
+        self.subjects = {normalize(subject): subject for subject in subjects}
+        self.rooms = {normalize(room): (room, seats) for room, seats in rooms.items()}
+        # "Nome Cognome" -> (nome, cognome): un nome composto come "Maria Cristina Pinotti" si divide solo così
+        self.professors = {normalize(f"{name} {surname}"): (name, surname) for name, surname in professors}
+
+    """
+    Controlla un record letto dal file e lo converte nella riga da inserire in Lezioni.
+    Solleva ValueError con il motivo se il record non è valido.
+    """
+    def validate(self, record: dict) -> tuple:
+        if record.get("ricorrenza"):
+            raise ValueError("gli eventi ricorrenti (RRULE) non sono supportati")
+        try:
+            day = parse_day(record.get("data") or "")
+            start = time.fromisoformat((record.get("inizio") or "").strip())
+            end = time.fromisoformat((record.get("fine") or "").strip())
+        except ValueError:
+            raise ValueError(f"data o orario non validi: {record.get('data')} {record.get('inizio')}-{record.get('fine')}")
+        if end <= start:
+            raise ValueError(f"la lezione finisce prima di iniziare: {format_time(start)}-{format_time(end)}")
+
+        subject = self.subjects.get(normalize(record.get("materia") or ""))
+        if subject is None:
+            raise ValueError(f"materia sconosciuta: {record.get('materia')}")
+        room = self.rooms.get(normalize(record.get("aula") or ""))
+        if room is None:
+            raise ValueError(f"aula sconosciuta: {record.get('aula')}")
+        professor = self.professors.get(normalize(record.get("professore") or ""))
+        if professor is None:
+            raise ValueError(f"professore sconosciuto: {record.get('professore')}")
+
+        description = (record.get("descrizione") or "").strip()
+        if len(description) > 500:
+            raise ValueError("descrizione più lunga di 500 caratteri")
+
+        room_name, seats = room
+        return (day.isoformat(), f"{format_time(start)} - {format_time(end)}", description, seats, subject, room_name, *professor)
+
+    """
+    Importa i record (numero di riga, record) scrivendo le lezioni valide a lotti
+    """
+    def run(self, records) -> ImportReport:
+        report = ImportReport()
+        batch = []
+        for line, record in records:
+            report.read += 1
+            try:
+                batch.append(self.validate(record))
+            except ValueError as e:
+                report.invalid += 1
+                if report.invalid <= MAX_REPORTED_ERRORS:
+                    logger.warning("Riga %s scartata: %s", line, e)
+                continue
+
+            if len(batch) >= self.batch_size:
+                report.written += self.database.import_lessons(batch, self.update)
+                batch = []
+
+        if batch:
+            report.written += self.database.import_lessons(batch, self.update)
+        if report.invalid > MAX_REPORTED_ERRORS:
+            logger.warning("Altre %s righe scartate", report.invalid - MAX_REPORTED_ERRORS)
+        return report
+
+"""
+Legge un orario CSV una riga alla volta, ritornando (numero di riga, record)
+"""
+def read_csv(path: str):
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        try:
+            dialect = csv.Sniffer().sniff(file.readline(), delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        file.seek(0)
+        reader = csv.DictReader(file, dialect=dialect)
+        reader.fieldnames = [normalize(field) for field in reader.fieldnames or []]
+        for record in reader:
+            yield reader.line_num, record
+
+"""
+Righe logiche di un file iCalendar, (numero di riga, testo): le righe che iniziano con uno spazio continuano la precedente
+"""
+def unfold(file):
+    current, current_line = None, 0
+    for number, line in enumerate(file, 1):
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current_line, current
+        current, current_line = line, number
+    if current is not None:
+        yield current_line, current
+
+ESCAPE_PATTERN = re.compile(r"\\(.)")
+
+def unescape(value: str) -> str:
+    return ESCAPE_PATTERN.sub(lambda match: "\n" if match.group(1) in "nN" else match.group(1), value)
+
+"""
+Converte DTSTART o DTEND nell'ora italiana; ritorna None se manca l'orario (eventi di un giorno intero)
+"""
+def parse_ics_datetime(params: list, value: str) -> datetime | None:
+    if "VALUE=DATE" in params or "T" not in value:
+        return None
+    moment = datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        return moment.replace(tzinfo=timezone.utc).astimezone(TIMEZONE)
+    for param in params:
+        if param.startswith("TZID="):
+            return moment.replace(tzinfo=ZoneInfo(param[5:].strip('"'))).astimezone(TIMEZONE)
+    return moment
+
+def ics_record(event: dict) -> dict:
+    record = {
+        "materia": unescape(event.get("SUMMARY", ([], ""))[1]),
+        "aula": unescape(event.get("LOCATION", ([], ""))[1]),
+        "descrizione": unescape(event.get("DESCRIPTION", ([], ""))[1]),
+        "professore": "",
+        "ricorrenza": "RRULE" in event
+    }
+    for param in event.get("ORGANIZER", ([], ""))[0]:
+        if param.upper().startswith("CN="):
+            record["professore"] = param[3:].strip('"')
+
+    try:
+        start = parse_ics_datetime(*event["DTSTART"])
+        end = parse_ics_datetime(*event["DTEND"])
+    except (KeyError, ValueError):
+        start = end = None
+    if start is not None and end is not None:
+        record.update(data=start.date().isoformat(), inizio=format_time(start.time()), fine=format_time(end.time()))
+    return record
+
+"""
+Legge un orario iCalendar un evento alla volta, ritornando (riga di BEGIN:VEVENT, record)
+"""
+def read_ics(path: str):
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        event, start_line = None, 0
+        for number, line in unfold(file):
+            if line == "BEGIN:VEVENT":
+                event, start_line = {}, number
+            elif line == "END:VEVENT" and event is not None:
+                yield start_line, ics_record(event)
+                event = None
+            elif event is not None:
+                name, _, value = line.partition(":")
+                name, *params = name.split(";")
+                event[name.upper()] = (params, value)
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa l'orario delle lezioni da un file CSV o iCalendar")
+    parser.add_argument("file", help="file .csv o .ics con l'orario")
+    parser.add_argument("--aggiorna", action="store_true", help="aggiorna descrizione e professore delle lezioni già presenti")
+    parser.add_argument("--lotto", type=int, default=1000, help="lezioni scritte per transazione (predefinito: 1000)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    setup_logging(getenv("LOG_LEVEL", "INFO"))
+    read = read_ics if args.file.lower().endswith(".ics") else read_csv
+
+    database = DatabaseManager()
+    database.connect()
+    try:
+        start = perf_counter()
+        report = TimetableImporter(database, args.lotto, args.aggiorna).run(read(args.file))
+        elapsed = perf_counter() - start
+    finally:
+        database.close()
+
+    logger.info("Importazione di %s completata in %.1f s: %s righe lette, %s lezioni inserite o aggiornate, %s già presenti, %s scartate",
+                args.file, elapsed, report.read, report.written, report.read - report.invalid - report.written, report.invalid)
+    sys.exit(1 if report.invalid else 0)
+
+if __name__ == "__main__":
+    main()
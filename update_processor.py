@@ -0,0 +1,60 @@
+import asyncio
+from typing import Any, Awaitable
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+from outbound import count_api_calls
+
+"""
+Elabora in parallelo gli aggiornamenti di utenti diversi (al massimo max_concurrent_updates alla volta),
+mentre quelli di uno stesso utente vengono elaborati uno alla volta e nell'ordine di arrivo,
+così gli stati della ConversationHandler restano coerenti.
+Per ogni aggiornamento viene registrato il numero di chiamate all'API di Telegram.
+"""
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    # Limite passato a BaseUpdateProcessor: il limite vero è self.slots, preso dopo il lock dell'utente
+    UNBOUNDED = 2 ** 31 - 1
+
+    def __init__(self, max_concurrent_updates: int):
+        if max_concurrent_updates < 1:
+            raise ValueError(f"max_concurrent_updates deve essere positivo: {max_concurrent_updates}")
+        super().__init__(self.UNBOUNDED)
+        self.slots = asyncio.Semaphore(max_concurrent_updates)
+        # Per ogni utente: lock e numero di aggiornamenti in corso o in attesa
+        self.locks = {}
+
+    @staticmethod
+    def get_key(update: object):
+        if isinstance(update, Update) and update.effective_user is not None:
+            return update.effective_user.id
+        return None
+
+    """
+    Aspetta il turno dell'utente prima di occupare uno dei max_concurrent_updates posti:
+    gli aggiornamenti in coda dietro a un utente che ne invia molti non tolgono posti agli altri utenti.
+    """
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self.get_key(update)
+        if key is None:
+            async with self.slots:
+                await count_api_calls(coroutine)
+            return
+
+        entry = self.locks.get(key)
+        if entry is None:
+            entry = self.locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+
+        try:
+            async with entry[0]:
+                async with self.slots:
+                    await count_api_calls(coroutine)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self.locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
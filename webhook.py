@@ -0,0 +1,70 @@
+import logging
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+"""
+Crea l'applicazione web che riceve gli aggiornamenti di Telegram:
+- POST /<path> riceve un aggiornamento in JSON e lo mette nella coda dell'Application;
+- GET /health risponde "ok" se il bot è in esecuzione, per i controlli del load balancer.
+Se secret_token è impostato, le richieste senza l'header X-Telegram-Bot-Api-Secret-Token corretto vengono rifiutate.
+Lo stato degli utenti resta nel processo (conversazioni, user_data, limiti, ordine degli aggiornamenti):
+più repliche funzionano solo se gli aggiornamenti di un utente arrivano sempre alla stessa replica
+e se i promemoria sono attivi su una sola (REMINDERS in main.py).
+"""
+def create_web_app(application: Application, path: str, secret_token: str = None) -> Starlette:
+    async def telegram_update(request: Request) -> Response:
+        if secret_token and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != secret_token:
+            return Response(status_code=403)
+
+        try:
+            update = Update.de_json(await request.json(), application.bot)
+        except Exception:
+            logger.warning("Ricevuto un aggiornamento non valido")
+            return Response(status_code=400)
+
+        await application.update_queue.put(update)
+        return Response()
+
+    async def health(request: Request) -> PlainTextResponse:
+        if application.running:
+            return PlainTextResponse("ok")
+        return PlainTextResponse("non in esecuzione", status_code=503)
+
+    return Starlette(routes=[
+        Route(f"/{path}", telegram_update, methods=["POST"]),
+        Route("/health", health, methods=["GET"])
+    ])
+
+"""
+Avvia il bot in modalità webhook. Più repliche possono essere eseguite dietro lo stesso load balancer.
+Se url è vuoto il webhook non viene registrato su Telegram: utile per provare il server in locale
+inviando aggiornamenti registrati con una POST.
+"""
+async def run_webhook(application: Application, url: str, listen: str, port: int, path: str, secret_token: str = None):
+    server = uvicorn.Server(uvicorn.Config(app=create_web_app(application, path, secret_token), host=listen, port=port, use_colors=False))
+
+    # run_polling e run_webhook chiamano post_init e post_shutdown, qui vanno chiamati esplicitamente
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+
+    if url:
+        await application.bot.set_webhook(url=f"{url}/{path}", allowed_updates=Update.ALL_TYPES, secret_token=secret_token)
+
+    await application.start()
+    try:
+        await server.serve()
+    finally:
+        await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)